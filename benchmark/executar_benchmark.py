@@ -0,0 +1,268 @@
+"""
+Offline benchmark suite for the whole pipeline (no Hadoop, broker or sensor needed).
+
+1. **Stages (per scale):**
+   - `gerar`: synthetic input from `gerar_dados.py` (`--escalas` is the number of devices).
+   - `map_database`, `sort` and `generate_database`: the pre-processing pipeline,
+     run as `python map_database.py < entrada | LC_ALL=C sort | python generate_database.py`.
+   - `hadoop_map` and `hadoop_reduce`: `hadoop/map.py` and `hadoop/reduce.py` as Hadoop streaming would run them,
+     with the shuffle replaced by `LC_ALL=C sort`.
+   - `treinarClassificadorKNN` and `classificarMedicao` from `ML_Model_on_hadoop.py`, in-process, trained on the
+     generated `treinamento.csv` and fed with the rows of `teste.csv` (the MQTT client is never connected).
+   - Stages whose dependencies are missing (e.g. sklearn) are recorded as skipped with the error.
+   - A command that fails (non-zero exit) is recorded as skipped with the last line of its stderr, and so are the
+     stages that need its output; the other stages and scales still run.
+
+2. **Results:**
+   - Each stage is run `--repeticoes` times and the fastest run is kept.
+   - Written as JSON (`--saida`) with the commit, Python version, platform and CPU count, so runs from
+     different commits can be compared; `--comparar anterior.json` prints the time ratio per stage and scale.
+
+**Example Usage:**
+   ```bash
+   python executar_benchmark.py --escalas 100,1000 --dias 2 --saida resultados.json
+   python executar_benchmark.py --escalas 100,1000 --dias 2 --comparar resultados.json
+   ```
+"""
+
+#! /usr/bin/env python
+import argparse
+import contextlib
+import csv
+import io
+import json
+import os
+import platform
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+import gerar_dados
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+PRE_PROCESSAMENTO = os.path.join(RAIZ, 'pre_processing')
+HADOOP = os.path.join(PRE_PROCESSAMENTO, 'hadoop')
+AQUISICAO = os.path.join(RAIZ, 'data_aquisition')
+
+ETAPAS = ['gerar', 'map_database', 'sort', 'generate_database', 'hadoop_map', 'hadoop_reduce',
+          'treinarClassificadorKNN', 'classificarMedicao']
+
+
+def contarLinhas(caminho):
+    with open(caminho, 'rb') as arquivo:
+        return sum(bloco.count(b'\n') for bloco in iter(lambda: arquivo.read(1 << 20), b''))
+
+
+def executarComando(comando, entrada, saida, diretorio):
+    ambiente = dict(os.environ, LC_ALL='C')
+    with open(entrada, 'rb') as origem, open(saida, 'wb') as destino:
+        subprocess.run(comando, stdin=origem, stdout=destino, stderr=subprocess.PIPE,
+                       cwd=diretorio, env=ambiente, check=True)
+
+
+def motivoFalha(erro):
+    # Ultima linha do stderr do comando (normalmente a excecao), ou o codigo de saida
+    if isinstance(erro, subprocess.CalledProcessError):
+        linhas = [linha for linha in (erro.stderr or b'').decode(errors='replace').splitlines() if linha.strip()]
+        if linhas:
+            return '{} (saida {})'.format(linhas[-1].strip(), erro.returncode)
+        return 'saida {}'.format(erro.returncode)
+    return str(erro)
+
+
+def medir(funcao, repeticoes):
+    # Menor tempo entre as repeticoes (menos sensivel a ruido)
+    melhor = None
+    for _ in range(repeticoes):
+        inicio = time.perf_counter()
+        funcao()
+        duracao = time.perf_counter() - inicio
+        melhor = duracao if melhor is None else min(melhor, duracao)
+    return melhor
+
+
+def lerTeste(caminho, limite):
+    with open(caminho) as arquivo:
+        leitor = csv.DictReader(arquivo)
+        return [[linha['hora'], linha['minuto'], linha['temp_minima'], linha['temp_maxima'],
+                 linha['latitude'], linha['longitude']] for _, linha in zip(range(limite), leitor)]
+
+
+def executarEscala(escala, args, temporario):
+    resultados = []
+
+    def registrar(etapa, segundos, linhas):
+        resultados.append({'etapa': etapa, 'escala': escala, 'linhas': linhas, 'segundos': round(segundos, 6),
+                           'linhas_por_segundo': round(linhas / segundos, 1) if segundos else None})
+        print('{:>8} dispositivos  {:<24}{:>10.3f}s  {:>12} linhas'.format(escala, etapa, segundos, linhas))
+
+    def pular(etapa, erro):
+        resultados.append({'etapa': etapa, 'escala': escala, 'pulada': str(erro)})
+        print('{:>8} dispositivos  {:<24}pulada ({})'.format(escala, etapa, erro))
+
+    def executarCadeia(passos, diretorio):
+        # Passos (etapa, comando, entrada, saida) em sequencia; etapa None nao e registrada.
+        # Se um falha, os seguintes dependem da saida dele e sao pulados. Retorna o motivo da falha ou None
+        falha = None
+        for etapa, comando, origem, destino in passos:
+            if falha is not None:
+                if etapa is not None:
+                    pular(etapa, falha)
+                continue
+            try:
+                if etapa is None:
+                    executarComando(comando, origem, destino, diretorio)
+                    continue
+                segundos = medir(lambda: executarComando(comando, origem, destino, diretorio), args.repeticoes)
+            except (OSError, subprocess.CalledProcessError) as erro:
+                falha = '{}: {}'.format(etapa or comando[0], motivoFalha(erro))
+                if etapa is not None:
+                    pular(etapa, motivoFalha(erro))
+                continue
+            registrar(etapa, segundos, contarLinhas(origem))
+        return falha
+
+    python = sys.executable
+    entrada = os.path.join(temporario, 'entrada.csv')
+    mapeado = os.path.join(temporario, 'mapeado.tsv')
+    ordenado = os.path.join(temporario, 'ordenado.tsv')
+    bases = os.path.join(temporario, 'bases')
+    saidaMapa = os.path.join(temporario, 'hadoop_map.tsv')
+    ordenadoMapa = os.path.join(temporario, 'hadoop_ordenado.tsv')
+    saidaReducao = os.path.join(temporario, 'hadoop_reduce.tsv')
+    os.makedirs(bases, exist_ok=True)
+
+    opcoes = dict(dispositivos=escala, dias=args.dias, leiturasPorDia=args.leituras_por_dia,
+                  distribuicao=args.distribuicao, semente=args.semente)
+    inicio = time.perf_counter()
+    linhas = gerar_dados.gravarArquivo(entrada, **opcoes)
+    registrar('gerar', time.perf_counter() - inicio, linhas)
+
+    etapas = set(args.etapas)
+
+    falhaBases = None
+    if etapas & {'map_database', 'sort', 'generate_database', 'treinarClassificadorKNN', 'classificarMedicao'}:
+        falhaBases = executarCadeia([
+            ('map_database', [python, 'map_database.py'], entrada, mapeado),
+            ('sort', ['sort'], mapeado, ordenado),
+            ('generate_database', [python, 'generate_database.py', '--saida', bases], ordenado, os.devnull),
+        ], PRE_PROCESSAMENTO)
+
+    if etapas & {'hadoop_map', 'hadoop_reduce'}:
+        executarCadeia([
+            ('hadoop_map', [python, 'map.py'], entrada, saidaMapa),
+            (None, ['sort'], saidaMapa, ordenadoMapa),
+            ('hadoop_reduce', [python, 'reduce.py'], ordenadoMapa, saidaReducao),
+        ], HADOOP)
+
+    if etapas & {'treinarClassificadorKNN', 'classificarMedicao'}:
+        if falhaBases is not None:
+            pular('treinarClassificadorKNN', falhaBases)
+            pular('classificarMedicao', falhaBases)
+            return resultados
+
+        treinamento = os.path.join(bases, 'treinamento.csv')
+        try:
+            if AQUISICAO not in sys.path:
+                sys.path.insert(0, AQUISICAO)
+            with contextlib.redirect_stdout(io.StringIO()):
+                import ML_Model_on_hadoop
+        except ImportError as erro:
+            pular('treinarClassificadorKNN', erro)
+            pular('classificarMedicao', erro)
+            return resultados
+
+        with contextlib.redirect_stdout(io.StringIO()):
+            segundos = medir(lambda: ML_Model_on_hadoop.treinarClassificadorKNN(treinamento), args.repeticoes)
+        registrar('treinarClassificadorKNN', segundos, contarLinhas(treinamento) - 1)
+
+        medicoes = lerTeste(os.path.join(bases, 'teste.csv'), args.classificacoes)
+        if not medicoes:
+            pular('classificarMedicao', 'teste.csv vazio')
+            return resultados
+
+        def classificar():
+            for columns in medicoes:
+                ML_Model_on_hadoop.classificarMedicao(columns)
+
+        with contextlib.redirect_stdout(io.StringIO()):
+            segundos = medir(classificar, args.repeticoes)
+        registrar('classificarMedicao', segundos, len(medicoes))
+
+    return resultados
+
+
+def commitAtual():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=RAIZ, stdout=subprocess.PIPE,
+                              stderr=subprocess.DEVNULL, check=True).stdout.decode().strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def compararResultados(atuais, caminhoAnterior):
+    with open(caminhoAnterior) as arquivo:
+        anteriores = json.load(arquivo)
+
+    referencia = {(resultado['etapa'], resultado['escala']): resultado['segundos']
+                  for resultado in anteriores['resultados'] if 'segundos' in resultado}
+
+    print('\nComparacao com {} (commit {}):'.format(caminhoAnterior, anteriores.get('commit')))
+    for resultado in atuais:
+        anterior = referencia.get((resultado['etapa'], resultado['escala']))
+        if anterior and resultado.get('segundos'):
+            print('{:>8} dispositivos  {:<24}{:>8.2f}x  ({:.3f}s -> {:.3f}s)'.format(
+                resultado['escala'], resultado['etapa'], resultado['segundos'] / anterior,
+                anterior, resultado['segundos']))
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark offline do pipeline')
+    parser.add_argument('--escalas', default='100,1000', help='quantidades de dispositivos, ex.: 100,1000,10000')
+    parser.add_argument('--dias', type=int, default=1)
+    parser.add_argument('--leituras-por-dia', type=int, default=96)
+    parser.add_argument('--distribuicao', choices=['normal', 'uniforme', 'diaria'], default='diaria')
+    parser.add_argument('--semente', type=int, default=42)
+    parser.add_argument('--repeticoes', type=int, default=1)
+    parser.add_argument('--classificacoes', type=int, default=1000, help='medicoes de teste.csv classificadas')
+    parser.add_argument('--etapas', default=','.join(ETAPAS), help='etapas a executar')
+    parser.add_argument('--saida', help='arquivo JSON de resultados')
+    parser.add_argument('--comparar', help='JSON de uma execucao anterior')
+    args = parser.parse_args()
+
+    args.etapas = args.etapas.split(',')
+
+    resultados = []
+    for escala in [int(valor) for valor in args.escalas.split(',')]:
+        temporario = tempfile.mkdtemp(prefix='benchmark_')
+        try:
+            resultados.extend(executarEscala(escala, args, temporario))
+        finally:
+            shutil.rmtree(temporario, ignore_errors=True)
+
+    relatorio = {
+        'commit': commitAtual(),
+        'data': datetime.now().isoformat(timespec='seconds'),
+        'python': platform.python_version(),
+        'plataforma': platform.platform(),
+        'cpus': os.cpu_count(),
+        'parametros': {'dias': args.dias, 'leituras_por_dia': args.leituras_por_dia,
+                       'distribuicao': args.distribuicao, 'semente': args.semente,
+                       'repeticoes': args.repeticoes, 'classificacoes': args.classificacoes},
+        'resultados': resultados,
+    }
+
+    if args.saida:
+        with open(args.saida, 'w') as arquivo:
+            json.dump(relatorio, arquivo, indent=1)
+        print('Resultados gravados em {}'.format(args.saida))
+
+    if args.comparar:
+        compararResultados(resultados, args.comparar)
+
+
+if __name__ == '__main__':
+    main()
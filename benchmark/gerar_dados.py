@@ -0,0 +1,128 @@
+"""
+Synthetic workload generator in the exact input format of `pre_processing/map_database.py`
+(`dispositivo;hora;minuto;ano;mes;dia;temperatura;latitude;longitude`).
+
+1. **Devices:**
+   - `--dispositivos` MAC-style ids; a fraction `--fracao-teste` starts with a digit, which
+     `generate_database.py` sends to `teste.csv` (the others go to `treinamento.csv`).
+   - Each device has a home cell on the 0.05 degree grid around Curitiba (`--grade` cells in each direction),
+     and every reading adds a uniform jitter of up to `--jitter` degrees, so some readings cross into the next cell.
+
+2. **Readings:**
+   - `--dias` days from `--inicio`, `--leituras-por-dia` readings per device per day, evenly spaced with a random
+     offset inside each slot.
+   - Temperatures follow `--distribuicao`: `normal` (`--media`, `--desvio`), `uniforme` (`media +- desvio`) or
+     `diaria` (daily cycle of amplitude `--desvio` around `--media`, plus noise), rounded to one decimal.
+   - `--invalidas` is the fraction of lines with an empty field (dropped by the pre-processing scripts).
+
+3. **Reproducibility:**
+   - The same `--semente` and options always produce the same file.
+
+**Example Usage:**
+   ```bash
+   python gerar_dados.py --dispositivos 1000 --dias 7 --leituras-por-dia 96 --saida entrada.csv
+   ```
+"""
+
+#! /usr/bin/env python
+import argparse
+import math
+import random
+import sys
+from datetime import datetime, timedelta
+
+LATITUDE_CENTRO = -25.45
+LONGITUDE_CENTRO = -49.25
+BASE_GRADE = 0.05
+
+
+def gerarDispositivos(quantidade, fracaoTeste, aleatorio):
+    dispositivos = []
+    for indice in range(quantidade):
+        prefixo = '0{:x}'.format(aleatorio.randrange(16)) if aleatorio.random() < fracaoTeste else 'b8'
+        sufixo = '{:010x}'.format(indice)
+        dispositivos.append(':'.join([prefixo] + [sufixo[i:i + 2] for i in range(0, 10, 2)]))
+    return dispositivos
+
+
+def sortearTemperatura(distribuicao, media, desvio, minutosDoDia, aleatorio):
+    if distribuicao == 'normal':
+        return aleatorio.gauss(media, desvio)
+    if distribuicao == 'uniforme':
+        return aleatorio.uniform(media - desvio, media + desvio)
+    # diaria: minimo de madrugada, maximo a tarde
+    fase = minutosDoDia / 1440.0 * 2 * math.pi
+    return media - desvio * math.cos(fase - math.pi / 6) + aleatorio.gauss(0, desvio / 4.0)
+
+
+def gerarLinhas(dispositivos=100, dias=1, leiturasPorDia=96, distribuicao='diaria', media=20.0, desvio=6.0,
+                jitter=0.02, grade=4, fracaoTeste=0.2, invalidas=0.0, inicio=datetime(2025, 1, 1), semente=42):
+    aleatorio = random.Random(semente)
+    ids = gerarDispositivos(dispositivos, fracaoTeste, aleatorio)
+    casas = [(LATITUDE_CENTRO + BASE_GRADE * aleatorio.randint(-grade, grade),
+              LONGITUDE_CENTRO + BASE_GRADE * aleatorio.randint(-grade, grade)) for _ in ids]
+
+    passo = 1440.0 / leiturasPorDia
+    for dia in range(dias):
+        data = inicio + timedelta(days=dia)
+        for leitura in range(leiturasPorDia):
+            for dispositivo, (latitude, longitude) in zip(ids, casas):
+                minutosDoDia = int(leitura * passo + aleatorio.uniform(0, passo))
+                campos = [dispositivo, str(minutosDoDia // 60), str(minutosDoDia % 60),
+                          str(data.year), str(data.month), str(data.day),
+                          str(round(sortearTemperatura(distribuicao, media, desvio, minutosDoDia, aleatorio), 1)),
+                          str(round(latitude + aleatorio.uniform(-jitter, jitter), 7)),
+                          str(round(longitude + aleatorio.uniform(-jitter, jitter), 7))]
+                if invalidas and aleatorio.random() < invalidas:
+                    campos[aleatorio.randrange(len(campos))] = ''
+                yield ';'.join(campos)
+
+
+def gravarArquivo(caminho, **opcoes):
+    total = 0
+    with open(caminho, 'w') as arquivo:
+        bloco = []
+        for linha in gerarLinhas(**opcoes):
+            bloco.append(linha)
+            if len(bloco) >= 10000:
+                arquivo.write('\n'.join(bloco) + '\n')
+                total += len(bloco)
+                bloco = []
+        if bloco:
+            arquivo.write('\n'.join(bloco) + '\n')
+            total += len(bloco)
+    return total
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Gera dados sinteticos no formato do map_database.py')
+    parser.add_argument('--dispositivos', type=int, default=100)
+    parser.add_argument('--dias', type=int, default=1)
+    parser.add_argument('--leituras-por-dia', type=int, default=96)
+    parser.add_argument('--distribuicao', choices=['normal', 'uniforme', 'diaria'], default='diaria')
+    parser.add_argument('--media', type=float, default=20.0)
+    parser.add_argument('--desvio', type=float, default=6.0)
+    parser.add_argument('--jitter', type=float, default=0.02, help='graus em torno da celula de 0.05')
+    parser.add_argument('--grade', type=int, default=4, help='celulas em cada direcao a partir do centro')
+    parser.add_argument('--fracao-teste', type=float, default=0.2)
+    parser.add_argument('--invalidas', type=float, default=0.0)
+    parser.add_argument('--inicio', default='2025-01-01')
+    parser.add_argument('--semente', type=int, default=42)
+    parser.add_argument('--saida', default='-', help="arquivo de saida ('-' para stdout)")
+    args = parser.parse_args()
+
+    opcoes = dict(dispositivos=args.dispositivos, dias=args.dias, leiturasPorDia=args.leituras_por_dia,
+                  distribuicao=args.distribuicao, media=args.media, desvio=args.desvio, jitter=args.jitter,
+                  grade=args.grade, fracaoTeste=args.fracao_teste, invalidas=args.invalidas,
+                  inicio=datetime.strptime(args.inicio, '%Y-%m-%d'), semente=args.semente)
+
+    if args.saida == '-':
+        for linha in gerarLinhas(**opcoes):
+            sys.stdout.write(linha + '\n')
+    else:
+        total = gravarArquivo(args.saida, **opcoes)
+        sys.stderr.write('{} linhas gravadas em {}\n'.format(total, args.saida))
+
+
+if __name__ == '__main__':
+    main()
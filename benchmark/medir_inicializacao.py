@@ -0,0 +1,149 @@
+"""
+Startup benchmark for `data_aquisition/remote_iot.py` (import time, memory and time to the first reading).
+
+1. **Import Time:**
+   - Runs `python -X importtime -c "import remote_iot"` and reports the total and the slowest direct imports,
+     so a heavy dependency creeping back into the device path shows up immediately.
+   - `--modulos pandas,paho.mqtt.client` measures other imports the same way, for comparison.
+
+2. **Memory:**
+   - Peak RSS (`ru_maxrss`) of an interpreter that only imports `remote_iot`, and of a bare interpreter.
+
+3. **First Reading:**
+   - Starts `remote_iot.py --sensor falso --sair-apos-primeira` in a temporary directory and timestamps its
+     output lines: `pronta` is when the first reading was handed to the publisher, `publicada` when the broker
+     acknowledged it (only with a reachable `--broker`); by default the broker is an unused local port, so only
+     the path up to the offline queue is measured and the process does not wait for an acknowledgement.
+   - `--transporte loopback` runs the device against the in-process broker of `transporte.py`, which measures
+     `publicada` without a network.
+   - Each measurement is repeated `--repeticoes` times and the median is reported.
+
+**Example Usage:**
+   ```bash
+   python medir_inicializacao.py --repeticoes 5 --modulos pandas
+   python medir_inicializacao.py --broker broker.hivemq.com --porta 1883
+   ```
+"""
+
+#! /usr/bin/env python
+import argparse
+import json
+import os
+import shutil
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+AQUISICAO = os.path.join(RAIZ, 'data_aquisition')
+
+
+def medirImportacao(modulo):
+    # (total em segundos, [(segundos, modulo)] das importacoes diretas do modulo)
+    processo = subprocess.run([sys.executable, '-X', 'importtime', '-c', 'import {}'.format(modulo)],
+                              cwd=AQUISICAO, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, check=True)
+    diretas = []
+    for linha in processo.stderr.decode().splitlines():
+        if not linha.startswith('import time:') or 'cumulative' in linha:
+            continue
+        _, acumulado, nome = linha[len('import time:'):].split('|')
+        # Cada nivel de aninhamento acrescenta dois espacos; os filhos sao listados antes do pai
+        nivel = (len(nome) - len(nome.lstrip()) - 1) // 2
+        if nivel == 1:
+            diretas.append((int(acumulado) / 1e6, nome.strip()))
+        elif nivel == 0:
+            if nome.strip() == modulo:
+                return int(acumulado) / 1e6, sorted(diretas, reverse=True)
+            diretas = []
+    raise ValueError('{} nao encontrado na saida de -X importtime'.format(modulo))
+
+
+def medirMemoria(codigo):
+    # RSS maximo em MB (ru_maxrss e em KB no Linux)
+    script = '{}\nimport resource\nprint(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss)'.format(codigo)
+    processo = subprocess.run([sys.executable, '-c', script], cwd=AQUISICAO, stdout=subprocess.PIPE, check=True)
+    return int(processo.stdout.decode().split()[-1]) / 1024.0
+
+
+def portaLivre():
+    with socket.socket() as soquete:
+        soquete.bind(('127.0.0.1', 0))
+        return soquete.getsockname()[1]
+
+
+def medirPrimeiraLeitura(broker, porta, nomeTransporte, esperaEnvio, timeout):
+    # Segundos desde o inicio do processo ate cada marco impresso pelo remote_iot.py
+    temporario = tempfile.mkdtemp(prefix='inicializacao_')
+    comando = [sys.executable, '-u', 'remote_iot.py', '--sensor', 'falso', '--intervalo', '1',
+               '--diretorio', temporario, '--broker', broker, '--porta', str(porta),
+               '--transporte', nomeTransporte, '--sair-apos-primeira', str(esperaEnvio)]
+    marcos = {}
+    inicio = time.perf_counter()
+    try:
+        processo = subprocess.Popen(comando, cwd=AQUISICAO, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL)
+        for linha in processo.stdout:
+            agora = time.perf_counter() - inicio
+            if linha.startswith(b'Primeira leitura pronta'):
+                marcos['pronta'] = agora
+            elif linha.startswith(b'Primeira leitura publicada'):
+                marcos['publicada'] = agora
+        processo.wait(timeout)
+        marcos['encerrado'] = time.perf_counter() - inicio
+    finally:
+        shutil.rmtree(temporario, ignore_errors=True)
+    return marcos
+
+
+def mediana(valores):
+    return statistics.median(valores) if valores else None
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Tempo de importacao, RSS e primeira leitura do remote_iot.py')
+    parser.add_argument('--repeticoes', type=int, default=3)
+    parser.add_argument('--modulos', default='', help='outras importacoes para comparar, ex.: pandas')
+    parser.add_argument('--broker', default='127.0.0.1')
+    parser.add_argument('--porta', type=int, help='padrao: porta local sem broker')
+    parser.add_argument('--transporte', choices=['paho', 'loopback'], default='paho')
+    parser.add_argument('--timeout', type=float, default=30.0)
+    parser.add_argument('--saida', help='arquivo JSON de resultados')
+    args = parser.parse_args()
+
+    porta = args.porta if args.porta is not None else portaLivre()
+    # Sem broker nao ha confirmacao a esperar
+    esperaEnvio = args.timeout / 2 if args.porta is not None or args.transporte == 'loopback' else 0
+    resultado = {'python': sys.version.split()[0], 'importacao': {}, 'rss_mb': {}}
+
+    for modulo in ['remote_iot'] + [modulo for modulo in args.modulos.split(',') if modulo]:
+        try:
+            medidas = [medirImportacao(modulo) for _ in range(args.repeticoes)]
+        except subprocess.CalledProcessError:
+            print('{:<24}indisponivel'.format(modulo))
+            continue
+        total = mediana([total for total, _ in medidas])
+        resultado['importacao'][modulo] = total
+        resultado['rss_mb'][modulo] = medirMemoria('import {}'.format(modulo))
+        print('{:<24}{:>8.1f} ms  {:>6.1f} MB RSS'.format(modulo, total * 1000, resultado['rss_mb'][modulo]))
+        for segundos, nome in medidas[-1][1][:5]:
+            print('    {:<20}{:>8.1f} ms'.format(nome, segundos * 1000))
+
+    resultado['rss_mb']['interpretador'] = medirMemoria('pass')
+    print('{:<24}{:>19.1f} MB RSS'.format('interpretador', resultado['rss_mb']['interpretador']))
+
+    execucoes = [medirPrimeiraLeitura(args.broker, porta, args.transporte, esperaEnvio, args.timeout)
+                 for _ in range(args.repeticoes)]
+    for marco in ('pronta', 'publicada', 'encerrado'):
+        valor = mediana([execucao[marco] for execucao in execucoes if marco in execucao])
+        resultado['primeira_leitura_' + marco] = valor
+        print('primeira leitura {:<10}{}'.format(marco, '{:>8.3f} s'.format(valor) if valor is not None else '       -'))
+
+    if args.saida:
+        with open(args.saida, 'w') as arquivo:
+            json.dump(resultado, arquivo, indent=1)
+
+
+if __name__ == '__main__':
+    main()
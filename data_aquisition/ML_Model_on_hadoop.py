@@ -2,7 +2,8 @@
 This script combines IoT and machine learning for real-time data classification and alerting:
 
 1. MQTT Connection:
-   - Connects to the HiveMQ public MQTT broker.
+   - Connects to the HiveMQ public MQTT broker (`BROKER`, `PORTA_BROKER`) through `transporte.py`;
+     `TRANSPORTE = 'loopback'` uses the in-process broker instead (load tests, `simulador_dispositivos.py`).
    - Subscribes to two topics:
      - 'main/OMIoT/team/valores_instantaneos': Receives instantaneous measurements.
      - 'main/OMIoT/team/valores_medios': Receives averaged measurements.
@@ -13,125 +14,459 @@ This script combines IoT and machine learning for real-time data classification
    - Predicts the class (e.g., 'Alerta') for incoming data.
 
 3. Real-Time Classification and Alerts:
-   - Processes incoming MQTT messages.
-   - If the classification result is 'Alerta', publishes an 'on' alert to 'main/OMIoT/team/alerta'.
-   - Otherwise, publishes 'off'.
+   - Processes incoming MQTT messages; a message may carry a batch of readings, one per line,
+     as sent by the store-and-forward publisher on the device (`publicador_lote.py`).
+   - Payloads in the binary format of `formato_binario.py` (detected by the version byte) are decoded with
+     `struct` instead of `split(';')`; they are logged in the same text format as before.
+   - Each classification feeds a per-device `MaquinaAlerta`: the alert is raised after `CICLOS_PARA_LIGAR`
+     consecutive 'Alerta' results and cleared after `CICLOS_PARA_DESLIGAR` other results.
+   - 'on'/'off' is published (retained) to 'main/OMIoT/team/<dispositivo>/alerta' only when the state changes,
+     and refreshed every `INTERVALO_RENOVACAO_ALERTA` seconds; a measurement that does not identify its device
+     uses the legacy 'main/OMIoT/team/alerta'. Each device has its own retained state, as in `ingestao_distribuida.py`.
+   - The state table is saved to `CAMINHO_ESTADO_ALERTAS` and loaded back at startup, so a restart does not
+     republish 'off' for every device.
 
 4. Data Logging:
    - Logs raw instantaneous and average data into respective CSV files for further analysis.
 
 5. Long-Running Execution:
    - Runs for 15 days continuously, processing messages and publishing alerts as needed.
+
+6. Batched Classification:
+   - Averaged measurements are not classified inside the MQTT callback anymore.
+   - They are queued into a `ClassificadorEmLote` stage that runs one `predict` per batch on a NumPy matrix.
+   - `JANELA_LOTE_SEGUNDOS` and `TAMANHO_MAXIMO_LOTE` control the latency vs throughput tradeoff.
+
+7. Model Artifact (train once, serve many):
+   - If the artifact written by `treinar_modelo.py` exists, it is loaded at startup (prebuilt KD-tree, no refit).
+   - Otherwise the model is trained from 'treinamento.csv' on the full dataset, as a fallback.
+   - With `COMPILAR_MODELO` (off by default), a model trained here (fallback or hot reload) is also compiled into
+     a lookup table over the quantized domain (`modelo_tabela.py`): one array index per prediction, real KNN outside
+     the domain. The devices publish raw averaged coordinates, which are never on the 0.05 degree grid, so the
+     table is only hit with `AJUSTAR_GRADE_MODELO`, which snaps them to their cell (the quantization of the
+     training base); this changes the prediction near cell edges compared with the KNN on raw coordinates.
+
+8. Hot Reload:
+   - A background `RecarregadorModelo` watches the artifact and 'treinamento.csv' and reloads/retrains on change.
+   - The new model replaces the global `clfa` in a single assignment; batches already running keep the old one.
+   - The active version and swap time are kept in `versaoModelo`, printed and published (retained)
+     to 'main/OMIoT/team/modelo'.
+
+9. Buffered Logging:
+   - Raw messages are handed to `GravadorLog` writers, which write them in batches from a background thread.
+   - `DURABILIDADE_LOG` ('nenhuma' / 'flush' / 'fsync'), `ROTACAO_LOG` and the batch size/interval are configurable.
+   - On shutdown (end of the run, Ctrl+C or SIGTERM) the buffers are drained before exiting.
+
+10. Columnar History:
+   - When `RAIZ_COLUNAR` is set (unset by default), readings are also stored in the columnar, time-indexed store
+     (`armazenamento_colunar.py`), partitioned by day and device, for range queries without re-parsing CSVs.
+
+11. Server-Side Hourly Aggregation:
+   - With `AGREGACAO_NO_SERVIDOR` (off by default), an `AgregadorHorario` keeps per-device running counts/sums/min/max from
+     'valores_instantaneos' and emits the hourly aggregate when the hour closes (or the device goes quiet).
+   - These aggregates are what gets classified; the `valores_medios` sent by the devices are only logged,
+     so a Pi that reboots or misses the hour rollover no longer leaves a gap in the classification input.
+
+12. Metrics:
+   - With `METRICAS_HABILITADAS` (off by default), counters and latency histograms cover message receive/decode, queue wait,
+     batch `predict`, alert publishing and CSV batch writes, plus broker (re)connects and queue depths.
+   - Exposed on `http://127.0.0.1:<METRICAS_PORTA>/metrics` (Prometheus text) and `/metrics.json`, and/or written
+     to `METRICAS_ARQUIVO` every `INTERVALO_METRICAS` seconds; when disabled, no-op objects are used.
+
+13. Sharded Ingestion:
+   - For many devices, `ingestao_distribuida.py` runs the same classification with per-device topic wildcards,
+     spreading devices over N worker processes (each with its own model) by hashing the device id.
 """
 
 #! /usr/bin/env python
-import paho.mqtt.client as mqtt
+import json
+import signal
+import struct
+import sys
 import time
-import pandas as pd
 
 from sklearn.neighbors import KNeighborsClassifier
-from sklearn import  model_selection
-from sklearn.model_selection import train_test_split
 
-client = mqtt.Client("clientId-fdsmdfeRNr") # clientId- add 10 caracteres aleatorios
-client.connect("broker.hivemq.com", 1883)
+import formato_binario
+import modelo_knn
+import transporte
+from agregador_horario import AgregadorHorario
+from classificador_lote import ClassificadorEmLote, montarMatrizFeatures
+from maquina_alerta import MaquinaAlerta
+from metricas import criarMetricas
+from armazenamento_colunar import ArmazenamentoColunar
+from gravador_log import GravadorLog
+from recarregador_modelo import RecarregadorModelo
+
+# Lote de classificacao: espera no maximo JANELA_LOTE_SEGUNDOS ou TAMANHO_MAXIMO_LOTE medicoes
+# (0 e 1 equivalem a classificar uma mensagem por vez)
+JANELA_LOTE_SEGUNDOS = 0.05
+TAMANHO_MAXIMO_LOTE = 256
+
+# Intervalo (segundos) de verificacao de novo artefato/treinamento
+INTERVALO_RECARGA_MODELO = 30
+
+# Compila o modelo retreinado aqui em tabela de consulta (modelo_tabela.py); o artefato de
+# treinar_modelo.py --compilar ja vem compilado. As coordenadas dos dispositivos nao estao na grade de 0.05:
+# sem AJUSTAR_GRADE_MODELO toda medicao cai no KNN; com ele, a medicao e classificada pela sua celula
+COMPILAR_MODELO = False
+AJUSTAR_GRADE_MODELO = True
+
+# Gravacao dos CSVs em lote: politica de durabilidade por lote ('nenhuma', 'flush' ou 'fsync')
+# e rotacao dos arquivos (None, 'tamanho' ou 'data')
+DURABILIDADE_LOG = 'flush'
+ROTACAO_LOG = None
+TAMANHO_LOTE_LOG = 64 * 1024
+INTERVALO_FLUSH_LOG = 1.0
+
+# Historico colunar (None desativa; ex.: '/root/om/colunar')
+RAIZ_COLUNAR = None
+
+# Histerese do alerta: classificacoes consecutivas para ligar/desligar, renovacao do estado retido (segundos)
+CICLOS_PARA_LIGAR = 3
+CICLOS_PARA_DESLIGAR = 3
+INTERVALO_RENOVACAO_ALERTA = 3600
+CAMINHO_ESTADO_ALERTAS = '/root/om/estado_alertas.json'
+
+# Medias horarias calculadas no servidor a partir dos instantaneos (False: classifica os medios dos dispositivos)
+AGREGACAO_NO_SERVIDOR = False
+ATRASO_AGREGACAO = 120
+MAXIMO_DISPOSITIVOS_AGREGACAO = 10000
+
+# Instrumentacao: endpoint HTTP local (None desativa) e/ou arquivo de snapshot periodico
+METRICAS_HABILITADAS = False
+METRICAS_PORTA = 9108
+METRICAS_ARQUIVO = None
+INTERVALO_METRICAS = 60
+
+# Transporte MQTT ('paho' ou 'loopback', broker em processo para testes)
+TRANSPORTE = 'paho'
+BROKER = 'broker.hivemq.com'
+PORTA_BROKER = 1883
+
+client = transporte.criarCliente(TRANSPORTE, "clientId-fdsmdfeRNr") # clientId- add 10 caracteres aleatorios
+
+metricas = criarMetricas(METRICAS_HABILITADAS)
+mensagensRecebidas = {topico: metricas.contador('mensagens_recebidas_total', 'mensagens MQTT recebidas', topico=topico)
+                      for topico in ('main/OMIoT/team/valores_instantaneos', 'main/OMIoT/team/valores_medios')}
+mensagensInvalidas = metricas.contador('mensagens_invalidas_total', 'payloads descartados')
+duracaoMensagem = metricas.histograma('processamento_mensagem_segundos', 'decodificacao e despacho de uma mensagem')
+duracaoPublicacao = metricas.histograma('publicacao_alerta_segundos', 'publicacao de um alerta')
+conexoes = metricas.contador('conexoes_total', 'conexoes ao broker')
+desconexoes = metricas.contador('desconexoes_total', 'desconexoes do broker')
 
 clfa = KNeighborsClassifier(n_neighbors=4)
 
-def treinarClassificadorKNN():
+# Versao do modelo em uso e horario da troca (substituido inteiro a cada troca)
+versaoModelo = {'versao': None, 'origem': None, 'trocadoEm': None}
 
-    global clfa 
 
-    raw_data = '/root/om/PreProcessamento/treinamento.csv' 
+def aplicarModelo(artefato, origem):
 
-    data = pd.read_csv(raw_data)
+    global clfa
+    global versaoModelo
 
-    x = data[['temp_minima','temp_maxima','latitude', 'longitude']]
-    #x = data[['temp_minima','temp_maxima']]
-    y = data['Classe']
+    # Troca atomica: quem ja leu clfa termina o lote com o modelo anterior
+    clfa = artefato['modelo']
+    versaoModelo = {'versao': artefato['versao'], 'origem': origem, 'trocadoEm': time.time()}
 
+    print('Modelo {} em uso (origem: {})'.format(versaoModelo['versao'], origem))
+    client.publish("main/OMIoT/team/modelo", json.dumps(versaoModelo), retain=True)
 
-    # EXEMPLO USANDO HOLDOUT
-    # Holdout -> dividindo a base em treinamento (70%) e teste (30%), estratificada
-    x_train, x_test, y_train, y_test = train_test_split(x,y,test_size=.5, random_state=42)
 
-    # declara o classificador
-    #clfa = KNeighborsClassifier(n_neighbors=4)
+def treinarClassificadorKNN(raw_data=modelo_knn.CAMINHO_TREINAMENTO):
 
-    # treina o classificador
-    clfa = clfa.fit(x_train, y_train)
+    # treina o classificador com toda a base (sem holdout), com os parametros padrao;
+    # a escolha por validacao cruzada e feita em treinar_modelo.py --varredura
+    artefato = modelo_knn.treinarModelo(raw_data, vizinhos=4, compilar=COMPILAR_MODELO,
+                                        ajustarGrade=AJUSTAR_GRADE_MODELO)
 
-    # testa usando a base de testes
-    #predicted=clfa.predict(x_test)
+    aplicarModelo(artefato, 'treinamento')
 
+    return artefato
 
 
-def classificarMedicao(columns):
+def carregarClassificadorKNN(caminhoModelo=modelo_knn.CAMINHO_MODELO):
 
-    global clfa 
+    # Usa o artefato pre-treinado quando existir; senao treina a partir do CSV
+    try:
+        artefato = modelo_knn.carregarArtefato(caminhoModelo)
+    except (OSError, ValueError) as erro:
+        print('Artefato do modelo indisponivel ({}), treinando a partir do CSV'.format(erro))
+        return treinarClassificadorKNN()
 
-    hora = columns[0]
-    minuto = columns[1]
-    temp_minima = columns[2]
-    temp_maxima = columns[3]
-    latitude = columns[4]
-    longitude = columns[5]
+    aplicarModelo(artefato, 'artefato')
 
-    baseTeste = pd.DataFrame(columns=['temp_minima', 'temp_maxima', 'latitude', 'longitude'])
-    baseTeste = baseTeste.append({'temp_minima': temp_minima,
-                                    'temp_maxima': temp_maxima,
-                                    'latitude': latitude,
-                                    'longitude': longitude
-                                    }, ignore_index=True)
-    
-#    baseTeste = pd.DataFrame(columns=['temp_minima', 'temp_maxima'])
-#    baseTeste = baseTeste.append({'temp_minima': temp_minima,
-#                                    'temp_maxima': temp_maxima
-#                                    }, ignore_index=True)
+    return artefato
 
 
-    predicted = clfa.predict(baseTeste)
+def publicarAlerta(dispositivo, valor):
 
-    print('Classe: {}'.format(predicted[0]))
+    print('Alerta {}: {}'.format(dispositivo, valor))
 
-    # PUBLISH - Inserir linha na Cloud MQTT
-    if predicted[0] == 'Alerta':
-        client.publish("main/OMIoT/team/alerta", 'on')
+    # PUBLISH - Estado retido por dispositivo, apenas nas transicoes e renovacoes
+    if dispositivo:
+        topico = "main/OMIoT/team/{}/alerta".format(dispositivo)
     else:
-        client.publish("main/OMIoT/team/alerta", 'off')
+        topico = "main/OMIoT/team/alerta"
+    inicio = time.perf_counter()
+    client.publish(topico, valor, retain=True)
+    duracaoPublicacao.observar(time.perf_counter() - inicio)
+
+
+maquinaAlerta = MaquinaAlerta(publicarAlerta, ciclosParaLigar=CICLOS_PARA_LIGAR,
+                              ciclosParaDesligar=CICLOS_PARA_DESLIGAR,
+                              intervaloRenovacao=INTERVALO_RENOVACAO_ALERTA)
+metricas.medidor('alertas_publicados', lambda: maquinaAlerta.publicadas, 'alertas publicados')
+metricas.medidor('alertas_suprimidos', lambda: maquinaAlerta.suprimidas, 'classificacoes sem mudanca de estado')
+
+
+def publicarClasse(columns, classe, contexto=None):
+
+    print('Classe: {}'.format(classe))
+
+    # contexto = dispositivo (None quando a mensagem nao o identifica)
+    maquinaAlerta.registrar(contexto, classe)
+
+
+def predizerLote(matriz):
+    # Le a referencia global uma unica vez por lote
+    modelo = clfa
+    return modelo.predict(matriz)
+
+
+def classificarMedicao(columns):
+
+    # columns = [hora, minuto, temp_minima, temp_maxima, latitude, longitude]
+    baseTeste = montarMatrizFeatures([columns])
+
+#    baseTeste = montarMatrizFeatures([columns])[:, :2]
+
+    predicted = predizerLote(baseTeste)
+
+    publicarClasse(columns, predicted[0])
+
+
+classificador = ClassificadorEmLote(predizerLote, publicarClasse,
+                                    janelaSegundos=JANELA_LOTE_SEGUNDOS,
+                                    tamanhoMaximo=TAMANHO_MAXIMO_LOTE,
+                                    metricas=metricas)
+
+recarregador = RecarregadorModelo(aplicarModelo, intervalo=INTERVALO_RECARGA_MODELO, compilar=COMPILAR_MODELO,
+                                  ajustarGrade=AJUSTAR_GRADE_MODELO)
+
+
+def emitirAgregado(dispositivo, janela, columns):
+
+    print("Medios agregado no servidor ({}): '{}'".format(dispositivo, ';'.join(str(valor) for valor in columns)))
+
+    classificador.adicionarMedicao(columns, dispositivo)
+
+    if colunarMedios is not None:
+        colunarMedios.adicionar(dispositivo, janela, *columns)
+
+
+agregador = AgregadorHorario(emitirAgregado, atrasoPermitido=ATRASO_AGREGACAO,
+                             maximoDispositivos=MAXIMO_DISPOSITIVOS_AGREGACAO)
+metricas.medidor('agregacao_dispositivos', agregador.__len__, 'dispositivos com janela aberta')
+
+gravadorInstantaneos = GravadorLog('/root/om/instantaneos.csv', tamanhoLote=TAMANHO_LOTE_LOG,
+                                   intervaloFlush=INTERVALO_FLUSH_LOG, durabilidade=DURABILIDADE_LOG,
+                                   rotacao=ROTACAO_LOG, metricas=metricas)
+gravadorMedios = GravadorLog('/root/om/medios.csv', tamanhoLote=TAMANHO_LOTE_LOG,
+                             intervaloFlush=INTERVALO_FLUSH_LOG, durabilidade=DURABILIDADE_LOG,
+                             rotacao=ROTACAO_LOG, metricas=metricas)
+
+if RAIZ_COLUNAR is not None:
+    colunarInstantaneos = ArmazenamentoColunar(RAIZ_COLUNAR, 'instantaneos')
+    colunarMedios = ArmazenamentoColunar(RAIZ_COLUNAR, 'medios')
+else:
+    colunarInstantaneos = None
+    colunarMedios = None
+
+
+def armazenarColunar(topico, columns):
+    # Medios: hora;minuto;temp_minima;temp_maxima;latitude;longitude (carimbado na chegada)
+    try:
+        colunarMedios.adicionar('desconhecido', time.time(), *[float(valor) for valor in columns[:6]])
+    except (ValueError, IndexError, TypeError):
+        print('Linha ignorada no historico colunar: {}'.format(';'.join(columns)))
+
+
+def registrarInstantaneo(registro):
+    # registro = (dispositivo, tempo, temperatura, latitude, longitude)
+    if colunarInstantaneos is not None:
+        colunarInstantaneos.adicionar(*registro)
+
+    if AGREGACAO_NO_SERVIDOR:
+        agregador.adicionar(*registro)
+
+
+def on_connect(client, userdata, flags, rc):
+    conexoes.incrementar()
+    # Renova as assinaturas a cada reconexao
+    client.subscribe("main/OMIoT/team/valores_instantaneos")
+    client.subscribe("main/OMIoT/team/valores_medios")
+
+
+def on_disconnect(client, userdata, rc):
+    desconexoes.incrementar()
 
 
 def on_message(client, userdata, msg):
 
-    menssagem = msg.payload.decode()
+    inicio = time.perf_counter()
     topico = msg.topic 
 
-    if topico == 'main/OMIoT/team/valores_instantaneos':
+    contador = mensagensRecebidas.get(topico)
+    if contador is not None:
+        contador.incrementar()
+
+    if formato_binario.versaoPayload(msg.payload) is not None:
+        try:
+            tipo, registros = formato_binario.decodificar(msg.payload)
+        except (ValueError, struct.error) as erro:
+            mensagensInvalidas.incrementar()
+            print("Payload binario ignorado em '{}': {}".format(topico, erro))
+            return
+        for registro in registros:
+            processarRegistro(topico, registro)
+    else:
+        # Uma mensagem pode trazer um lote de leituras, uma por linha (PublicadorEmLote)
+        for menssagem in msg.payload.decode().split('\n'):
+            if menssagem:
+                processarLinha(topico, menssagem)
 
-        columns = menssagem.split(';')
+    duracaoMensagem.observar(time.perf_counter() - inicio)
+
+
+def processarRegistro(topico, registro):
 
+    if topico == 'main/OMIoT/team/valores_instantaneos' and len(registro) == 5:
+
+        menssagem = formato_binario.textoInstantaneo(registro)
         print("Instataneos importado:'{}'".format(menssagem))
 
-        #Append
-        with open('/root/om/instantaneos.csv','a') as fd:
-            fd.write('{}\n'.format(menssagem))
+        #Append no mesmo formato texto (gravado em lote pelo GravadorLog)
+        gravadorInstantaneos.escrever(menssagem)
 
-    elif topico == 'main/OMIoT/team/valores_medios':
-        columns = menssagem.split(';')
+        registrarInstantaneo(registro)
 
-        classificarMedicao(columns)
+    elif topico == 'main/OMIoT/team/valores_medios' and len(registro) == 8:
+        # hora;minuto;temp_minima;temp_maxima;latitude;longitude ja numericos
+        columns = list(registro[2:])
 
+        if not AGREGACAO_NO_SERVIDOR:
+            classificador.adicionarMedicao(columns, registro[0])
+
+        menssagem = formato_binario.textoMedio(registro)
         print("Medios importado:'{}'".format(menssagem))
 
-        #Append
-        with open('/root/om/medios.csv','a') as fd:
-            fd.write('{}\n'.format(menssagem))
+        gravadorMedios.escrever(menssagem)
+
+        if colunarMedios is not None and not AGREGACAO_NO_SERVIDOR:
+            # O formato binario traz o dispositivo e o horario da medicao
+            colunarMedios.adicionar(registro[0], registro[1], *columns)
+
+
+def processarLinha(topico, menssagem):
+
+    if topico == 'main/OMIoT/team/valores_instantaneos':
+
+        print("Instataneos importado:'{}'".format(menssagem))
 
-treinarClassificadorKNN()
+        #Append (gravado em lote pelo GravadorLog)
+        gravadorInstantaneos.escrever(menssagem)
 
-client.on_message = on_message
-client.loop_start()
-client.subscribe("main/OMIoT/team/valores_instantaneos")
-client.subscribe("main/OMIoT/team/valores_medios")
+        try:
+            registro = formato_binario.lerTextoInstantaneo(menssagem)
+        except ValueError:
+            print('Linha de instantaneos invalida: {}'.format(menssagem))
+            return
+
+        registrarInstantaneo(registro)
+
+    elif topico == 'main/OMIoT/team/valores_medios':
+        columns = menssagem.split(';')
+
+        # Classificacao feita em lote fora da thread de rede do paho
+        if not AGREGACAO_NO_SERVIDOR:
+            classificador.adicionarMedicao(columns)
+
+        print("Medios importado:'{}'".format(menssagem))
 
-time.sleep(1 * 60 * 60 * 24 * 15) 
+        #Append (gravado em lote pelo GravadorLog)
+        gravadorMedios.escrever(menssagem)
+
+        if colunarMedios is not None and not AGREGACAO_NO_SERVIDOR:
+            armazenarColunar(topico, columns)
+
+
+def encerrarServico():
+    # Para de receber, classifica o que falta e drena os buffers de gravacao;
+    # uma etapa que falha nao impede as seguintes
+    etapas = [('cliente MQTT', client.loop_stop),
+              ('recarregador do modelo', recarregador.encerrar),
+              ('agregador', agregador.encerrar),
+              ('classificador', classificador.encerrar),
+              ('maquina de alerta', maquinaAlerta.encerrar),
+              ('estado dos alertas', lambda: maquinaAlerta.salvarEstado(CAMINHO_ESTADO_ALERTAS)),
+              ('instantaneos.csv', gravadorInstantaneos.fechar),
+              ('medios.csv', gravadorMedios.fechar)]
+    if RAIZ_COLUNAR is not None:
+        etapas += [('colunar instantaneos', colunarInstantaneos.fechar),
+                   ('colunar medios', colunarMedios.fechar)]
+    if METRICAS_ARQUIVO is not None:
+        etapas.append(('snapshot de metricas', lambda: metricas.gravarSnapshot(METRICAS_ARQUIVO)))
+    etapas.append(('metricas', metricas.encerrar))
+
+    for nome, etapa in etapas:
+        try:
+            etapa()
+        except Exception as erro:
+            print('Erro ao encerrar {}: {}'.format(nome, erro))
+
+
+if __name__ == '__main__':
+
+    # SIGTERM encerra de forma limpa (drenando os buffers), como o Ctrl+C
+    signal.signal(signal.SIGTERM, lambda signum, frame: sys.exit(0))
+
+    if METRICAS_PORTA is not None:
+        metricas.iniciarServidor(METRICAS_PORTA)
+    if METRICAS_ARQUIVO is not None:
+        metricas.iniciarSnapshot(METRICAS_ARQUIVO, INTERVALO_METRICAS)
+
+    client.on_disconnect = on_disconnect
+    client.connect(BROKER, PORTA_BROKER)
+    conexoes.incrementar()
+    client.loop_start()
+
+    carregarClassificadorKNN()
+    gravadorInstantaneos.iniciar()
+    gravadorMedios.iniciar()
+    if RAIZ_COLUNAR is not None:
+        colunarInstantaneos.iniciar()
+        colunarMedios.iniciar()
+    classificador.iniciar()
+    try:
+        print('Estado de alertas restaurado: {} dispositivos'.format(maquinaAlerta.carregarEstado(CAMINHO_ESTADO_ALERTAS)))
+    except (OSError, ValueError) as erro:
+        print('Erro ao ler estado dos alertas: {}'.format(erro))
+    maquinaAlerta.iniciar(CAMINHO_ESTADO_ALERTAS)
+    recarregador.iniciar()
+    if AGREGACAO_NO_SERVIDOR:
+        agregador.iniciar()
+
+    client.on_message = on_message
+    client.on_connect = on_connect
+    client.subscribe("main/OMIoT/team/valores_instantaneos")
+    client.subscribe("main/OMIoT/team/valores_medios")
+
+    try:
+        # Novos modelos sao aplicados pelo recarregador sem reiniciar o servico
+        time.sleep(1 * 60 * 60 * 24 * 15) 
+    except KeyboardInterrupt:
+        pass
+    finally:
+        encerrarServico()
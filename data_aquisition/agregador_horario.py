@@ -0,0 +1,188 @@
+"""
+Server-side incremental hourly aggregation of `valores_instantaneos`, per device.
+
+1. **Problem:**
+   - The hourly `valores_medios` are computed on the Raspberry Pi and only sent when its sample loop sees the hour
+     change; if the Pi reboots or misses the rollover, that hour never reaches the classifier.
+
+2. **State Table:**
+   - One `EstadoDispositivo` (`__slots__`: window start, count, running sums of hour/minute/latitude/longitude,
+     minimum and maximum temperature) per device, updated in O(1) by every instantaneous reading.
+   - The aggregate has the same columns as the device message: `hora;minuto;temp_minima;temp_maxima;latitude;longitude`
+     (averages of hour, minute and coordinates, min/max of the temperature).
+
+3. **Window Closing:**
+   - A reading from a later hour closes the device's current window and emits it.
+   - A periodic sweep (`varrer`) emits and drops the windows that ended more than `atrasoPermitido` seconds ago,
+     so a device that stopped sending (reboot, network loss) still gets its last hour classified.
+   - Readings older than the device's open window (late arrivals) are counted in `atrasadas` and ignored.
+   - After a sweep or an eviction the device has no open window, so the start of its last emitted window is kept
+     in `fechadas` (least-recently-closed order, at most `maximoDispositivos` devices); a reading for that window
+     or an earlier one (e.g. the offline queue of `publicador_lote.py` drained after a reconnect) is late too,
+     instead of opening a second partial window for an hour already emitted.
+   - `encerrar` does not emit the windows still open (incomplete hour, it would be emitted again after a restart);
+     they are counted in `descartadasEncerramento` and logged.
+   - Windows are aligned to `duracaoJanela` on the epoch, which matches the local hour for whole-hour UTC offsets.
+
+4. **Bounded Memory:**
+   - Devices are kept in an `OrderedDict` in least-recently-updated order; above `maximoDispositivos`,
+     the idle device at the front is emitted and evicted (`despejados`).
+"""
+
+import threading
+import time
+from collections import OrderedDict
+
+
+class EstadoDispositivo(object):
+
+    __slots__ = ('janela', 'quantidade', 'somaHora', 'somaMinuto', 'temperaturaMinima', 'temperaturaMaxima',
+                 'somaLatitude', 'somaLongitude')
+
+    def __init__(self, janela):
+        self.janela = janela
+        self.quantidade = 0
+        self.somaHora = 0.0
+        self.somaMinuto = 0.0
+        self.temperaturaMinima = None
+        self.temperaturaMaxima = None
+        self.somaLatitude = 0.0
+        self.somaLongitude = 0.0
+
+    def adicionar(self, hora, minuto, temperatura, latitude, longitude):
+        self.quantidade += 1
+        self.somaHora += hora
+        self.somaMinuto += minuto
+        self.somaLatitude += latitude
+        self.somaLongitude += longitude
+        if self.temperaturaMinima is None or temperatura < self.temperaturaMinima:
+            self.temperaturaMinima = temperatura
+        if self.temperaturaMaxima is None or temperatura > self.temperaturaMaxima:
+            self.temperaturaMaxima = temperatura
+
+    def medias(self):
+        # [hora, minuto, temp_minima, temp_maxima, latitude, longitude]
+        return [self.somaHora / self.quantidade, self.somaMinuto / self.quantidade,
+                self.temperaturaMinima, self.temperaturaMaxima,
+                self.somaLatitude / self.quantidade, self.somaLongitude / self.quantidade]
+
+
+class AgregadorHorario(object):
+
+    def __init__(self, emitir, duracaoJanela=3600, atrasoPermitido=120, maximoDispositivos=10000,
+                 intervaloVarredura=60):
+        # emitir(dispositivo, janela, columns) -> None
+        self.emitir = emitir
+        self.duracaoJanela = duracaoJanela
+        self.atrasoPermitido = atrasoPermitido
+        self.maximoDispositivos = maximoDispositivos
+        self.intervaloVarredura = intervaloVarredura
+
+        self.estados = OrderedDict()
+        # dispositivo -> inicio da ultima janela emitida, para dispositivos sem janela aberta
+        self.fechadas = OrderedDict()
+        self.trava = threading.Lock()
+
+        self.parar = threading.Event()
+        self.thread = None
+
+        # Contadores
+        self.leituras = 0
+        self.emitidas = 0
+        self.atrasadas = 0
+        self.despejados = 0
+        self.descartadasEncerramento = 0
+
+    def __len__(self):
+        return len(self.estados)
+
+    def adicionar(self, dispositivo, tempo, temperatura, latitude, longitude):
+        janela = int(tempo) - int(tempo) % self.duracaoJanela
+        momento = time.localtime(tempo)
+        prontas = []
+
+        with self.trava:
+            self.leituras += 1
+            estado = self.estados.get(dispositivo)
+
+            if estado is not None and janela < estado.janela:
+                self.atrasadas += 1
+                return
+
+            if estado is None and dispositivo in self.fechadas:
+                if janela <= self.fechadas[dispositivo]:
+                    # Janela ja emitida pela varredura ou pelo despejo
+                    self.atrasadas += 1
+                    return
+                del self.fechadas[dispositivo]
+
+            if estado is None or janela > estado.janela:
+                if estado is not None and estado.quantidade:
+                    prontas.append((dispositivo, estado))
+                estado = EstadoDispositivo(janela)
+                self.estados[dispositivo] = estado
+
+            estado.adicionar(momento.tm_hour, momento.tm_min, temperatura, latitude, longitude)
+            self.estados.move_to_end(dispositivo)
+
+            # Memoria limitada: despeja o dispositivo ha mais tempo sem leituras
+            while len(self.estados) > self.maximoDispositivos:
+                antigo, estadoAntigo = self.estados.popitem(last=False)
+                self.despejados += 1
+                self._registrarFechada(antigo, estadoAntigo.janela)
+                if estadoAntigo.quantidade:
+                    prontas.append((antigo, estadoAntigo))
+
+        self._emitir(prontas)
+
+    def varrer(self, agora=None):
+        # Emite e remove as janelas encerradas ha mais de atrasoPermitido segundos
+        agora = time.time() if agora is None else agora
+        limite = agora - self.duracaoJanela - self.atrasoPermitido
+        prontas = []
+
+        with self.trava:
+            for dispositivo in [dispositivo for dispositivo, estado in self.estados.items() if estado.janela <= limite]:
+                estado = self.estados.pop(dispositivo)
+                self._registrarFechada(dispositivo, estado.janela)
+                if estado.quantidade:
+                    prontas.append((dispositivo, estado))
+
+        self._emitir(prontas)
+        return len(prontas)
+
+    def _registrarFechada(self, dispositivo, janela):
+        # Chamado com a trava; limitado como a tabela de estados (remove o fechado ha mais tempo)
+        self.fechadas[dispositivo] = janela
+        self.fechadas.move_to_end(dispositivo)
+        while len(self.fechadas) > self.maximoDispositivos:
+            self.fechadas.popitem(last=False)
+
+    def _emitir(self, prontas):
+        # Fora da trava: o callback pode classificar/publicar
+        for dispositivo, estado in prontas:
+            self.emitidas += 1
+            try:
+                self.emitir(dispositivo, estado.janela, estado.medias())
+            except Exception as erro:
+                print('Erro ao emitir agregado de {}: {}'.format(dispositivo, erro))
+
+    def iniciar(self):
+        self.thread = threading.Thread(target=self._executar, name='agregador-horario', daemon=True)
+        self.thread.start()
+
+    def encerrar(self):
+        # Janelas ainda abertas sao descartadas (hora incompleta), mas contadas
+        self.parar.set()
+        if self.thread is not None:
+            self.thread.join()
+        with self.trava:
+            abertas = sum(1 for estado in self.estados.values() if estado.quantidade)
+            self.estados.clear()
+        self.descartadasEncerramento += abertas
+        if abertas:
+            print('Agregador encerrado com {} janelas abertas descartadas'.format(abertas))
+
+    def _executar(self):
+        while not self.parar.wait(self.intervaloVarredura):
+            self.varrer()
@@ -0,0 +1,220 @@
+"""
+Background sensor sampling, decoupled from the publishing loop of `remote_iot.py`.
+
+1. **Sampling Thread:**
+   - `Amostrador` reads the sensor on its own thread at a fixed cadence (`intervalo` seconds), scheduled on
+     the monotonic clock, so slow reads/retries do not shift the following samples.
+   - If a read takes longer than the interval, the missed slots are skipped instead of bursting.
+   - Each `Amostra` is timestamped (`time.time()`) when the reading is acquired, not when it is consumed.
+   - Samples are handed to the publishing loop through a bounded `queue.Queue`; when the consumer falls behind,
+     the oldest sample is dropped and counted in `descartadas`.
+
+2. **Sensor Backends:**
+   - `dht11`: the real DHT11 through `Adafruit_DHT` (imported only when this backend is used).
+   - `falso`: synthetic temperature/humidity (daily sine wave + noise), optional artificial read latency.
+   - `replay`: replays the temperatures of a `resultadoRemoto.csv` file.
+   - The `falso` and `replay` backends let the whole acquisition loop run on a machine without
+     `Adafruit_DHT` or `RPi.GPIO`.
+
+3. **Benchmark:**
+   ```bash
+   python amostrador.py --sensor falso --intervalo 0.01 --duracao 5 --latencia 0.002
+   ```
+   - Prints the number of samples, the effective rate, read time and the cadence jitter (p50/p99).
+"""
+
+#! /usr/bin/env python
+import argparse
+import math
+import queue
+import random
+import threading
+import time
+from collections import namedtuple
+
+Amostra = namedtuple('Amostra', ['tempo', 'umidade', 'temperatura', 'duracaoLeitura'])
+
+
+class SensorDHT11(object):
+
+    def __init__(self, pino=4, tentativas=15, intervaloTentativa=2):
+        import Adafruit_DHT
+        self.dht = Adafruit_DHT
+        self.pino = pino
+        self.tentativas = tentativas
+        self.intervaloTentativa = intervaloTentativa
+
+    def ler(self):
+        return self.dht.read_retry(self.dht.DHT11, self.pino, self.tentativas, self.intervaloTentativa)
+
+
+class SensorFalso(object):
+
+    def __init__(self, temperatura=22.0, variacao=6.0, ruido=0.5, latencia=0.0, semente=None):
+        self.temperatura = temperatura
+        self.variacao = variacao
+        self.ruido = ruido
+        self.latencia = latencia
+        self.aleatorio = random.Random(semente)
+
+    def ler(self):
+        if self.latencia:
+            time.sleep(self.latencia)
+        # Ciclo diario: minimo de madrugada, maximo a tarde
+        fase = (time.time() % 86400) / 86400.0 * 2 * math.pi
+        temperatura = self.temperatura - self.variacao * math.cos(fase - math.pi / 6)
+        temperatura = round(temperatura + self.aleatorio.gauss(0, self.ruido))
+        umidade = round(60 + self.aleatorio.gauss(0, 5))
+        return umidade, temperatura
+
+
+class SensorReplay(object):
+
+    def __init__(self, caminho, repetir=True):
+        # resultadoRemoto.csv: id;ano;mes;dia;hora;minuto;segundo;temperatura;latitude;longitude
+        self.temperaturas = []
+        with open(caminho) as arquivo:
+            for linha in arquivo:
+                columns = linha.strip().split(';')
+                try:
+                    self.temperaturas.append(float(columns[7]))
+                except (IndexError, ValueError):
+                    continue
+        if not self.temperaturas:
+            raise ValueError('Nenhuma temperatura em {}'.format(caminho))
+        self.repetir = repetir
+        self.posicao = 0
+
+    def ler(self):
+        if self.posicao >= len(self.temperaturas):
+            if not self.repetir:
+                return None, None
+            self.posicao = 0
+        temperatura = self.temperaturas[self.posicao]
+        self.posicao += 1
+        return None, temperatura
+
+
+SENSORES = {'dht11': SensorDHT11, 'falso': SensorFalso, 'replay': SensorReplay}
+
+
+def criarSensor(nome, *args, **opcoes):
+    return SENSORES[nome](*args, **opcoes)
+
+
+class Amostrador(object):
+
+    def __init__(self, sensor, intervalo=5.0, tamanhoFila=1000):
+        self.sensor = sensor
+        self.intervalo = intervalo
+        self.fila = queue.Queue(tamanhoFila)
+
+        self.parar = threading.Event()
+        self.thread = None
+
+        # Contadores
+        self.leituras = 0
+        self.falhas = 0
+        self.descartadas = 0
+        self.atrasos = 0
+
+    def iniciar(self):
+        self.thread = threading.Thread(target=self._executar, name='amostrador', daemon=True)
+        self.thread.start()
+
+    def encerrar(self):
+        self.parar.set()
+        if self.thread is not None:
+            self.thread.join()
+
+    def _entregar(self, amostra):
+        # Nunca bloqueia o amostrador: descarta a amostra mais antiga se a fila estiver cheia
+        while True:
+            try:
+                self.fila.put_nowait(amostra)
+                return
+            except queue.Full:
+                try:
+                    self.fila.get_nowait()
+                    self.descartadas += 1
+                except queue.Empty:
+                    pass
+
+    def _executar(self):
+        proxima = time.monotonic()
+        while not self.parar.is_set():
+            inicio = time.monotonic()
+            try:
+                umidade, temperatura = self.sensor.ler()
+            except Exception as erro:
+                print('Erro na leitura do sensor: {}'.format(erro))
+                umidade, temperatura = None, None
+            duracao = time.monotonic() - inicio
+
+            if temperatura is None:
+                self.falhas += 1
+            else:
+                self.leituras += 1
+                self._entregar(Amostra(time.time(), umidade, float(temperatura), duracao))
+
+            # Proximo horario fixo; pula os horarios perdidos por uma leitura lenta
+            proxima += self.intervalo
+            agora = time.monotonic()
+            if proxima < agora:
+                perdidos = int((agora - proxima) // self.intervalo) + 1
+                proxima += perdidos * self.intervalo
+                self.atrasos += perdidos
+            self.parar.wait(proxima - agora)
+
+    def obter(self, timeout=None):
+        return self.fila.get(timeout=timeout)
+
+
+def percentil(valores, p):
+    if not valores:
+        return 0.0
+    ordenados = sorted(valores)
+    return ordenados[min(len(ordenados) - 1, int(p / 100.0 * len(ordenados)))]
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark do amostrador de sensores')
+    parser.add_argument('--sensor', choices=sorted(SENSORES), default='falso')
+    parser.add_argument('--replay', help='CSV para o sensor replay')
+    parser.add_argument('--intervalo', type=float, default=0.01)
+    parser.add_argument('--duracao', type=float, default=5.0)
+    parser.add_argument('--latencia', type=float, default=0.0, help='latencia artificial do sensor falso')
+    args = parser.parse_args()
+
+    if args.sensor == 'replay':
+        sensor = criarSensor('replay', args.replay)
+    elif args.sensor == 'falso':
+        sensor = criarSensor('falso', latencia=args.latencia, semente=42)
+    else:
+        sensor = criarSensor('dht11')
+
+    amostrador = Amostrador(sensor, args.intervalo)
+    amostrador.iniciar()
+
+    amostras = []
+    fim = time.monotonic() + args.duracao
+    while time.monotonic() < fim:
+        try:
+            amostras.append(amostrador.obter(timeout=0.1))
+        except queue.Empty:
+            pass
+    amostrador.encerrar()
+
+    tempos = [amostra.tempo for amostra in amostras]
+    jitter = [abs((b - a) - args.intervalo) * 1000 for a, b in zip(tempos, tempos[1:])]
+    leitura = [amostra.duracaoLeitura * 1000 for amostra in amostras]
+
+    print('{} amostras em {:.1f}s ({:.1f}/s), {} falhas, {} atrasos, {} descartadas'.format(
+        len(amostras), args.duracao, len(amostras) / args.duracao, amostrador.falhas,
+        amostrador.atrasos, amostrador.descartadas))
+    print('leitura p50 {:.3f}ms p99 {:.3f}ms | jitter p50 {:.3f}ms p99 {:.3f}ms'.format(
+        percentil(leitura, 50), percentil(leitura, 99), percentil(jitter, 50), percentil(jitter, 99)))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,349 @@
+"""
+Columnar, time-indexed storage for the sensor history (instantaneous and hourly readings).
+
+1. **Layout:**
+   - `<raiz>/<esquema>/<AAAA-MM-DD>/<dispositivo>/bloco_NNNNN.npy` holds typed NumPy structured arrays
+     (epoch timestamp as int64, temperatures and coordinates as float64), sorted by time.
+   - Each partition (day + device) has an `indice.json` listing its blocks with first/last timestamp and row count.
+   - Blocks and indexes are written to temporary files and renamed, so readers never see partial data.
+   - Every block has `tamanhoBloco` rows except the last one of the partition (the tail). Full blocks are written
+     as they fill up; every `intervaloFlush` seconds the rows still pending are merged into the tail, which is
+     rewritten under a new name and replaces its index entry (the old file is removed), so a slow device is
+     readable within one interval and a partition keeps a single small block.
+   - When a write fails (`OSError`), the index is unchanged and the rows go back to the pending buffer, to be
+     retried on the next flush instead of being lost.
+
+2. **Schemas:**
+   - `instantaneos`: `tempo`, `temperatura`, `latitude`, `longitude` (one row per `valores_instantaneos` reading).
+   - `medios`: `tempo`, `hora`, `minuto`, `temp_minima`, `temp_maxima`, `latitude`, `longitude`.
+
+3. **Queries:**
+   - `consultar(inicio, fim, dispositivo=None)` only opens the day directories in the range and, inside them,
+     only the blocks whose `[inicio, fim]` overlaps the query (memory-mapped), e.g. "device X, last 24h"
+     or "all devices, hour 14 on date D".
+
+4. **Import / Export:**
+   - `importarCsvInstantaneos` loads `resultadoRemoto.csv` / `instantaneos.csv`
+     (`id;ano;mes;dia;hora;minuto;segundo;temperatura;latitude;longitude`).
+   - `exportarCsv` writes `dispositivo;hora;minuto;ano;mes;dia;temperatura;latitude;longitude`,
+     the format read by `pre_processing/map_database.py`, in time order: the partitions of each day are merged
+     by timestamp (devices interleaved), since the event-time watermark of `pre_processing/janelas.py` would
+     drop most of a device-by-device dump as late.
+   - The hourly CSVs (`resultadoMedio.csv`, `medios.csv`) carry no device or timestamp, so `medios`
+     is only filled by the ingestion service, which stamps each message on arrival.
+
+**Example Usage:**
+   ```bash
+   python armazenamento_colunar.py importar /root/om/instantaneos.csv
+   python armazenamento_colunar.py consultar --dispositivo b8:27:eb:00:00:01 --horas 24
+   python armazenamento_colunar.py exportar --inicio 2025-01-15 --fim 2025-01-16 saida.csv
+   ```
+"""
+
+#! /usr/bin/env python
+import argparse
+import json
+import os
+import sys
+import threading
+import time
+from datetime import datetime, timedelta
+from urllib.parse import quote, unquote
+
+import numpy as np
+
+import formato_binario
+
+RAIZ_ARMAZENAMENTO = '/root/om/colunar'
+
+ESQUEMAS = {
+    'instantaneos': np.dtype([('tempo', '<i8'), ('temperatura', '<f8'), ('latitude', '<f8'), ('longitude', '<f8')]),
+    'medios': np.dtype([('tempo', '<i8'), ('hora', '<f8'), ('minuto', '<f8'), ('temp_minima', '<f8'),
+                        ('temp_maxima', '<f8'), ('latitude', '<f8'), ('longitude', '<f8')]),
+}
+
+
+def dataDoTempo(tempo):
+    return datetime.fromtimestamp(tempo).strftime('%Y-%m-%d')
+
+
+def gravarAtomico(caminho, gravar):
+    temporario = '{}.tmp.{}'.format(caminho, os.getpid())
+    gravar(temporario)
+    os.replace(temporario, caminho)
+
+
+class ArmazenamentoColunar(object):
+
+    def __init__(self, raiz=RAIZ_ARMAZENAMENTO, esquema='instantaneos', tamanhoBloco=4096, intervaloFlush=60):
+        self.raiz = os.path.join(raiz, esquema)
+        self.esquema = esquema
+        self.dtype = ESQUEMAS[esquema]
+        self.tamanhoBloco = tamanhoBloco
+        self.intervaloFlush = intervaloFlush
+
+        # (data, dispositivo) -> lista de tuplas ainda nao gravadas
+        self.pendentes = {}
+        self.trava = threading.Lock()
+        self.travaDisco = threading.Lock()
+
+        self.parar = threading.Event()
+        self.thread = None
+
+    # ---------------------------------------------------------------- escrita
+
+    def adicionar(self, dispositivo, tempo, *valores):
+        # Apenas memoria; a gravacao dos blocos e feita por descarregar()
+        tempo = int(tempo)
+        chave = (dataDoTempo(tempo), dispositivo)
+        with self.trava:
+            self.pendentes.setdefault(chave, []).append((tempo,) + tuple(valores))
+
+    def iniciar(self):
+        self.thread = threading.Thread(target=self._executar, name='armazenamento-colunar', daemon=True)
+        self.thread.start()
+
+    def fechar(self):
+        self.parar.set()
+        if self.thread is not None:
+            self.thread.join()
+        self.descarregar(completo=True)
+
+    def _executar(self):
+        while not self.parar.wait(self.intervaloFlush):
+            try:
+                self.descarregar(parcial=True)
+            except OSError as erro:
+                print('Erro ao gravar blocos em {}: {}'.format(self.raiz, erro))
+
+    def descarregar(self, completo=False, parcial=False):
+        # Grava os blocos cheios (ou tudo quando completo=True, ou em dias ja encerrados).
+        # parcial=True (timer) grava tambem as linhas restantes, juntando-as ao bloco final da particao
+        hoje = dataDoTempo(time.time())
+        with self.trava:
+            prontos = {}
+            for chave, linhas in list(self.pendentes.items()):
+                if completo or parcial or chave[0] < hoje or len(linhas) >= self.tamanhoBloco:
+                    prontos[chave] = linhas
+                    del self.pendentes[chave]
+
+        with self.travaDisco:
+            itens = list(prontos.items())
+            for posicao, ((data, dispositivo), linhas) in enumerate(itens):
+                try:
+                    self._gravarLinhas(data, dispositivo, linhas)
+                except OSError:
+                    # Devolve o que nao foi gravado para a proxima tentativa
+                    self._devolver(itens[posicao:])
+                    raise
+
+    def _devolver(self, itens):
+        # Linhas devolvidas ficam antes das que chegaram durante a gravacao
+        with self.trava:
+            for chave, linhas in itens:
+                self.pendentes[chave] = linhas + self.pendentes.get(chave, [])
+
+    def _diretorioParticao(self, data, dispositivo):
+        return os.path.join(self.raiz, data, quote(dispositivo, safe=''))
+
+    def _lerIndice(self, diretorio):
+        try:
+            with open(os.path.join(diretorio, 'indice.json')) as arquivo:
+                return json.load(arquivo)
+        except (OSError, ValueError):
+            return None
+
+    def _gravarLinhas(self, data, dispositivo, linhas):
+        # Junta as linhas ao bloco final incompleto e grava em blocos de tamanhoBloco; o indice so muda no fim
+        diretorio = self._diretorioParticao(data, dispositivo)
+        os.makedirs(diretorio, exist_ok=True)
+
+        indice = self._lerIndice(diretorio) or {'dispositivo': dispositivo, 'data': data, 'blocos': []}
+        blocos = indice['blocos']
+        proximo = indice.get('proximo', len(blocos))
+
+        dados = np.array(linhas, dtype=self.dtype)
+        substituido = None
+        if blocos and blocos[-1]['linhas'] < self.tamanhoBloco:
+            substituido = blocos.pop()
+            anterior = np.load(os.path.join(diretorio, substituido['arquivo']))
+            dados = np.concatenate([anterior, dados])
+        dados.sort(order='tempo', kind='stable')
+
+        for inicio in range(0, len(dados), self.tamanhoBloco):
+            bloco = dados[inicio:inicio + self.tamanhoBloco]
+            # Nome novo a cada gravacao: o bloco final substituido continua valido ate o indice ser trocado
+            nome = 'bloco_{:05d}.npy'.format(proximo)
+            proximo += 1
+
+            def gravarNpy(caminho):
+                with open(caminho, 'wb') as arquivo:
+                    np.save(arquivo, bloco)
+
+            gravarAtomico(os.path.join(diretorio, nome), gravarNpy)
+            blocos.append({'arquivo': nome, 'inicio': int(bloco['tempo'][0]),
+                           'fim': int(bloco['tempo'][-1]), 'linhas': len(bloco)})
+
+        indice['proximo'] = proximo
+
+        def gravarIndice(caminho):
+            with open(caminho, 'w') as arquivo:
+                json.dump(indice, arquivo)
+
+        gravarAtomico(os.path.join(diretorio, 'indice.json'), gravarIndice)
+
+        if substituido is not None:
+            try:
+                os.remove(os.path.join(diretorio, substituido['arquivo']))
+            except OSError:
+                pass
+
+    # ---------------------------------------------------------------- leitura
+
+    def _datasNoIntervalo(self, inicio, fim):
+        dia = datetime.fromtimestamp(inicio).date()
+        ultimo = datetime.fromtimestamp(fim).date()
+        while dia <= ultimo:
+            yield dia.strftime('%Y-%m-%d')
+            dia += timedelta(days=1)
+
+    def consultar(self, inicio, fim, dispositivo=None):
+        # Gera (dispositivo, array) apenas com as linhas em [inicio, fim]
+        inicio = int(inicio)
+        fim = int(fim)
+
+        for data in self._datasNoIntervalo(inicio, fim):
+            diretorioData = os.path.join(self.raiz, data)
+            if dispositivo is not None:
+                nomes = [quote(dispositivo, safe='')]
+            elif os.path.isdir(diretorioData):
+                nomes = sorted(os.listdir(diretorioData))
+            else:
+                continue
+
+            for nome in nomes:
+                partes = self._lerParticao(os.path.join(diretorioData, nome), inicio, fim)
+                if partes:
+                    resultado = np.concatenate(partes)
+                    resultado.sort(order='tempo', kind='stable')
+                    yield unquote(nome), resultado
+
+
+    def _lerParticao(self, diretorio, inicio, fim):
+        # Trechos dos blocos em [inicio, fim]; le o indice de novo se o bloco final foi substituido na leitura
+        for _ in range(3):
+            indice = self._lerIndice(diretorio)
+            if indice is None:
+                return []
+            try:
+                partes = []
+                for bloco in indice['blocos']:
+                    if bloco['fim'] < inicio or bloco['inicio'] > fim:
+                        continue
+                    dados = np.load(os.path.join(diretorio, bloco['arquivo']), mmap_mode='r')
+                    de, ate = np.searchsorted(dados['tempo'], [inicio, fim + 1])
+                    if ate > de:
+                        partes.append(np.array(dados[de:ate]))
+                return partes
+            except FileNotFoundError:
+                continue
+        return []
+
+
+# -------------------------------------------------------------------- CSV
+
+def importarCsvInstantaneos(caminho, armazenamento):
+    # id;ano;mes;dia;hora;minuto;segundo;temperatura;latitude;longitude
+    total = 0
+    with open(caminho) as arquivo:
+        for linha in arquivo:
+            try:
+                armazenamento.adicionar(*formato_binario.lerTextoInstantaneo(linha))
+            except ValueError:
+                continue
+            total += 1
+    armazenamento.descarregar(completo=True)
+    return total
+
+
+def _exportarDia(particoes, saida):
+    # Intercala as particoes de um dia por tempo (estavel: empates seguem a ordem dos dispositivos)
+    dispositivos = np.concatenate([np.full(len(dados), posicao) for posicao, (_, dados) in enumerate(particoes)])
+    dados = np.concatenate([dados for _, dados in particoes])
+    ordem = np.argsort(dados['tempo'], kind='stable')
+
+    linhas = []
+    for posicao, (tempo, temperatura, latitude, longitude) in zip(dispositivos[ordem].tolist(),
+                                                                  dados[ordem].tolist()):
+        t = time.localtime(tempo)
+        linhas.append('{};{};{};{};{};{};{};{};{}\n'.format(particoes[posicao][0], t.tm_hour, t.tm_min, t.tm_year,
+                                                            t.tm_mon, t.tm_mday, temperatura, latitude, longitude))
+    saida.write(''.join(linhas))
+    return len(linhas)
+
+
+def exportarCsv(armazenamento, inicio, fim, saida):
+    # Formato de entrada do map_database.py: dispositivo;hora;minuto;ano;mes;dia;temperatura;latitude;longitude
+    # em ordem de tempo; consultar() gera as particoes dia a dia, entao basta intercalar as de cada dia
+    total = 0
+    particoes = []
+    dataAtual = None
+    for dispositivo, dados in armazenamento.consultar(inicio, fim):
+        data = dataDoTempo(int(dados['tempo'][0]))
+        if particoes and data != dataAtual:
+            total += _exportarDia(particoes, saida)
+            particoes = []
+        dataAtual = data
+        particoes.append((dispositivo, dados))
+    if particoes:
+        total += _exportarDia(particoes, saida)
+    return total
+
+
+def lerData(texto):
+    return time.mktime(datetime.strptime(texto, '%Y-%m-%d').timetuple())
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Armazenamento colunar do historico de sensores')
+    parser.add_argument('--raiz', default=RAIZ_ARMAZENAMENTO)
+    comandos = parser.add_subparsers(dest='comando', required=True)
+
+    importar = comandos.add_parser('importar', help='importa um CSV de instantaneos')
+    importar.add_argument('arquivos', nargs='+')
+
+    consultar = comandos.add_parser('consultar', help='resume as leituras de um intervalo')
+    consultar.add_argument('--dispositivo')
+    consultar.add_argument('--horas', type=float, default=24)
+
+    exportar = comandos.add_parser('exportar', help='exporta no formato do map_database.py')
+    exportar.add_argument('--inicio', required=True, help='AAAA-MM-DD')
+    exportar.add_argument('--fim', required=True, help='AAAA-MM-DD (exclusivo)')
+    exportar.add_argument('saida', nargs='?', default='-')
+
+    args = parser.parse_args()
+    armazenamento = ArmazenamentoColunar(args.raiz, 'instantaneos')
+
+    if args.comando == 'importar':
+        for caminho in args.arquivos:
+            print('{}: {} linhas importadas'.format(caminho, importarCsvInstantaneos(caminho, armazenamento)))
+
+    elif args.comando == 'consultar':
+        fim = time.time()
+        for dispositivo, dados in armazenamento.consultar(fim - args.horas * 3600, fim, args.dispositivo):
+            print('{}\t{} leituras\tmin {}\tmax {}'.format(dispositivo, len(dados),
+                                                         dados['temperatura'].min(), dados['temperatura'].max()))
+
+    else:
+        inicio = lerData(args.inicio)
+        fim = lerData(args.fim) - 1
+        if args.saida == '-':
+            total = exportarCsv(armazenamento, inicio, fim, sys.stdout)
+        else:
+            with open(args.saida, 'w') as saida:
+                total = exportarCsv(armazenamento, inicio, fim, saida)
+        print('{} linhas exportadas'.format(total), file=sys.stderr)
+
+
+if __name__ == '__main__':
+    main()
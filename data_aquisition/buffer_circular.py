@@ -0,0 +1,97 @@
+"""
+Fixed-size ring buffer for the instantaneous samples of `remote_iot.py`, with O(1) rolling statistics.
+
+1. **Storage:**
+   - Preallocated `array('d')` columns (hora, minuto, temperatura, latitude, longitude) of `capacidade` slots.
+   - When full, each new sample overwrites the oldest one, so memory stays flat regardless of uptime.
+
+2. **Rolling Statistics:**
+   - Running sums of hora, minuto, latitude and longitude are updated on every insert/eviction,
+     so the averages of the window are computed in constant time.
+   - Minimum and maximum temperature use monotonic deques (amortized O(1) per insert, O(1) per query).
+
+3. **Use in `remote_iot.py`:**
+   - With `capacidade=60` the window is exactly the "last 60 measurements" used for the hourly averages.
+"""
+
+from array import array
+from collections import deque
+
+
+class BufferCircular(object):
+
+    def __init__(self, capacidade=60):
+        self.capacidade = capacidade
+
+        self.hora = array('d', bytes(8 * capacidade))
+        self.minuto = array('d', bytes(8 * capacidade))
+        self.temperatura = array('d', bytes(8 * capacidade))
+        self.latitude = array('d', bytes(8 * capacidade))
+        self.longitude = array('d', bytes(8 * capacidade))
+
+        # total = numero de amostras ja inseridas (a amostra n fica na posicao n % capacidade)
+        self.total = 0
+
+        self.somaHora = 0.0
+        self.somaMinuto = 0.0
+        self.somaLatitude = 0.0
+        self.somaLongitude = 0.0
+
+        # (numero da amostra, temperatura), crescente em dequeMinimo e decrescente em dequeMaximo
+        self.dequeMinimo = deque()
+        self.dequeMaximo = deque()
+
+    def __len__(self):
+        return min(self.total, self.capacidade)
+
+    def adicionar(self, hora, minuto, temperatura, latitude, longitude):
+        posicao = self.total % self.capacidade
+
+        # Remove a amostra mais antiga quando o buffer esta cheio
+        if self.total >= self.capacidade:
+            self.somaHora -= self.hora[posicao]
+            self.somaMinuto -= self.minuto[posicao]
+            self.somaLatitude -= self.latitude[posicao]
+            self.somaLongitude -= self.longitude[posicao]
+
+            maisAntiga = self.total - self.capacidade
+            if self.dequeMinimo and self.dequeMinimo[0][0] == maisAntiga:
+                self.dequeMinimo.popleft()
+            if self.dequeMaximo and self.dequeMaximo[0][0] == maisAntiga:
+                self.dequeMaximo.popleft()
+
+        self.hora[posicao] = hora
+        self.minuto[posicao] = minuto
+        self.temperatura[posicao] = temperatura
+        self.latitude[posicao] = latitude
+        self.longitude[posicao] = longitude
+
+        self.somaHora += hora
+        self.somaMinuto += minuto
+        self.somaLatitude += latitude
+        self.somaLongitude += longitude
+
+        while self.dequeMinimo and self.dequeMinimo[-1][1] >= temperatura:
+            self.dequeMinimo.pop()
+        self.dequeMinimo.append((self.total, temperatura))
+
+        while self.dequeMaximo and self.dequeMaximo[-1][1] <= temperatura:
+            self.dequeMaximo.pop()
+        self.dequeMaximo.append((self.total, temperatura))
+
+        self.total += 1
+
+    def temperaturaMinima(self):
+        return self.dequeMinimo[0][1]
+
+    def temperaturaMaxima(self):
+        return self.dequeMaximo[0][1]
+
+    def medias(self):
+        # (horaMedia, minutoMedia, temperaturaMinima, temperaturaMaxima, latitudeMedia, longitudeMedia)
+        quantidade = len(self)
+        if quantidade == 0:
+            return None
+        return (self.somaHora / quantidade, self.somaMinuto / quantidade,
+                self.temperaturaMinima(), self.temperaturaMaxima(),
+                self.somaLatitude / quantidade, self.somaLongitude / quantidade)
@@ -0,0 +1,164 @@
+"""
+Micro-batching stage for the KNN classifier used by `ML_Model_on_hadoop.py`.
+
+1. **Problem:**
+   - Classifying each `valores_medios` message on its own (one DataFrame + one `predict` per message)
+     makes the pandas/sklearn call overhead dominate when thousands of devices report at the same time.
+
+2. **Batching:**
+   - Measurements are queued by the MQTT callback (`adicionarMedicao`), which never blocks on the model.
+   - A background thread collects measurements until either `janelaSegundos` has elapsed since the first
+     queued item or `tamanhoMaximo` items are waiting, whichever comes first.
+   - The whole batch is converted into a single NumPy feature matrix and classified with one `predict` call.
+   - Each measurement is validated while the matrix is built; a malformed one (missing or non-numeric
+     features) is dropped and counted in `classificacao_descartadas_total`, the rest of the batch is classified.
+
+3. **Publishing:**
+   - The `publicar` callback is still invoked once per measurement, in arrival order, so every message
+     keeps producing its own `alerta` result.
+
+4. **Latency vs Throughput:**
+   - `janelaSegundos=0` and `tamanhoMaximo=1` reproduce the old one-message-at-a-time behaviour.
+   - Larger windows/batches trade a little latency for much higher throughput.
+
+5. **Metrics:**
+   - With a `metricas.Metricas`, records the queue wait of each measurement, the `predict` time and size of
+     each batch, and exposes the queue depth.
+"""
+
+import queue
+import threading
+import time
+
+import numpy as np
+
+from metricas import METRICAS_NULAS
+
+# Colunas usadas pelo classificador, na ordem do treinamento
+COLUNAS_MODELO = ['temp_minima', 'temp_maxima', 'latitude', 'longitude']
+
+
+def montarMatrizFeatures(lista_columns):
+    # columns = [hora, minuto, temp_minima, temp_maxima, latitude, longitude]
+    return np.array([columns[2:6] for columns in lista_columns], dtype=np.float64)
+
+
+def linhaFeatures(columns):
+    # Features de uma medicao; ValueError se faltar coluna ou houver valor nao numerico
+    linha = [float(valor) for valor in columns[2:6]]
+    if len(linha) != len(COLUNAS_MODELO):
+        raise ValueError('esperadas {} features, recebidas {}'.format(len(COLUNAS_MODELO), len(linha)))
+    return linha
+
+
+class ClassificadorEmLote(object):
+
+    def __init__(self, predizer, publicar, janelaSegundos=0.05, tamanhoMaximo=256, metricas=METRICAS_NULAS):
+        # predizer(matriz) -> lista de classes; publicar(columns, classe, contexto) -> None
+        self.predizer = predizer
+        self.publicar = publicar
+        self.janelaSegundos = janelaSegundos
+        self.tamanhoMaximo = max(1, int(tamanhoMaximo))
+
+        self.fila = queue.Queue()
+        self.thread = None
+
+        self.esperaFila = metricas.histograma('classificacao_espera_segundos', 'espera na fila ate o lote')
+        self.duracaoPredicao = metricas.histograma('classificacao_predicao_segundos', 'predict de um lote')
+        self.tamanhoLote = metricas.histograma('classificacao_lote_medicoes', 'medicoes por lote',
+                                               limites=(1, 2, 4, 8, 16, 32, 64, 128, 256, 512, 1024))
+        self.descartadas = metricas.contador('classificacao_descartadas_total', 'medicoes malformadas descartadas')
+        metricas.medidor('classificacao_fila', self.tamanhoFila, 'medicoes aguardando classificacao')
+
+    def iniciar(self):
+        self.thread = threading.Thread(target=self._executar, name='classificador-lote', daemon=True)
+        self.thread.start()
+
+    def encerrar(self):
+        # Processa o que ainda estiver na fila antes de parar
+        self.fila.put(None)
+        if self.thread is not None:
+            self.thread.join()
+
+    def adicionarMedicao(self, columns, contexto=None):
+        self.fila.put((columns, contexto, time.perf_counter()))
+
+    def tamanhoFila(self):
+        return self.fila.qsize()
+
+    def _coletarLote(self):
+        item = self.fila.get()
+        if item is None:
+            return [], True
+
+        lote = [item]
+        limite = time.monotonic() + self.janelaSegundos
+
+        while len(lote) < self.tamanhoMaximo:
+            restante = limite - time.monotonic()
+            try:
+                if restante > 0:
+                    item = self.fila.get(timeout=restante)
+                else:
+                    item = self.fila.get_nowait()
+            except queue.Empty:
+                break
+            if item is None:
+                return lote, True
+            lote.append(item)
+
+        return lote, False
+
+    def _executar(self):
+        fim = False
+        while not fim:
+            lote, fim = self._coletarLote()
+            if lote:
+                self.classificarLote(lote)
+
+        # Drenar o restante da fila no encerramento
+        restantes = []
+        while True:
+            try:
+                item = self.fila.get_nowait()
+            except queue.Empty:
+                break
+            if item is not None:
+                restantes.append(item)
+        if restantes:
+            self.classificarLote(restantes)
+
+    def classificarLote(self, lote):
+        inicio = time.perf_counter()
+        for columns, contexto, chegada in lote:
+            self.esperaFila.observar(inicio - chegada)
+        self.tamanhoLote.observar(len(lote))
+
+        # Descarta so as medicoes malformadas, nao o lote inteiro
+        validos = []
+        linhas = []
+        for item in lote:
+            try:
+                linhas.append(linhaFeatures(item[0]))
+            except (TypeError, ValueError) as erro:
+                self.descartadas.incrementar()
+                print('Medicao descartada ({}): {}'.format(erro, item[0]))
+                continue
+            validos.append(item)
+        if not validos:
+            return
+        lote = validos
+
+        try:
+            matriz = np.array(linhas, dtype=np.float64)
+            classes = self.predizer(matriz)
+        except Exception as erro:
+            print('Erro ao classificar lote de {} medicoes: {}'.format(len(lote), erro))
+            return
+        self.duracaoPredicao.observar(time.perf_counter() - inicio)
+
+        for (columns, contexto, chegada), classe in zip(lote, classes):
+            try:
+                self.publicar(columns, classe, contexto)
+            except Exception as erro:
+                print('Erro ao publicar classe {}: {}'.format(classe, erro))
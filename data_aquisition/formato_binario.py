@@ -0,0 +1,229 @@
+"""
+Compact, versioned binary wire format for `valores_instantaneos` and `valores_medios`.
+
+1. **Version Byte:**
+   - A binary payload starts with a version byte below 0x20; the semicolon text format always starts with
+     a printable character, so `versaoPayload` tells both formats apart and the text format stays accepted.
+
+2. **Layout (little-endian, no padding):**
+   - Header `<BBH`: version, record type (`TIPO_INSTANTANEO` / `TIPO_MEDIO`), number of records.
+   - Instantaneous record (20 bytes): device MAC (6 bytes), epoch seconds (uint32), temperature x100 (int16),
+     latitude and longitude x1e7 (int32).
+   - Hourly record (26 bytes): device MAC, epoch seconds, average hour and minute x100 (uint16),
+     minimum and maximum temperature x100 (int16), latitude and longitude x1e7 (int32).
+   - The device id is the Wi-Fi MAC address, which fits exactly in 6 bytes, so it round-trips without a lookup table.
+
+3. **Records:**
+   - Instantaneous: `(dispositivo, tempo, temperatura, latitude, longitude)`.
+   - Hourly: `(dispositivo, tempo, hora, minuto, temp_minima, temp_maxima, latitude, longitude)`.
+   - `textoInstantaneo` / `textoMedio` and `lerTextoInstantaneo` are the single definition of the text format
+     (`id;ano;mes;dia;hora;minuto;segundo;temperatura;latitude;longitude` and `hora;minuto;tmin;tmax;lat;lon`),
+     shared by `remote_iot.py`, the ingestion service and the CSV importers.
+
+4. **Batch Decoding:**
+   - `decodificarNumpy` maps a payload straight onto a NumPy structured array (`np.frombuffer`, no per-record
+     Python work) and returns the scaled columns.
+
+5. **Benchmark:**
+   ```bash
+   python formato_binario.py --registros 100000
+   ```
+   - Prints bytes per reading and parse time for the text format, `decodificar` and `decodificarNumpy`.
+"""
+
+#! /usr/bin/env python
+import argparse
+import functools
+import struct
+import time
+
+VERSAO_BINARIA = 1
+
+TIPO_INSTANTANEO = 1
+TIPO_MEDIO = 2
+
+CABECALHO = struct.Struct('<BBH')
+
+REGISTROS = {
+    TIPO_INSTANTANEO: struct.Struct('<6sIhii'),
+    TIPO_MEDIO: struct.Struct('<6sIHHhhii'),
+}
+
+ESCALA_TEMPERATURA = 100
+ESCALA_TEMPO = 100
+ESCALA_COORDENADA = 10000000
+
+# Maximo de registros por payload (contador de 16 bits no cabecalho)
+MAXIMO_REGISTROS = 0xFFFF
+
+
+def versaoPayload(payload):
+    # None para o formato texto, senao o byte de versao
+    if payload and payload[0] < 0x20:
+        return payload[0]
+    return None
+
+
+def codificarDispositivo(dispositivo):
+    dados = bytes.fromhex(dispositivo.replace(':', ''))
+    if len(dados) != 6:
+        raise ValueError('Dispositivo nao e um MAC address: {}'.format(dispositivo))
+    return dados
+
+
+@functools.lru_cache(maxsize=4096)
+def decodificarDispositivo(dados):
+    return ':'.join('{:02x}'.format(byte) for byte in dados)
+
+
+def escalar(valor, escala):
+    return int(round(valor * escala))
+
+
+def codificarRegistro(tipo, registro):
+    if tipo == TIPO_INSTANTANEO:
+        dispositivo, tempo, temperatura, latitude, longitude = registro
+        return REGISTROS[tipo].pack(codificarDispositivo(dispositivo), int(tempo),
+                                    escalar(temperatura, ESCALA_TEMPERATURA),
+                                    escalar(latitude, ESCALA_COORDENADA), escalar(longitude, ESCALA_COORDENADA))
+
+    dispositivo, tempo, hora, minuto, temperaturaMinima, temperaturaMaxima, latitude, longitude = registro
+    return REGISTROS[tipo].pack(codificarDispositivo(dispositivo), int(tempo),
+                                escalar(hora, ESCALA_TEMPO), escalar(minuto, ESCALA_TEMPO),
+                                escalar(temperaturaMinima, ESCALA_TEMPERATURA),
+                                escalar(temperaturaMaxima, ESCALA_TEMPERATURA),
+                                escalar(latitude, ESCALA_COORDENADA), escalar(longitude, ESCALA_COORDENADA))
+
+
+def codificar(tipo, registros):
+    if len(registros) > MAXIMO_REGISTROS:
+        raise ValueError('No maximo {} registros por payload'.format(MAXIMO_REGISTROS))
+    return CABECALHO.pack(VERSAO_BINARIA, tipo, len(registros)) + \
+        b''.join(codificarRegistro(tipo, registro) for registro in registros)
+
+
+def lerCabecalho(payload):
+    if len(payload) < CABECALHO.size:
+        raise ValueError('Payload menor que o cabecalho ({} bytes)'.format(len(payload)))
+    versao, tipo, quantidade = CABECALHO.unpack_from(payload)
+    if versao != VERSAO_BINARIA:
+        raise ValueError('Versao de payload nao suportada: {}'.format(versao))
+    if tipo not in REGISTROS:
+        raise ValueError('Tipo de registro desconhecido: {}'.format(tipo))
+    if len(payload) != CABECALHO.size + quantidade * REGISTROS[tipo].size:
+        raise ValueError('Payload truncado ou com bytes sobrando')
+    return tipo, quantidade
+
+
+def decodificar(payload):
+    # (tipo, [registros])
+    tipo, quantidade = lerCabecalho(payload)
+    registros = []
+    for campos in REGISTROS[tipo].iter_unpack(payload[CABECALHO.size:]):
+        dispositivo = decodificarDispositivo(campos[0])
+        if tipo == TIPO_INSTANTANEO:
+            registros.append((dispositivo, campos[1], campos[2] / ESCALA_TEMPERATURA,
+                              campos[3] / ESCALA_COORDENADA, campos[4] / ESCALA_COORDENADA))
+        else:
+            registros.append((dispositivo, campos[1], campos[2] / ESCALA_TEMPO, campos[3] / ESCALA_TEMPO,
+                              campos[4] / ESCALA_TEMPERATURA, campos[5] / ESCALA_TEMPERATURA,
+                              campos[6] / ESCALA_COORDENADA, campos[7] / ESCALA_COORDENADA))
+    return tipo, registros
+
+
+def dtypeRegistro(tipo):
+    import numpy as np
+
+    if tipo == TIPO_INSTANTANEO:
+        campos = [('dispositivo', 'S6'), ('tempo', '<u4'), ('temperatura', '<i2'),
+                  ('latitude', '<i4'), ('longitude', '<i4')]
+    else:
+        campos = [('dispositivo', 'S6'), ('tempo', '<u4'), ('hora', '<u2'), ('minuto', '<u2'),
+                  ('temp_minima', '<i2'), ('temp_maxima', '<i2'), ('latitude', '<i4'), ('longitude', '<i4')]
+    return np.dtype(campos)
+
+
+def decodificarNumpy(payload):
+    # (tipo, {coluna: array}); dispositivo fica como array de 6 bytes por registro
+    import numpy as np
+
+    tipo, quantidade = lerCabecalho(payload)
+    brutos = np.frombuffer(payload, dtype=dtypeRegistro(tipo), count=quantidade, offset=CABECALHO.size)
+
+    colunas = {'dispositivo': brutos['dispositivo'], 'tempo': brutos['tempo'].astype('int64')}
+    escalas = {'temperatura': ESCALA_TEMPERATURA, 'temp_minima': ESCALA_TEMPERATURA,
+               'temp_maxima': ESCALA_TEMPERATURA, 'hora': ESCALA_TEMPO, 'minuto': ESCALA_TEMPO,
+               'latitude': ESCALA_COORDENADA, 'longitude': ESCALA_COORDENADA}
+    for nome in brutos.dtype.names[2:]:
+        colunas[nome] = brutos[nome] / float(escalas[nome])
+    return tipo, colunas
+
+
+# ----------------------------------------------------------------- formato texto
+
+def textoInstantaneo(registro):
+    dispositivo, tempo, temperatura, latitude, longitude = registro
+    momento = time.localtime(tempo)
+    return '{};{};{};{};{};{};{};{};{};{}'.format(dispositivo, momento.tm_year, momento.tm_mon, momento.tm_mday,
+                                                  momento.tm_hour, momento.tm_min, momento.tm_sec,
+                                                  temperatura, latitude, longitude)
+
+
+def textoMedio(registro):
+    # O texto dos medios nao leva dispositivo nem horario
+    return '{};{};{};{};{};{}'.format(*registro[2:8])
+
+
+def lerTextoInstantaneo(linha):
+    # id;ano;mes;dia;hora;minuto;segundo;temperatura;latitude;longitude -> registro (ValueError se invalida)
+    columns = linha.strip().split(';')
+    if len(columns) < 10 or '' in columns[:10]:
+        raise ValueError('Linha incompleta: {}'.format(linha))
+    tempo = time.mktime((int(columns[1]), int(columns[2]), int(columns[3]), int(columns[4]),
+                         int(columns[5]), int(columns[6]), 0, 0, -1))
+    return columns[0], tempo, float(columns[7]), float(columns[8]), float(columns[9])
+
+
+def main():
+    import random
+
+    parser = argparse.ArgumentParser(description='Compara o formato texto com o formato binario')
+    parser.add_argument('--registros', type=int, default=100000)
+    args = parser.parse_args()
+
+    aleatorio = random.Random(42)
+    inicio = time.time()
+    registros = [('b8:27:eb:{:02x}:{:02x}:{:02x}'.format(i % 7, i % 11, i % 13), int(inicio) + i,
+                  float(aleatorio.randint(5, 40)), round(-25.4966884 + aleatorio.uniform(-0.05, 0.05), 7),
+                  round(-49.2619725 + aleatorio.uniform(-0.05, 0.05), 7)) for i in range(args.registros)]
+
+    texto = [textoInstantaneo(registro).encode() for registro in registros]
+    payloads = [codificar(TIPO_INSTANTANEO, registros[i:i + 1000]) for i in range(0, len(registros), 1000)]
+
+    bytesTexto = sum(len(linha) + 1 for linha in texto)
+    bytesBinario = sum(len(payload) for payload in payloads)
+
+    t = time.perf_counter()
+    for linha in texto:
+        lerTextoInstantaneo(linha.decode())
+    tempoTexto = time.perf_counter() - t
+
+    t = time.perf_counter()
+    for payload in payloads:
+        decodificar(payload)
+    tempoBinario = time.perf_counter() - t
+
+    t = time.perf_counter()
+    for payload in payloads:
+        decodificarNumpy(payload)
+    tempoNumpy = time.perf_counter() - t
+
+    print('texto\t{:.1f} bytes/leitura\t{:.3f}s'.format(bytesTexto / len(registros), tempoTexto))
+    print('binario\t{:.1f} bytes/leitura\t{:.3f}s ({:.1f}x)'.format(
+        bytesBinario / len(registros), tempoBinario, tempoTexto / tempoBinario))
+    print('numpy\t{:.1f} bytes/leitura\t{:.3f}s ({:.1f}x)'.format(
+        bytesBinario / len(registros), tempoNumpy, tempoTexto / tempoNumpy))
+
+
+if __name__ == '__main__':
+    main()
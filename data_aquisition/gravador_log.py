@@ -0,0 +1,222 @@
+"""
+Buffered, group-commit writer for the append-only CSV logs (`instantaneos.csv`, `medios.csv`, ...).
+
+1. **Buffering:**
+   - `escrever(linha)` only appends the line to an in-memory buffer, so the MQTT callback never touches the disk.
+   - A background thread writes the whole buffer at once when it reaches `tamanhoLote` bytes or
+     every `intervaloFlush` seconds, keeping the file open between batches.
+   - If the disk stalls and the buffer reaches `tamanhoMaximoBuffer` bytes, the oldest lines are discarded
+     (counted in `descartadas`) instead of blocking the caller.
+   - A batch whose write fails (`OSError`) goes back to the front of the buffer, under the same limit, and is
+     retried with the next batch; the file is truncated back to its size before the batch and reopened, so a
+     partly written batch is neither lost nor duplicated.
+
+2. **Durability Policy (per batch):**
+   - `'nenhuma'`: leaves the data in the process buffer of the open file.
+   - `'flush'`: flushes to the operating system after every batch (default, same guarantee as the old open/close).
+   - `'fsync'`: flushes and calls `os.fsync`, so a batch survives a power cut once written.
+
+3. **Rotation:**
+   - `rotacao='tamanho'`: the file is renamed to `<arquivo>.<AAAAMMDDHHMMSS>` when it would exceed `tamanhoMaximoArquivo`.
+   - `rotacao='data'`: the file is renamed to `<arquivo>.<AAAA-MM-DD>` on the first batch of a new day.
+
+4. **Shutdown:**
+   - `fechar()` stops the thread, writes everything still buffered and closes the file.
+
+5. **Metrics:**
+   - With a `metricas.Metricas`, records the write time of each batch and exposes the buffer depth and
+     discarded lines, labelled with the file name.
+"""
+
+import os
+import threading
+import time
+from collections import deque
+from datetime import datetime
+
+from metricas import METRICAS_NULAS
+
+DURABILIDADES = ('nenhuma', 'flush', 'fsync')
+
+
+class GravadorLog(object):
+
+    def __init__(self, caminho, tamanhoLote=64 * 1024, intervaloFlush=1.0, durabilidade='flush',
+                 rotacao=None, tamanhoMaximoArquivo=512 * 1024 * 1024, tamanhoMaximoBuffer=64 * 1024 * 1024,
+                 metricas=METRICAS_NULAS):
+
+        if durabilidade not in DURABILIDADES:
+            raise ValueError('Durabilidade invalida: {}'.format(durabilidade))
+        if rotacao not in (None, 'tamanho', 'data'):
+            raise ValueError('Rotacao invalida: {}'.format(rotacao))
+
+        self.caminho = caminho
+        self.tamanhoLote = tamanhoLote
+        self.intervaloFlush = intervaloFlush
+        self.durabilidade = durabilidade
+        self.rotacao = rotacao
+        self.tamanhoMaximoArquivo = tamanhoMaximoArquivo
+        self.tamanhoMaximoBuffer = tamanhoMaximoBuffer
+
+        self.buffer = deque()
+        self.bytesBuffer = 0
+        self.condicao = threading.Condition()
+        self.executando = False
+        self.thread = None
+
+        self.arquivo = None
+        self.dataArquivo = None
+        # Bytes ja gravados no arquivo aberto (offset antes do proximo lote)
+        self.posicao = 0
+
+        # Contadores
+        self.linhasGravadas = 0
+        self.lotesGravados = 0
+        self.descartadas = 0
+
+        arquivo = os.path.splitext(os.path.basename(caminho))[0]
+        self.duracaoGravacao = metricas.histograma('gravacao_csv_segundos', 'escrita de um lote no CSV',
+                                                   arquivo=arquivo)
+        metricas.medidor('gravacao_buffer_linhas', self.tamanhoBuffer, 'linhas aguardando gravacao', arquivo=arquivo)
+        metricas.medidor('gravacao_descartadas', lambda: self.descartadas, 'linhas descartadas', arquivo=arquivo)
+
+    def iniciar(self):
+        self.executando = True
+        self.thread = threading.Thread(target=self._executar, name='gravador-log', daemon=True)
+        self.thread.start()
+
+    def escrever(self, linha):
+        linha = '{}\n'.format(linha)
+        with self.condicao:
+            self.buffer.append(linha)
+            self.bytesBuffer += len(linha)
+
+            # Nunca bloqueia: descarta as linhas mais antigas se o disco nao acompanhar
+            while self.bytesBuffer > self.tamanhoMaximoBuffer and len(self.buffer) > 1:
+                self.bytesBuffer -= len(self.buffer.popleft())
+                self.descartadas += 1
+
+            if self.bytesBuffer >= self.tamanhoLote:
+                self.condicao.notify()
+
+    def tamanhoBuffer(self):
+        return len(self.buffer)
+
+    def fechar(self):
+        with self.condicao:
+            self.executando = False
+            self.condicao.notify()
+        if self.thread is not None:
+            self.thread.join()
+        # Drena o que ainda estiver em memoria
+        self._gravarLote()
+        if self.arquivo is not None:
+            self.arquivo.close()
+            self.arquivo = None
+
+    def _executar(self):
+        while True:
+            with self.condicao:
+                if self.executando and self.bytesBuffer < self.tamanhoLote:
+                    self.condicao.wait(self.intervaloFlush)
+                if not self.executando:
+                    return
+            try:
+                self._gravarLote()
+            except OSError as erro:
+                print('Erro ao gravar {}: {}'.format(self.caminho, erro))
+                time.sleep(self.intervaloFlush)
+
+    def _trocarBuffer(self):
+        with self.condicao:
+            linhas = self.buffer
+            self.buffer = deque()
+            self.bytesBuffer = 0
+        return linhas
+
+    def _devolverLinhas(self, linhas):
+        # Recoloca o lote no inicio do buffer, descartando as mais antigas acima do limite
+        with self.condicao:
+            for linha in linhas:
+                self.bytesBuffer += len(linha)
+            self.buffer.extendleft(reversed(linhas))
+            while self.bytesBuffer > self.tamanhoMaximoBuffer and len(self.buffer) > 1:
+                self.bytesBuffer -= len(self.buffer.popleft())
+                self.descartadas += 1
+
+    def _gravarLote(self):
+        linhas = self._trocarBuffer()
+        if not linhas:
+            return
+
+        inicio = time.perf_counter()
+        dados = ''.join(linhas)
+        posicao = None
+        try:
+            self._rotacionar(len(dados))
+
+            if self.arquivo is None:
+                self.arquivo = open(self.caminho, 'a')
+                self.dataArquivo = datetime.now().date()
+                self.posicao = os.fstat(self.arquivo.fileno()).st_size
+
+            posicao = self.posicao
+            self.arquivo.write(dados)
+
+            if self.durabilidade != 'nenhuma':
+                self.arquivo.flush()
+            if self.durabilidade == 'fsync':
+                os.fsync(self.arquivo.fileno())
+        except OSError:
+            self._devolverLinhas(linhas)
+            # Reabre o arquivo na proxima tentativa
+            if self.arquivo is not None:
+                try:
+                    self.arquivo.close()
+                except OSError:
+                    pass
+                self.arquivo = None
+            # Descarta a parte do lote que chegou ao arquivo, senao ela seria repetida
+            if posicao is not None:
+                try:
+                    if os.path.getsize(self.caminho) > posicao:
+                        os.truncate(self.caminho, posicao)
+                except OSError as erro:
+                    print('Erro ao truncar {}: {}'.format(self.caminho, erro))
+            raise
+
+        self.posicao += len(dados.encode(self.arquivo.encoding))
+        self.linhasGravadas += len(linhas)
+        self.lotesGravados += 1
+        self.duracaoGravacao.observar(time.perf_counter() - inicio)
+
+    def _rotacionar(self, tamanhoLote):
+        if self.rotacao is None or not os.path.exists(self.caminho):
+            return
+
+        agora = datetime.now()
+
+        if self.rotacao == 'tamanho':
+            if os.path.getsize(self.caminho) + tamanhoLote <= self.tamanhoMaximoArquivo:
+                return
+            destino = '{}.{}'.format(self.caminho, agora.strftime('%Y%m%d%H%M%S'))
+        else:
+            dataArquivo = self.dataArquivo
+            if dataArquivo is None:
+                dataArquivo = datetime.fromtimestamp(os.path.getmtime(self.caminho)).date()
+            if dataArquivo == agora.date():
+                return
+            destino = '{}.{}'.format(self.caminho, dataArquivo.isoformat())
+
+        if self.arquivo is not None:
+            self.arquivo.close()
+            self.arquivo = None
+
+        # Nao sobrescreve um arquivo ja rotacionado
+        sufixo = 1
+        livre = destino
+        while os.path.exists(livre):
+            livre = '{}.{}'.format(destino, sufixo)
+            sufixo += 1
+
+        os.replace(self.caminho, livre)
@@ -0,0 +1,426 @@
+"""
+Sharded multi-device ingestion mode for the classifier service (`ML_Model_on_hadoop.py`).
+
+1. **Subscriptions:**
+   - One dispatcher client subscribes with per-device wildcards (`main/OMIoT/team/+/valores_medios`,
+     `main/OMIoT/team/+/valores_instantaneos`) plus the legacy topics without a device level.
+   - The client id carries random characters, so several dispatchers can run side by side.
+
+2. **Sharding:**
+   - Each message is routed to one of N worker processes by `crc32(dispositivo) % N`, so a device always
+     lands on the same worker and its readings stay in order.
+   - The device key is the topic level after the prefix; on the legacy topics it is read from the payload
+     (MAC of a binary payload, first field of a text `valores_instantaneos` line).
+     Legacy hourly text messages carry no device and all go to worker 0.
+
+3. **Workers:**
+   - Each worker process holds its own model (artifact loaded with `modelo_knn.carregarArtefato`, or trained
+     from `treinamento.csv`), its own `RecarregadorModelo` and its own `ClassificadorEmLote`, so decoding and
+     `predict` run on all cores instead of one paho network thread.
+   - With `agregacaoNoServidor` (default), each worker aggregates the hourly averages of its devices from
+     `valores_instantaneos` with an `AgregadorHorario` and classifies those; device `valores_medios` are only logged.
+     Hashing by device keeps every device's state in a single worker.
+   - Text and binary (`formato_binario.py`) payloads are accepted; with `raizLog` set, each worker writes its
+     raw readings to its own `instantaneos.<n>.csv` / `medios.<n>.csv` through `GravadorLog`.
+   - Classes are sent back to the dispatcher, whose `MaquinaAlerta` publishes `on`/`off` (retained, only on
+     transitions) to `main/OMIoT/team/<dispositivo>/alerta`, or to the legacy `main/OMIoT/team/alerta`
+     when the device is unknown.
+
+4. **Testing and Benchmark:**
+   - The MQTT client is injected (`transporte.criarCliente`); tests and the benchmark use the in-process
+     loopback broker of `transporte.py` instead of a network broker.
+   - `--benchmark` publishes synthetic device messages through the loopback broker for each worker count and prints
+     the throughput (`simulador_dispositivos.py` is the paced, end-to-end load test):
+   ```bash
+   python ingestao_distribuida.py --benchmark 200000 --workers 1,2,4
+   ```
+"""
+
+#! /usr/bin/env python
+import argparse
+import multiprocessing
+import os
+import random
+import shutil
+import string
+import tempfile
+import threading
+import time
+import zlib
+
+import formato_binario
+import modelo_knn
+import transporte
+from maquina_alerta import MaquinaAlerta
+
+PREFIXO = 'main/OMIoT/team'
+
+TOPICOS_DADOS = ('valores_medios', 'valores_instantaneos')
+
+
+def chaveDispositivo(topico, payload, prefixo=PREFIXO):
+    niveis = topico[len(prefixo) + 1:].split('/')
+    if len(niveis) == 2:
+        return niveis[0]
+
+    # Topicos antigos, sem o nivel do dispositivo
+    if formato_binario.versaoPayload(payload) is not None:
+        return formato_binario.decodificarDispositivo(bytes(payload[4:10]))
+    if niveis[-1] == 'valores_instantaneos' and b';' in payload:
+        return bytes(payload[:payload.index(b';')]).decode('utf-8', 'replace')
+    return ''
+
+
+def particaoDispositivo(dispositivo, particoes):
+    return zlib.crc32(dispositivo.encode('utf-8')) % particoes
+
+
+def carregarModelo(caminhoModelo, caminhoTreinamento):
+    try:
+        return modelo_knn.carregarArtefato(caminhoModelo)
+    except (OSError, ValueError):
+        return modelo_knn.treinarModelo(caminhoTreinamento)
+
+
+class Worker(object):
+    # Estado de um processo de ingestao; criado dentro do processo filho
+
+    def __init__(self, indice, resultados, caminhoModelo, caminhoTreinamento, raizLog,
+                 janelaSegundos, tamanhoMaximo, agregacaoNoServidor):
+        from agregador_horario import AgregadorHorario
+        from classificador_lote import ClassificadorEmLote
+        from recarregador_modelo import RecarregadorModelo
+
+        self.indice = indice
+        self.resultados = resultados
+
+        self.modelo = carregarModelo(caminhoModelo, caminhoTreinamento)['modelo']
+        self.recarregador = RecarregadorModelo(self.aplicarModelo, caminhoModelo, caminhoTreinamento)
+        self.classificador = ClassificadorEmLote(self.predizer, self.publicarClasse, janelaSegundos, tamanhoMaximo)
+        self.agregador = AgregadorHorario(self.emitirAgregado) if agregacaoNoServidor else None
+
+        self.gravadores = None
+        if raizLog is not None:
+            from gravador_log import GravadorLog
+            self.gravadores = {
+                'valores_instantaneos': GravadorLog(os.path.join(raizLog, 'instantaneos.{}.csv'.format(indice))),
+                'valores_medios': GravadorLog(os.path.join(raizLog, 'medios.{}.csv'.format(indice))),
+            }
+
+        self.mensagens = 0
+        self.medicoes = 0
+        self.invalidas = 0
+
+    def aplicarModelo(self, artefato, origem):
+        self.modelo = artefato['modelo']
+        print('Worker {}: modelo {} aplicado ({})'.format(self.indice, artefato['versao'], origem))
+
+    def predizer(self, matriz):
+        modelo = self.modelo
+        return modelo.predict(matriz)
+
+    def publicarClasse(self, columns, classe, dispositivo):
+        self.resultados.put((dispositivo, classe))
+
+    def emitirAgregado(self, dispositivo, janela, columns):
+        self.medicoes += 1
+        self.classificador.adicionarMedicao(columns, dispositivo)
+
+    def processar(self, topico, dispositivo, payload):
+        self.mensagens += 1
+        tipo = topico.rsplit('/', 1)[-1]
+
+        if formato_binario.versaoPayload(payload) is not None:
+            try:
+                registros = formato_binario.decodificar(payload)[1]
+            except ValueError:
+                self.invalidas += 1
+                return
+            if tipo == 'valores_medios':
+                linhas = [formato_binario.textoMedio(registro) for registro in registros] if self.gravadores else []
+                colunas = [list(registro[2:]) for registro in registros]
+            else:
+                linhas = [formato_binario.textoInstantaneo(registro) for registro in registros] \
+                    if self.gravadores else []
+                colunas = []
+        else:
+            try:
+                texto = bytes(payload).decode()
+            except UnicodeDecodeError:
+                self.invalidas += 1
+                return
+            linhas = [linha for linha in texto.split('\n') if linha]
+            colunas = [linha.split(';') for linha in linhas] if tipo == 'valores_medios' else []
+            registros = []
+            if tipo == 'valores_instantaneos' and self.agregador is not None:
+                for linha in linhas:
+                    try:
+                        registros.append(formato_binario.lerTextoInstantaneo(linha))
+                    except ValueError:
+                        self.invalidas += 1
+
+        if self.agregador is not None:
+            if tipo == 'valores_instantaneos':
+                for registro in registros:
+                    self.agregador.adicionar(*registro)
+        else:
+            for columns in colunas:
+                self.medicoes += 1
+                self.classificador.adicionarMedicao(columns, dispositivo)
+
+        if self.gravadores:
+            for linha in linhas:
+                self.gravadores[tipo].escrever(linha)
+
+    def executar(self, entrada):
+        if self.gravadores:
+            for gravador in self.gravadores.values():
+                gravador.iniciar()
+        self.classificador.iniciar()
+        self.recarregador.iniciar()
+        if self.agregador is not None:
+            self.agregador.iniciar()
+
+        while True:
+            item = entrada.get()
+            if item is None:
+                break
+            self.processar(*item)
+
+        self.recarregador.encerrar()
+        if self.agregador is not None:
+            self.agregador.encerrar()
+        self.classificador.encerrar()
+        if self.gravadores:
+            for gravador in self.gravadores.values():
+                gravador.fechar()
+
+
+def executarWorker(indice, entrada, resultados, caminhoModelo, caminhoTreinamento, raizLog,
+                   janelaSegundos, tamanhoMaximo, agregacaoNoServidor):
+    worker = None
+    try:
+        worker = Worker(indice, resultados, caminhoModelo, caminhoTreinamento, raizLog,
+                        janelaSegundos, tamanhoMaximo, agregacaoNoServidor)
+        worker.executar(entrada)
+    finally:
+        # Sinaliza ao despachante que este worker terminou
+        if worker is None:
+            resultados.put(('fim', indice, 0, 0, 0))
+        else:
+            resultados.put(('fim', indice, worker.mensagens, worker.medicoes, worker.invalidas))
+
+
+class IngestaoDistribuida(object):
+
+    def __init__(self, client, workers=None, prefixo=PREFIXO, caminhoModelo=modelo_knn.CAMINHO_MODELO,
+                 caminhoTreinamento=modelo_knn.CAMINHO_TREINAMENTO, raizLog=None,
+                 janelaSegundos=0.05, tamanhoMaximo=256, agregacaoNoServidor=True,
+                 ciclosParaLigar=3, ciclosParaDesligar=3):
+        self.client = client
+        self.workers = workers or os.cpu_count()
+        self.prefixo = prefixo
+        self.caminhoModelo = caminhoModelo
+        self.caminhoTreinamento = caminhoTreinamento
+        self.raizLog = raizLog
+        self.janelaSegundos = janelaSegundos
+        self.tamanhoMaximo = tamanhoMaximo
+        self.agregacaoNoServidor = agregacaoNoServidor
+
+        self.maquinaAlerta = MaquinaAlerta(self.publicarAlerta, ciclosParaLigar, ciclosParaDesligar)
+
+        self.entradas = []
+        self.processos = []
+        self.resultados = None
+        self.thread = None
+
+        # Contadores
+        self.despachadas = [0] * self.workers
+        self.alertas = 0
+        self.classificadas = 0
+        self.estatisticas = {}
+
+    def topicosAssinatura(self):
+        topicos = []
+        for topico in TOPICOS_DADOS:
+            topicos.append('{}/+/{}'.format(self.prefixo, topico))
+            topicos.append('{}/{}'.format(self.prefixo, topico))
+        return topicos
+
+    def iniciar(self):
+        contexto = multiprocessing.get_context()
+        self.resultados = contexto.Queue()
+        for indice in range(self.workers):
+            entrada = contexto.Queue()
+            processo = contexto.Process(
+                target=executarWorker, name='ingestao-{}'.format(indice),
+                args=(indice, entrada, self.resultados, self.caminhoModelo, self.caminhoTreinamento,
+                      self.raizLog, self.janelaSegundos, self.tamanhoMaximo, self.agregacaoNoServidor))
+            processo.daemon = True
+            processo.start()
+            self.entradas.append(entrada)
+            self.processos.append(processo)
+
+        self.thread = threading.Thread(target=self._publicarResultados, name='ingestao-alertas', daemon=True)
+        self.thread.start()
+        self.maquinaAlerta.iniciar()
+
+        self.client.on_connect = self.on_connect
+        self.client.on_message = self.on_message
+        if self.client.is_connected():
+            self.assinar()
+
+    def assinar(self):
+        for topico in self.topicosAssinatura():
+            self.client.subscribe(topico)
+
+    def on_connect(self, client, userdata, flags, rc):
+        # Renova as assinaturas a cada (re)conexao
+        self.assinar()
+
+    def on_message(self, client, userdata, msg):
+        self.despachar(msg.topic, msg.payload)
+
+    def despachar(self, topico, payload):
+        dispositivo = chaveDispositivo(topico, payload, self.prefixo)
+        particao = particaoDispositivo(dispositivo, self.workers)
+        self.despachadas[particao] += 1
+        self.entradas[particao].put((topico, dispositivo, payload))
+
+    def _publicarResultados(self):
+        ativos = self.workers
+        while ativos:
+            item = self.resultados.get()
+            if item[0] == 'fim':
+                indice, mensagens, medicoes, invalidas = item[1:]
+                self.estatisticas[indice] = {'mensagens': mensagens, 'medicoes': medicoes, 'invalidas': invalidas}
+                ativos -= 1
+                continue
+
+            dispositivo, classe = item
+            self.classificadas += 1
+            if classe == 'Alerta':
+                self.alertas += 1
+            self.maquinaAlerta.registrar(dispositivo, classe)
+
+    def publicarAlerta(self, dispositivo, valor):
+        if dispositivo:
+            topico = '{}/{}/alerta'.format(self.prefixo, dispositivo)
+        else:
+            topico = '{}/alerta'.format(self.prefixo)
+        self.client.publish(topico, valor, retain=True)
+
+    def encerrar(self):
+        # Os workers classificam o que falta na fila antes de sair
+        for entrada in self.entradas:
+            entrada.put(None)
+        for processo in self.processos:
+            processo.join()
+        if self.thread is not None:
+            self.thread.join()
+        self.maquinaAlerta.encerrar()
+
+
+def gerarIdCliente():
+    # clientId- add 10 caracteres aleatorios
+    return 'clientId-' + ''.join(random.choice(string.ascii_letters) for _ in range(10))
+
+
+def gerarTreinamentoSintetico(caminho, amostras=5000, semente=42):
+    aleatorio = random.Random(semente)
+    with open(caminho, 'w') as arquivo:
+        arquivo.write('hora,minuto,temp_minima,temp_maxima,latitude,longitude,Classe\n')
+        for _ in range(amostras):
+            minima = aleatorio.uniform(0, 30)
+            maxima = minima + aleatorio.uniform(0, 15)
+            classe = 'Alerta' if maxima > 35 or minima < 5 else 'Normal'
+            arquivo.write('{},{},{},{},{},{},{}\n'.format(
+                aleatorio.randint(0, 23), aleatorio.randint(0, 59), minima, maxima,
+                -25.4966884 + aleatorio.uniform(-0.05, 0.05), -49.2619725 + aleatorio.uniform(-0.05, 0.05), classe))
+
+
+def executarBenchmark(mensagens, quantidades, dispositivos):
+    temporario = tempfile.mkdtemp(prefix='ingestao_')
+    try:
+        caminhoTreinamento = os.path.join(temporario, 'treinamento.csv')
+        caminhoModelo = os.path.join(temporario, 'modelo_knn.joblib')
+        gerarTreinamentoSintetico(caminhoTreinamento)
+        modelo_knn.salvarArtefato(modelo_knn.treinarModelo(caminhoTreinamento), caminhoModelo)
+
+        aleatorio = random.Random(42)
+        macs = ['b8:27:eb:{:02x}:{:02x}:{:02x}'.format(i >> 16 & 0xff, i >> 8 & 0xff, i & 0xff)
+                for i in range(dispositivos)]
+        carga = []
+        for i in range(mensagens):
+            mac = macs[i % dispositivos]
+            minima = aleatorio.uniform(0, 30)
+            registro = (mac, 1736950000 + i, 12.0, 30.0, minima, minima + aleatorio.uniform(0, 15),
+                        -25.4966884, -49.2619725)
+            carga.append(('{}/{}/valores_medios'.format(PREFIXO, mac),
+                          formato_binario.codificar(formato_binario.TIPO_MEDIO, [registro])))
+
+        tempos = []
+        for workers in quantidades:
+            # Um broker por rodada, sem alertas retidos da anterior
+            host = 'benchmark-{}'.format(workers)
+            client = transporte.criarCliente('loopback', gerarIdCliente())
+            client.connect(host)
+            ingestao = IngestaoDistribuida(client, workers, caminhoModelo=caminhoModelo,
+                                           caminhoTreinamento=caminhoTreinamento, agregacaoNoServidor=False)
+            ingestao.iniciar()
+            client.loop_start()
+
+            dispositivo = transporte.criarCliente('loopback', 'benchmark')
+            dispositivo.connect(host)
+
+            inicio = time.perf_counter()
+            for topico, payload in carga:
+                dispositivo.publish(topico, payload, qos=1)
+            # Drena a fila do cliente e depois os workers
+            client.loop_stop()
+            ingestao.encerrar()
+            tempos.append(time.perf_counter() - inicio)
+
+            print('workers={}\t{:.2f}s\t{:.0f} msg/s\tspeedup={:.2f}x\t{} classificadas, {} alertas publicados'.format(
+                workers, tempos[-1], mensagens / tempos[-1], tempos[0] / tempos[-1], ingestao.classificadas,
+                ingestao.maquinaAlerta.publicadas))
+    finally:
+        shutil.rmtree(temporario, ignore_errors=True)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Ingestao distribuida em processos por dispositivo')
+    parser.add_argument('--workers', default=str(os.cpu_count()), help='processos (lista no benchmark: 1,2,4)')
+    parser.add_argument('--broker', default='broker.hivemq.com')
+    parser.add_argument('--porta', type=int, default=1883)
+    parser.add_argument('--log', default='/root/om', help='diretorio dos CSVs por worker')
+    parser.add_argument('--benchmark', type=int, default=0, help='mensagens sinteticas (sem broker)')
+    parser.add_argument('--dispositivos', type=int, default=1000)
+    args = parser.parse_args()
+
+    quantidades = [int(valor) for valor in args.workers.split(',')]
+
+    if args.benchmark:
+        executarBenchmark(args.benchmark, quantidades, args.dispositivos)
+        return
+
+    client = transporte.criarCliente('paho', gerarIdCliente())
+    ingestao = IngestaoDistribuida(client, quantidades[0], raizLog=args.log)
+    ingestao.iniciar()
+
+    client.connect_async(args.broker, args.porta)
+    client.loop_start()
+    try:
+        while True:
+            time.sleep(60)
+            print('Despachadas por worker: {} | classificadas: {} | alertas: {}'.format(
+                ingestao.despachadas, ingestao.classificadas, ingestao.alertas))
+    except KeyboardInterrupt:
+        pass
+    finally:
+        client.loop_stop()
+        ingestao.encerrar()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,177 @@
+"""
+Per-device alert state machine with hysteresis and publish-on-change.
+
+1. **Problem:**
+   - Publishing `on`/`off` for every classified measurement makes each device react (GPIO write, print)
+     even when nothing changed, and sends one broker message per classification.
+
+2. **Hysteresis:**
+   - A device's alert is raised only after `ciclosParaLigar` consecutive `Alerta` predictions and cleared only
+     after `ciclosParaDesligar` consecutive non-`Alerta` predictions; isolated flips are absorbed.
+   - Measurements without a device id (legacy text `valores_medios`) cannot be told apart, so they all share the
+     state `DISPOSITIVO_LEGADO` (published with `dispositivo=None`, i.e. on the legacy topic). Its hysteresis only
+     makes sense with a single legacy device; devices that send their id each keep their own state.
+
+3. **Publish on Change:**
+   - `on`/`off` is published (retained) only on a transition, plus once when a device is first seen, so a stale
+     retained `on` from a previous run is cleared.
+   - `renovar` republishes the retained state of devices not published for `intervaloRenovacao` seconds,
+     so subscribers that lost the retained message converge again.
+
+4. **Inspection:**
+   - `estado()` returns a snapshot of the table (state, pending count, last class, transitions, timestamps),
+     and `salvarEstado(caminho)` writes it as JSON (temporary file + rename).
+   - `carregarEstado(caminho)` restores that table at startup, so after a restart the known devices are not
+     "first seen" again and an active alert is not cleared by a retained `off`.
+   - Counters: `classificacoes`, `publicadas`, `suprimidas`.
+"""
+
+import json
+import os
+import threading
+import time
+
+# Estado compartilhado pelas medicoes sem dispositivo (nunca coincide com um MAC)
+DISPOSITIVO_LEGADO = '<legado>'
+
+
+class EstadoAlerta(object):
+
+    __slots__ = ('ativo', 'consecutivos', 'ultimaClasse', 'transicoes', 'atualizadoEm', 'publicadoEm')
+
+    def __init__(self):
+        self.ativo = False
+        self.consecutivos = 0
+        self.ultimaClasse = None
+        self.transicoes = 0
+        self.atualizadoEm = None
+        self.publicadoEm = None
+
+
+class MaquinaAlerta(object):
+
+    def __init__(self, publicar, ciclosParaLigar=3, ciclosParaDesligar=3, intervaloRenovacao=3600):
+        # publicar(dispositivo, 'on' | 'off') -> None (publicacao retida)
+        self.publicar = publicar
+        self.ciclosParaLigar = max(1, ciclosParaLigar)
+        self.ciclosParaDesligar = max(1, ciclosParaDesligar)
+        self.intervaloRenovacao = intervaloRenovacao
+
+        self.estados = {}
+        self.trava = threading.Lock()
+
+        self.parar = threading.Event()
+        self.thread = None
+
+        # Contadores
+        self.classificacoes = 0
+        self.publicadas = 0
+        self.suprimidas = 0
+
+    def registrar(self, dispositivo, classe):
+        # Retorna 'on'/'off' quando publicou, senao None
+        agora = time.time()
+        alerta = classe == 'Alerta'
+        if dispositivo is None:
+            dispositivo = DISPOSITIVO_LEGADO
+
+        with self.trava:
+            self.classificacoes += 1
+            estado = self.estados.get(dispositivo)
+            novo = estado is None
+            if novo:
+                estado = self.estados[dispositivo] = EstadoAlerta()
+
+            estado.ultimaClasse = classe
+            estado.atualizadoEm = agora
+
+            if alerta == estado.ativo:
+                estado.consecutivos = 0
+            else:
+                estado.consecutivos += 1
+                if estado.consecutivos >= (self.ciclosParaLigar if alerta else self.ciclosParaDesligar):
+                    estado.ativo = alerta
+                    estado.consecutivos = 0
+                    estado.transicoes += 1
+                    novo = True
+
+            if not novo:
+                self.suprimidas += 1
+                return None
+
+            estado.publicadoEm = agora
+            valor = 'on' if estado.ativo else 'off'
+
+        self._publicar(dispositivo, valor)
+        return valor
+
+    def _publicar(self, dispositivo, valor):
+        self.publicadas += 1
+        try:
+            self.publicar(None if dispositivo == DISPOSITIVO_LEGADO else dispositivo, valor)
+        except Exception as erro:
+            print('Erro ao publicar alerta de {}: {}'.format(dispositivo, erro))
+
+    def renovar(self, agora=None):
+        agora = time.time() if agora is None else agora
+        pendentes = []
+        with self.trava:
+            for dispositivo, estado in self.estados.items():
+                if estado.publicadoEm is None or agora - estado.publicadoEm >= self.intervaloRenovacao:
+                    estado.publicadoEm = agora
+                    pendentes.append((dispositivo, 'on' if estado.ativo else 'off'))
+
+        for dispositivo, valor in pendentes:
+            self._publicar(dispositivo, valor)
+        return len(pendentes)
+
+    def estado(self):
+        with self.trava:
+            return {str(dispositivo): {'ativo': estado.ativo, 'consecutivos': estado.consecutivos,
+                                       'ultimaClasse': estado.ultimaClasse, 'transicoes': estado.transicoes,
+                                       'atualizadoEm': estado.atualizadoEm, 'publicadoEm': estado.publicadoEm}
+                    for dispositivo, estado in self.estados.items()}
+
+    def carregarEstado(self, caminho):
+        # Retorna quantos dispositivos foram restaurados (0 sem arquivo)
+        try:
+            with open(caminho) as arquivo:
+                dispositivos = json.load(arquivo).get('dispositivos', {})
+        except FileNotFoundError:
+            return 0
+
+        with self.trava:
+            for chave, dados in dispositivos.items():
+                estado = EstadoAlerta()
+                for campo in EstadoAlerta.__slots__:
+                    if campo in dados:
+                        setattr(estado, campo, dados[campo])
+                # Arquivos anteriores gravavam o estado legado como 'None'
+                self.estados[DISPOSITIVO_LEGADO if chave == 'None' else chave] = estado
+        return len(dispositivos)
+
+    def salvarEstado(self, caminho):
+        temporario = '{}.tmp'.format(caminho)
+        with open(temporario, 'w') as arquivo:
+            json.dump({'classificacoes': self.classificacoes, 'publicadas': self.publicadas,
+                       'suprimidas': self.suprimidas, 'dispositivos': self.estado()}, arquivo, indent=1)
+        os.replace(temporario, caminho)
+
+    def iniciar(self, caminhoEstado=None, intervalo=60):
+        self.thread = threading.Thread(target=self._executar, args=(caminhoEstado, intervalo),
+                                       name='maquina-alerta', daemon=True)
+        self.thread.start()
+
+    def encerrar(self):
+        self.parar.set()
+        if self.thread is not None:
+            self.thread.join()
+
+    def _executar(self, caminhoEstado, intervalo):
+        while not self.parar.wait(intervalo):
+            self.renovar()
+            if caminhoEstado is not None:
+                try:
+                    self.salvarEstado(caminhoEstado)
+                except OSError as erro:
+                    print('Erro ao gravar estado dos alertas {}: {}'.format(caminhoEstado, erro))
@@ -0,0 +1,279 @@
+"""
+Lightweight hot-path instrumentation for the MQTT services (`ML_Model_on_hadoop.py`, `remote_iot.py`).
+
+1. **Metric Types:**
+   - `Contador`: monotonically increasing count (messages, reconnects, publishes).
+   - `Histograma`: fixed buckets (latencies in seconds by default) with count and sum; `observar` is a
+     `bisect` plus two additions under a lock.
+   - `Medidor`: a callback read only at export time, used for queue depths and counters kept by other objects,
+     so the hot path pays nothing for it.
+   - Metrics may carry labels (`metricas.histograma('gravacao_csv_segundos', arquivo='medios')`).
+
+2. **Disabled Mode:**
+   - `criarMetricas(False)` returns `METRICAS_NULAS`, whose counters and histograms are shared no-op objects,
+     so instrumented code runs unchanged at the cost of one empty method call.
+
+3. **Exposure:**
+   - `iniciarServidor(porta)`: local HTTP endpoint (`http.server`, own thread) serving `/metrics` in the
+     Prometheus text format and `/metrics.json` as JSON; `http.server` is imported only here, so devices
+     that do not serve metrics do not pay for it at startup.
+   - `iniciarSnapshot(caminho, intervalo)`: writes the JSON snapshot periodically (temporary file + rename).
+   - The JSON snapshot includes p50/p99 estimated from the histogram buckets.
+"""
+
+import bisect
+import json
+import os
+import threading
+import time
+
+LIMITES_LATENCIA = (0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5,
+                    1.0, 2.5, 5.0, 10.0)
+
+
+def formatarRotulos(rotulos, extra=None):
+    itens = list(rotulos) + ([extra] if extra else [])
+    if not itens:
+        return ''
+    return '{' + ','.join('{}="{}"'.format(chave, valor) for chave, valor in itens) + '}'
+
+
+class Contador(object):
+
+    def __init__(self):
+        self.valor = 0
+        self.trava = threading.Lock()
+
+    def incrementar(self, quantidade=1):
+        with self.trava:
+            self.valor += quantidade
+
+
+class Histograma(object):
+
+    def __init__(self, limites=LIMITES_LATENCIA):
+        self.limites = tuple(limites)
+        self.contagens = [0] * (len(self.limites) + 1)
+        self.soma = 0.0
+        self.quantidade = 0
+        self.trava = threading.Lock()
+
+    def observar(self, valor):
+        posicao = bisect.bisect_left(self.limites, valor)
+        with self.trava:
+            self.contagens[posicao] += 1
+            self.soma += valor
+            self.quantidade += 1
+
+    def percentil(self, p):
+        # Limite superior do bucket que contem o percentil p
+        with self.trava:
+            contagens = list(self.contagens)
+            quantidade = self.quantidade
+        if not quantidade:
+            return None
+        alvo = p / 100.0 * quantidade
+        acumulado = 0
+        for limite, contagem in zip(self.limites + (float('inf'),), contagens):
+            acumulado += contagem
+            if acumulado >= alvo:
+                return limite
+        return float('inf')
+
+
+class Medidor(object):
+
+    def __init__(self, funcao):
+        self.funcao = funcao
+
+    def ler(self):
+        try:
+            return self.funcao()
+        except Exception:
+            return None
+
+
+class Metricas(object):
+
+    def __init__(self):
+        # (tipo, nome) -> {rotulos: metrica}
+        self.metricas = {}
+        self.ajudas = {}
+        self.trava = threading.Lock()
+        self.servidor = None
+        self.parar = threading.Event()
+        self.thread = None
+
+    def _obter(self, tipo, nome, rotulos, fabrica, ajuda):
+        chaveRotulos = tuple(sorted(rotulos.items()))
+        with self.trava:
+            familia = self.metricas.setdefault((tipo, nome), {})
+            if ajuda:
+                self.ajudas[nome] = ajuda
+            metrica = familia.get(chaveRotulos)
+            if metrica is None:
+                metrica = familia[chaveRotulos] = fabrica()
+            return metrica
+
+    def contador(self, nome, ajuda=None, **rotulos):
+        return self._obter('counter', nome, rotulos, Contador, ajuda)
+
+    def histograma(self, nome, ajuda=None, limites=LIMITES_LATENCIA, **rotulos):
+        return self._obter('histogram', nome, rotulos, lambda: Histograma(limites), ajuda)
+
+    def medidor(self, nome, funcao, ajuda=None, **rotulos):
+        chaveRotulos = tuple(sorted(rotulos.items()))
+        with self.trava:
+            self.metricas.setdefault(('gauge', nome), {})[chaveRotulos] = Medidor(funcao)
+            if ajuda:
+                self.ajudas[nome] = ajuda
+
+    # ----------------------------------------------------------------- exportacao
+
+    def _familias(self):
+        with self.trava:
+            return sorted((chave, list(familia.items())) for chave, familia in self.metricas.items())
+
+    def textoPrometheus(self):
+        linhas = []
+        for (tipo, nome), familia in self._familias():
+            if nome in self.ajudas:
+                linhas.append('# HELP {} {}'.format(nome, self.ajudas[nome]))
+            linhas.append('# TYPE {} {}'.format(nome, tipo))
+            for rotulos, metrica in familia:
+                if tipo == 'counter':
+                    linhas.append('{}{} {}'.format(nome, formatarRotulos(rotulos), metrica.valor))
+                elif tipo == 'gauge':
+                    valor = metrica.ler()
+                    if valor is not None:
+                        linhas.append('{}{} {}'.format(nome, formatarRotulos(rotulos), valor))
+                else:
+                    with metrica.trava:
+                        contagens = list(metrica.contagens)
+                        soma = metrica.soma
+                        quantidade = metrica.quantidade
+                    acumulado = 0
+                    for limite, contagem in zip(metrica.limites + ('+Inf',), contagens):
+                        acumulado += contagem
+                        linhas.append('{}_bucket{} {}'.format(nome, formatarRotulos(rotulos, ('le', limite)),
+                                                              acumulado))
+                    linhas.append('{}_sum{} {}'.format(nome, formatarRotulos(rotulos), soma))
+                    linhas.append('{}_count{} {}'.format(nome, formatarRotulos(rotulos), quantidade))
+        return '\n'.join(linhas) + '\n'
+
+    def snapshot(self):
+        resultado = {'tempo': time.time()}
+        for (tipo, nome), familia in self._familias():
+            for rotulos, metrica in familia:
+                chave = nome + formatarRotulos(rotulos)
+                if tipo == 'counter':
+                    resultado[chave] = metrica.valor
+                elif tipo == 'gauge':
+                    resultado[chave] = metrica.ler()
+                else:
+                    resultado[chave] = {'quantidade': metrica.quantidade, 'soma': metrica.soma,
+                                        'p50': metrica.percentil(50), 'p99': metrica.percentil(99)}
+        return resultado
+
+    def gravarSnapshot(self, caminho):
+        temporario = '{}.tmp'.format(caminho)
+        with open(temporario, 'w') as arquivo:
+            json.dump(self.snapshot(), arquivo, indent=1, default=str)
+        os.replace(temporario, caminho)
+
+    def iniciarServidor(self, porta, endereco='127.0.0.1'):
+        from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+        metricas = self
+
+        class Manipulador(BaseHTTPRequestHandler):
+
+            def do_GET(self):
+                if self.path == '/metrics':
+                    corpo = metricas.textoPrometheus().encode()
+                    tipo = 'text/plain; version=0.0.4'
+                elif self.path == '/metrics.json':
+                    corpo = json.dumps(metricas.snapshot(), default=str).encode()
+                    tipo = 'application/json'
+                else:
+                    self.send_error(404)
+                    return
+                self.send_response(200)
+                self.send_header('Content-Type', tipo)
+                self.send_header('Content-Length', str(len(corpo)))
+                self.end_headers()
+                self.wfile.write(corpo)
+
+            def log_message(self, formato, *args):
+                pass
+
+        self.servidor = ThreadingHTTPServer((endereco, porta), Manipulador)
+        self.servidor.daemon_threads = True
+        threading.Thread(target=self.servidor.serve_forever, name='metricas-http', daemon=True).start()
+
+    def iniciarSnapshot(self, caminho, intervalo=60):
+        self.thread = threading.Thread(target=self._executarSnapshot, args=(caminho, intervalo),
+                                       name='metricas-snapshot', daemon=True)
+        self.thread.start()
+
+    def _executarSnapshot(self, caminho, intervalo):
+        while not self.parar.wait(intervalo):
+            try:
+                self.gravarSnapshot(caminho)
+            except OSError as erro:
+                print('Erro ao gravar metricas {}: {}'.format(caminho, erro))
+
+    def encerrar(self):
+        self.parar.set()
+        if self.thread is not None:
+            self.thread.join()
+        if self.servidor is not None:
+            self.servidor.shutdown()
+            self.servidor.server_close()
+
+
+class ContadorNulo(object):
+
+    def incrementar(self, quantidade=1):
+        pass
+
+
+class HistogramaNulo(object):
+
+    def observar(self, valor):
+        pass
+
+
+class MetricasNulas(object):
+    # Mesma interface de Metricas, sem custo quando a instrumentacao esta desligada
+
+    contadorNulo = ContadorNulo()
+    histogramaNulo = HistogramaNulo()
+
+    def contador(self, nome, ajuda=None, **rotulos):
+        return self.contadorNulo
+
+    def histograma(self, nome, ajuda=None, limites=LIMITES_LATENCIA, **rotulos):
+        return self.histogramaNulo
+
+    def medidor(self, nome, funcao, ajuda=None, **rotulos):
+        pass
+
+    def snapshot(self):
+        return {}
+
+    def iniciarServidor(self, porta, endereco='127.0.0.1'):
+        pass
+
+    def iniciarSnapshot(self, caminho, intervalo=60):
+        pass
+
+    def encerrar(self):
+        pass
+
+
+METRICAS_NULAS = MetricasNulas()
+
+
+def criarMetricas(habilitado=True):
+    return Metricas() if habilitado else METRICAS_NULAS
@@ -0,0 +1,137 @@
+"""
+Versioned KNN model artifact shared by `treinar_modelo.py` (train once) and `ML_Model_on_hadoop.py` (serve many).
+
+1. **Training:**
+   - Reads `treinamento.csv` generated by `pre_processing/generate_database.py`.
+   - Fits `KNeighborsClassifier` on the whole dataset (no holdout), using a KD-tree or ball-tree
+     over `temp_minima`, `temp_maxima`, `latitude` and `longitude`, so the spatial index is built at training time.
+   - `vizinhos`, `pesos` (`uniform`/`distance`) and the feature set are parameters; the feature sets are in
+     `CONJUNTOS_FEATURES` (`todas`, or `temperaturas`: min/max only). The sweep that picks them is in
+     `treinar_modelo.py --varredura`.
+   - A model trained on a subset of the features is wrapped in `ModeloColunas`, which selects its columns from the
+     usual four-column matrix (`montarMatrizFeatures`), so the services call `predict` unchanged.
+   - `compilar=True` also compiles the fitted model into a lookup table over the quantized feature domain
+     (`modelo_tabela.ModeloTabela`, same `predict`, real KNN outside the domain); it is rebuilt on every retrain.
+     `ajustarGrade=True` snaps raw coordinates to their cell before the lookup (see `modelo_tabela.py`).
+
+2. **Artifact:**
+   - A dictionary saved with `joblib` containing the fitted model (with its prebuilt tree), the feature columns,
+     the number of samples, the training parameters and a version string (`AAAAMMDDHHMMSS-<sha1 of the CSV>`).
+   - When trained by the sweep, `avaliacao` keeps the cross-validated and holdout accuracy and the prediction
+     latency of the chosen configuration, so the next retrain can be compared with it.
+   - `VERSAO_FORMATO` is checked on load so an incompatible artifact is rejected instead of misused.
+   - The file is written to a temporary name and renamed, so a reader never sees a half-written artifact.
+
+3. **Loading:**
+   - `carregarArtefato` loads the artifact with `mmap_mode='r'`, memory-mapping the tree arrays instead of
+     re-reading the CSV and refitting, which keeps service startup in the millisecond range.
+"""
+
+import hashlib
+import os
+import time
+from datetime import datetime
+
+import joblib
+import numpy as np
+import pandas as pd
+from sklearn.neighbors import KNeighborsClassifier
+
+from classificador_lote import COLUNAS_MODELO
+
+CAMINHO_TREINAMENTO = '/root/om/PreProcessamento/treinamento.csv'
+CAMINHO_MODELO = '/root/om/PreProcessamento/modelo_knn.joblib'
+
+VERSAO_FORMATO = 1
+
+# Conjuntos de features avaliados na varredura (subconjuntos de COLUNAS_MODELO)
+CONJUNTOS_FEATURES = {
+    'todas': COLUNAS_MODELO,
+    'temperaturas': ['temp_minima', 'temp_maxima'],
+}
+
+
+class ModeloColunas(object):
+    # KNN treinado com parte das colunas; recebe a matriz completa (COLUNAS_MODELO) como os servicos a montam
+
+    def __init__(self, modelo, colunas):
+        self.modelo = modelo
+        self.colunas = list(colunas)
+        self.indices = [COLUNAS_MODELO.index(coluna) for coluna in colunas]
+        self.classes_ = modelo.classes_
+
+    def predict(self, matriz):
+        return self.modelo.predict(np.asarray(matriz)[:, self.indices])
+
+
+def criarModelo(x, y, vizinhos=4, algoritmo='kd_tree', pesos='uniform', colunas=COLUNAS_MODELO):
+    # x tem as colunas de 'colunas'
+    modelo = KNeighborsClassifier(n_neighbors=vizinhos, algorithm=algoritmo, weights=pesos)
+    modelo = modelo.fit(x, y)
+    if list(colunas) != COLUNAS_MODELO:
+        modelo = ModeloColunas(modelo, colunas)
+    return modelo
+
+
+def calcularHashArquivo(caminho):
+    sha1 = hashlib.sha1()
+    with open(caminho, 'rb') as arquivo:
+        for bloco in iter(lambda: arquivo.read(1 << 20), b''):
+            sha1.update(bloco)
+    return sha1.hexdigest()
+
+
+def treinarModelo(caminhoTreinamento=CAMINHO_TREINAMENTO, vizinhos=4, algoritmo='kd_tree', colunas=COLUNAS_MODELO,
+                  pesos='uniform', avaliacao=None, compilar=False, ajustarGrade=False):
+
+    if any(coluna not in COLUNAS_MODELO for coluna in colunas):
+        raise ValueError('colunas devem estar em {}'.format(COLUNAS_MODELO))
+
+    data = pd.read_csv(caminhoTreinamento)
+
+    x = data[colunas].values
+    y = data['Classe'].values
+
+    # treina o classificador com toda a base (a arvore e construida aqui)
+    modelo = criarModelo(x, y, vizinhos, algoritmo, pesos, colunas)
+
+    if compilar:
+        from modelo_tabela import ModeloTabela
+
+        try:
+            modelo = ModeloTabela(modelo, data[COLUNAS_MODELO].values, ajustarGrade=ajustarGrade)
+        except ValueError as erro:
+            # Dominio sem tabela: segue com o KNN
+            print('Modelo nao compilado: {}'.format(erro))
+            compilar = False
+
+    hashTreinamento = calcularHashArquivo(caminhoTreinamento)
+
+    return {
+        'versao_formato': VERSAO_FORMATO,
+        'versao': '{}-{}'.format(datetime.now().strftime('%Y%m%d%H%M%S'), hashTreinamento[:8]),
+        'hash_treinamento': hashTreinamento,
+        'colunas': list(colunas),
+        'amostras': len(data),
+        'parametros': {'vizinhos': vizinhos, 'algoritmo': algoritmo, 'pesos': pesos, 'compilado': compilar,
+                       'ajustarGrade': ajustarGrade if compilar else False},
+        'avaliacao': avaliacao,
+        'criado_em': time.time(),
+        'modelo': modelo,
+    }
+
+
+def salvarArtefato(artefato, caminho=CAMINHO_MODELO):
+    # Grava em arquivo temporario e renomeia (troca atomica)
+    temporario = '{}.tmp.{}'.format(caminho, os.getpid())
+    joblib.dump(artefato, temporario)
+    os.replace(temporario, caminho)
+
+
+def carregarArtefato(caminho=CAMINHO_MODELO):
+    artefato = joblib.load(caminho, mmap_mode='r')
+
+    if not isinstance(artefato, dict) or artefato.get('versao_formato') != VERSAO_FORMATO:
+        raise ValueError('Artefato de modelo incompativel: {}'.format(caminho))
+
+    return artefato
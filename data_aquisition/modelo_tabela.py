@@ -0,0 +1,202 @@
+"""
+KNN classifier compiled into a lookup table over the quantized feature domain.
+
+1. **Domain:**
+   - DHT11 temperatures are integers, so `temp_minima`/`temp_maxima` take integer values in
+     `FAIXA_TEMPERATURA` (widened to the range of the training base), with `temp_minima <= temp_maxima`.
+   - Latitude/longitude are snapped to the 0.05 degree grid by `map_database.py`/`generate_database.py`
+     (`round(0.05 * rint(x / 0.05), 2)`); the table covers the cells of the training base plus `MARGEM_CELULAS`
+     cells around each one. A model trained only on the temperatures (`modelo_knn.ModeloColunas`) has one plane.
+
+2. **Compilation:**
+   - `ModeloTabela(modelo, matrizTreinamento)` predicts every point of the domain once with the fitted KNN and keeps
+     the class index in a dense `uint8` array `[celula, temp_minima, temp_maxima]`; the cells are found by
+     binary search on their sorted codes (batches) or in a dict (single rows).
+   - It is built by `modelo_knn.treinarModelo(compilar=True)`, so every retrain (`treinar_modelo.py --compilar`,
+     or the retrain of `RecarregadorModelo`) builds a new table with the model; the artifact keeps both.
+
+3. **Prediction:**
+   - `predict` has the interface of the KNN: a single row costs a dict lookup and one array index, a batch a few
+     vectorized NumPy operations. Rows outside the domain (non-integer temperatures, coordinates off the grid,
+     unknown cells, out of range) go to the real KNN, so the result is always the KNN prediction.
+   - `ajustarGrade=True` snaps raw coordinates (e.g. straight from the GPS) to their cell instead of falling back,
+     the same quantization as the training base; the prediction is then the one of the cell, which can differ
+     from the KNN on the raw coordinates near cell edges. The services publish raw averaged coordinates, so
+     without it they never hit the table.
+   - Counters `consultasTabela` and `consultasModelo` tell how often the table was hit.
+"""
+
+import math
+
+import numpy as np
+
+from classificador_lote import COLUNAS_MODELO
+
+BASE_GRADE = 0.05
+
+# Faixa de medicao do DHT11 (C)
+FAIXA_TEMPERATURA = (0, 50)
+
+MARGEM_CELULAS = 1
+
+# Tamanho maximo da tabela (entradas) e pontos por chamada de predict na compilacao
+MAXIMO_ENTRADAS = 50000000
+TAMANHO_BLOCO = 65536
+
+SEM_PREVISAO = 255
+
+
+def celula(valor):
+    return int(round(valor / BASE_GRADE))
+
+
+def coordenadaCelula(indice):
+    return round(BASE_GRADE * indice, 2)
+
+
+class ModeloTabela(object):
+
+    def __init__(self, modelo, matrizTreinamento, faixaTemperatura=FAIXA_TEMPERATURA, margemCelulas=MARGEM_CELULAS,
+                 ajustarGrade=False):
+        # matrizTreinamento tem as colunas de COLUNAS_MODELO, como a usada no treino
+        self.modelo = modelo
+        self.classes_ = modelo.classes_
+        self.ajustarGrade = ajustarGrade
+        if len(self.classes_) >= SEM_PREVISAO:
+            raise ValueError('classes demais para a tabela: {}'.format(len(self.classes_)))
+
+        colunas = getattr(modelo, 'colunas', COLUNAS_MODELO)
+        if set(colunas) == set(COLUNAS_MODELO):
+            self.usaCelulas = True
+        elif set(colunas) == {'temp_minima', 'temp_maxima'}:
+            self.usaCelulas = False
+        else:
+            raise ValueError('colunas sem tabela compilada: {}'.format(colunas))
+
+        matrizTreinamento = np.asarray(matrizTreinamento, dtype=np.float64)
+        temperaturas = matrizTreinamento[:, :2]
+        self.temperaturaInicial = min(faixaTemperatura[0], int(math.floor(temperaturas.min())))
+        temperaturaFinal = max(faixaTemperatura[1], int(math.ceil(temperaturas.max())))
+        self.quantidadeTemperaturas = temperaturaFinal - self.temperaturaInicial + 1
+
+        if self.usaCelulas:
+            vistas = set(zip(np.rint(matrizTreinamento[:, 2] / BASE_GRADE).astype(np.int64).tolist(),
+                             np.rint(matrizTreinamento[:, 3] / BASE_GRADE).astype(np.int64).tolist()))
+            celulas = sorted({(latitude + deltaLatitude, longitude + deltaLongitude)
+                              for latitude, longitude in vistas
+                              for deltaLatitude in range(-margemCelulas, margemCelulas + 1)
+                              for deltaLongitude in range(-margemCelulas, margemCelulas + 1)})
+        else:
+            celulas = [(0, 0)]
+
+        entradas = len(celulas) * self.quantidadeTemperaturas ** 2
+        if entradas > MAXIMO_ENTRADAS:
+            raise ValueError('dominio grande demais para a tabela: {} entradas'.format(entradas))
+
+        # Codigos das celulas (ordenados) para a busca vetorizada, e dict para a consulta de uma linha
+        self.latitudeInicial = min(latitude for latitude, _ in celulas)
+        self.longitudeInicial = min(longitude for _, longitude in celulas)
+        self.larguraCodigo = max(longitude for _, longitude in celulas) - self.longitudeInicial + 1
+        self.codigos = np.array([self._codigo(latitude, longitude) for latitude, longitude in celulas], dtype=np.int64)
+        self.planos = {celulaGrade: plano for plano, celulaGrade in enumerate(celulas)}
+
+        self.tabela = self._compilar(celulas)
+
+        # Contadores
+        self.consultasTabela = 0
+        self.consultasModelo = 0
+
+    def _codigo(self, latitude, longitude):
+        return (latitude - self.latitudeInicial) * self.larguraCodigo + (longitude - self.longitudeInicial)
+
+    def _compilar(self, celulas):
+        quantidade = self.quantidadeTemperaturas
+        minimas, maximas = np.triu_indices(quantidade)
+        pares = np.column_stack([minimas + self.temperaturaInicial, maximas + self.temperaturaInicial])
+        tabela = np.full((len(celulas), quantidade, quantidade), SEM_PREVISAO, dtype=np.uint8)
+
+        pontos = np.empty((len(pares), 4), dtype=np.float64)
+        pontos[:, :2] = pares
+        for plano, (latitude, longitude) in enumerate(celulas):
+            pontos[:, 2] = coordenadaCelula(latitude)
+            pontos[:, 3] = coordenadaCelula(longitude)
+            previstos = np.concatenate([self.modelo.predict(pontos[inicio:inicio + TAMANHO_BLOCO])
+                                        for inicio in range(0, len(pontos), TAMANHO_BLOCO)])
+            tabela[plano, minimas, maximas] = np.searchsorted(self.classes_, previstos)
+        return tabela
+
+    def _consultarLinha(self, linha):
+        # Indice da classe na tabela, ou None fora do dominio
+        minima, maxima, latitude, longitude = (float(valor) for valor in linha)
+        if not (minima.is_integer() and maxima.is_integer()):
+            return None
+        indiceMinima = int(minima) - self.temperaturaInicial
+        indiceMaxima = int(maxima) - self.temperaturaInicial
+        if not (0 <= indiceMinima < self.quantidadeTemperaturas and 0 <= indiceMaxima < self.quantidadeTemperaturas):
+            return None
+
+        plano = 0
+        if self.usaCelulas:
+            if not (math.isfinite(latitude) and math.isfinite(longitude)):
+                return None
+            celulaLatitude = celula(latitude)
+            celulaLongitude = celula(longitude)
+            if not self.ajustarGrade and (coordenadaCelula(celulaLatitude) != latitude or
+                                          coordenadaCelula(celulaLongitude) != longitude):
+                return None
+            plano = self.planos.get((celulaLatitude, celulaLongitude))
+            if plano is None:
+                return None
+
+        indice = self.tabela.item(plano, indiceMinima, indiceMaxima)
+        return None if indice == SEM_PREVISAO else indice
+
+    def predict(self, matriz):
+        matriz = np.asarray(matriz, dtype=np.float64)
+
+        if len(matriz) == 1:
+            indice = self._consultarLinha(matriz[0])
+            if indice is not None:
+                self.consultasTabela += 1
+                return self.classes_[indice:indice + 1]
+            self.consultasModelo += 1
+            return self.modelo.predict(matriz)
+
+        indices = self._consultarLote(matriz)
+        fora = indices == SEM_PREVISAO
+        previstos = self.classes_[np.where(fora, 0, indices)]
+        quantidadeFora = int(fora.sum())
+        if quantidadeFora:
+            previstos[fora] = self.modelo.predict(matriz[fora])
+        self.consultasTabela += len(matriz) - quantidadeFora
+        self.consultasModelo += quantidadeFora
+        return previstos
+
+    def _consultarLote(self, matriz):
+        # Indices das classes na tabela (SEM_PREVISAO fora do dominio)
+        with np.errstate(invalid='ignore'):
+            indiceMinima = matriz[:, 0] - self.temperaturaInicial
+            indiceMaxima = matriz[:, 1] - self.temperaturaInicial
+            dentro = ((indiceMinima == np.floor(indiceMinima)) & (indiceMaxima == np.floor(indiceMaxima)) &
+                      (indiceMinima >= 0) & (indiceMinima < self.quantidadeTemperaturas) &
+                      (indiceMaxima >= 0) & (indiceMaxima < self.quantidadeTemperaturas))
+
+            planos = np.zeros(len(matriz), dtype=np.int64)
+            if self.usaCelulas:
+                celulasLatitude = np.rint(matriz[:, 2] / BASE_GRADE)
+                celulasLongitude = np.rint(matriz[:, 3] / BASE_GRADE)
+                dentro &= np.isfinite(celulasLatitude) & np.isfinite(celulasLongitude)
+                if not self.ajustarGrade:
+                    dentro &= ((np.round(BASE_GRADE * celulasLatitude, 2) == matriz[:, 2]) &
+                               (np.round(BASE_GRADE * celulasLongitude, 2) == matriz[:, 3]))
+                celulasLongitude -= self.longitudeInicial
+                dentro &= (celulasLongitude >= 0) & (celulasLongitude < self.larguraCodigo)
+                codigos = np.where(dentro, (celulasLatitude - self.latitudeInicial) * self.larguraCodigo +
+                                   celulasLongitude, -1).astype(np.int64)
+                planos = np.minimum(np.searchsorted(self.codigos, codigos), len(self.codigos) - 1)
+                dentro &= self.codigos[planos] == codigos
+
+        indices = np.full(len(matriz), SEM_PREVISAO, dtype=np.uint8)
+        indices[dentro] = self.tabela[planos[dentro], indiceMinima[dentro].astype(np.int64),
+                                      indiceMaxima[dentro].astype(np.int64)]
+        return indices
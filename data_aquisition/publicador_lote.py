@@ -0,0 +1,236 @@
+"""
+Store-and-forward batch publisher for `remote_iot.py`.
+
+1. **Batching:**
+   - `adicionar(leitura)` appends a reading to the current batch; the batch is closed when it has
+     `tamanhoLote` readings or when `intervaloLote` seconds have passed since its first reading,
+     or right away with `fecharLote()` (e.g. the first reading after startup).
+   - A closed batch is sent as one MQTT message (readings separated by `\\n`) with QoS 1, so fewer
+     packets go on the air than with one message per reading.
+   - `codificar` replaces the text payload, e.g. with the binary format of `formato_binario.py`; readings are
+     then records (lists) and are encoded only when sent, so the offline queue format does not change.
+
+2. **Offline Queue:**
+   - Batches that cannot be sent (broker disconnected, publish not acknowledged) stay in a pending queue
+     which is persisted to `caminhoFila` (one JSON list per line), so a reboot does not lose them.
+   - The queue is bounded to `maximoLotesFila` batches; beyond that the oldest batch is dropped.
+
+3. **Draining:**
+   - After reconnecting, the backlog is sent oldest first at no more than `taxaDrenagem` batches per second.
+
+4. **Counters:**
+   - `enfileirados` (batches written to the offline queue), `enviados` and `descartados`.
+"""
+
+import json
+import os
+import threading
+import time
+from collections import deque
+
+
+class PublicadorEmLote(object):
+
+    def __init__(self, client, topico, caminhoFila, tamanhoLote=5, intervaloLote=300.0,
+                 maximoLotesFila=10000, taxaDrenagem=2.0, qos=1, timeoutEnvio=10.0, codificar=None):
+        self.client = client
+        self.topico = topico
+        self.caminhoFila = caminhoFila
+        self.tamanhoLote = max(1, tamanhoLote)
+        self.intervaloLote = intervaloLote
+        self.maximoLotesFila = maximoLotesFila
+        self.taxaDrenagem = taxaDrenagem
+        self.qos = qos
+        self.timeoutEnvio = timeoutEnvio
+        self.codificar = codificar or '\n'.join
+
+        self.trava = threading.Lock()
+        self.loteAtual = []
+        self.inicioLote = None
+        self.pendentes = deque(self._carregarFila())
+        # True quando o arquivo da fila nao reflete self.pendentes
+        self.alterado = False
+        self.naoGravados = 0
+
+        self.parar = threading.Event()
+        # Antecipa o proximo ciclo da thread (lote fechado com fecharLote)
+        self.acordar = threading.Event()
+        self.thread = None
+
+        # Contadores
+        self.enfileirados = 0
+        self.enviados = 0
+        self.descartados = 0
+
+    # ------------------------------------------------------------- fila em disco
+
+    def _carregarFila(self):
+        lotes = []
+        try:
+            with open(self.caminhoFila) as arquivo:
+                for linha in arquivo:
+                    try:
+                        lotes.append(json.loads(linha))
+                    except ValueError:
+                        continue
+        except OSError:
+            pass
+        return lotes
+
+    def _gravarFila(self):
+        with self.trava:
+            lotes = list(self.pendentes)
+            # Lotes novos ficam no fim da fila; os enviados saem do inicio
+            self.enfileirados += min(self.naoGravados, len(lotes))
+            self.naoGravados = 0
+            self.alterado = False
+
+        if not lotes:
+            try:
+                os.remove(self.caminhoFila)
+            except OSError:
+                pass
+            return
+
+        temporario = '{}.tmp'.format(self.caminhoFila)
+        with open(temporario, 'w') as arquivo:
+            arquivo.write(''.join(json.dumps(lote) + '\n' for lote in lotes))
+            arquivo.flush()
+            os.fsync(arquivo.fileno())
+        os.replace(temporario, self.caminhoFila)
+
+    # ------------------------------------------------------------- lotes
+
+    def adicionar(self, leitura):
+        with self.trava:
+            if not self.loteAtual:
+                self.inicioLote = time.monotonic()
+            self.loteAtual.append(leitura)
+            if len(self.loteAtual) >= self.tamanhoLote:
+                self._fecharLote()
+
+    def fecharLote(self):
+        # Envia o lote atual sem esperar completar
+        with self.trava:
+            self._fecharLote()
+        self.acordar.set()
+
+    def aguardarEnvio(self, timeout):
+        # True quando nao ha mais lotes pendentes (enviados ao broker) dentro do timeout
+        limite = time.monotonic() + timeout
+        while True:
+            with self.trava:
+                if not self.pendentes and not self.loteAtual:
+                    return True
+            if time.monotonic() >= limite:
+                return False
+            time.sleep(0.01)
+
+    def _fecharLote(self):
+        # Chamado com a trava adquirida
+        if not self.loteAtual:
+            return
+        self.pendentes.append(self.loteAtual)
+        self.loteAtual = []
+        self.inicioLote = None
+        self.alterado = True
+        self.naoGravados += 1
+        while len(self.pendentes) > self.maximoLotesFila:
+            self.pendentes.popleft()
+            self.descartados += 1
+
+    def tamanhoFila(self):
+        with self.trava:
+            return len(self.pendentes)
+
+    def _enviar(self, lote):
+        # True se enviado, False se deve ser tentado de novo, None se o lote e invalido
+        if not self.client.is_connected():
+            return False
+        try:
+            payload = self.codificar(lote)
+        except (ValueError, TypeError) as erro:
+            print('Lote descartado ({}): {}'.format(erro, lote))
+            return None
+        try:
+            info = self.client.publish(self.topico, payload, qos=self.qos)
+            if info.rc != 0:
+                return False
+            if self.qos > 0:
+                info.wait_for_publish(self.timeoutEnvio)
+            return info.is_published()
+        except (ValueError, RuntimeError):
+            return False
+
+    # ------------------------------------------------------------- thread
+
+    def iniciar(self):
+        self.thread = threading.Thread(target=self._executar, name='publicador-lote', daemon=True)
+        self.thread.start()
+
+    def encerrar(self):
+        self.parar.set()
+        self.acordar.set()
+        if self.thread is not None:
+            self.thread.join()
+        with self.trava:
+            self._fecharLote()
+            restantes = len(self.pendentes)
+        # Tenta enviar o que falta; o restante fica na fila em disco
+        self._drenar(limite=restantes)
+        self._gravarFila()
+
+    def _drenar(self, limite):
+        enviados = 0
+        while enviados < limite:
+            with self.trava:
+                if not self.pendentes:
+                    break
+                lote = self.pendentes[0]
+            resultado = self._enviar(lote)
+            if resultado is False:
+                break
+            with self.trava:
+                if self.pendentes and self.pendentes[0] is lote:
+                    self.pendentes.popleft()
+                self.alterado = True
+            if resultado:
+                self.enviados += 1
+            else:
+                self.descartados += 1
+            enviados += 1
+        return enviados
+
+    def _executar(self):
+        fichas = 1.0
+        ultimo = time.monotonic()
+        desconectado = False
+
+        while not self.parar.is_set():
+            self.acordar.wait(0.2)
+            self.acordar.clear()
+            if self.parar.is_set():
+                break
+            agora = time.monotonic()
+
+            with self.trava:
+                if self.loteAtual and agora - self.inicioLote >= self.intervaloLote:
+                    self._fecharLote()
+
+            # Balde de fichas: no maximo taxaDrenagem lotes por segundo
+            fichas = min(max(1.0, self.taxaDrenagem), fichas + (agora - ultimo) * self.taxaDrenagem)
+            ultimo = agora
+
+            if self.pendentes and fichas >= 1.0:
+                enviados = self._drenar(int(fichas))
+                fichas -= enviados
+                desconectado = enviados == 0
+            else:
+                desconectado = False
+
+            # Persiste quando ha lotes que nao puderam ser enviados, ou limpa a fila ao esvaziar
+            if self.alterado and (desconectado or not self.pendentes):
+                try:
+                    self._gravarFila()
+                except OSError as erro:
+                    print('Erro ao gravar fila offline {}: {}'.format(self.caminhoFila, erro))
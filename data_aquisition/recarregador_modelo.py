@@ -0,0 +1,125 @@
+"""
+Background hot reload of the KNN classifier used by `ML_Model_on_hadoop.py`.
+
+1. **Watching:**
+   - Polls the modification time and size of the model artifact (`modelo_knn.joblib`) and of `treinamento.csv`.
+   - A change is only acted upon once the file has been stable for one full polling interval,
+     so a CSV still being written by `generate_database.py` is never read half-way.
+
+2. **Reloading:**
+   - A new artifact is loaded with `modelo_knn.carregarArtefato`.
+   - A new `treinamento.csv` (without a newer artifact) triggers a retrain with `modelo_knn.treinarModelo`;
+     with `compilar`, the lookup table of `modelo_tabela.py` is rebuilt with it.
+   - The retrain keeps the configuration of the active artifact (`vizinhos`, `algoritmo`, `pesos` and `colunas`, as
+     picked by `treinar_modelo.py --varredura`): the last artifact this watcher applied, or else the one on disk.
+     Only without any artifact it falls back to `vizinhos` and the defaults of `treinarModelo`.
+   - All of this happens in the watcher thread; message intake and classification keep running with the old model.
+
+3. **Swapping:**
+   - The fully built artifact is handed to the `aplicar` callback, which swaps the model reference in one assignment.
+   - Readers that already took a reference to the old model finish their batch with it.
+"""
+
+import os
+import threading
+
+import modelo_knn
+
+
+def assinaturaArquivo(caminho):
+    try:
+        info = os.stat(caminho)
+    except OSError:
+        return None
+    return (info.st_mtime_ns, info.st_size)
+
+
+class RecarregadorModelo(object):
+
+    def __init__(self, aplicar, caminhoModelo=modelo_knn.CAMINHO_MODELO,
+                 caminhoTreinamento=modelo_knn.CAMINHO_TREINAMENTO, intervalo=30, vizinhos=4, compilar=False,
+                 ajustarGrade=False):
+        self.aplicar = aplicar
+        self.caminhoModelo = caminhoModelo
+        self.caminhoTreinamento = caminhoTreinamento
+        self.intervalo = intervalo
+        self.vizinhos = vizinhos
+        self.compilar = compilar
+        self.ajustarGrade = ajustarGrade
+
+        # Assinaturas ja aplicadas e assinaturas vistas na ultima verificacao
+        self.aplicadas = {caminhoModelo: assinaturaArquivo(caminhoModelo),
+                          caminhoTreinamento: assinaturaArquivo(caminhoTreinamento)}
+        self.pendentes = {}
+
+        # Ultimo artefato aplicado por este recarregador (configuracao dos retreinos)
+        self.ativo = None
+
+        self.parar = threading.Event()
+        self.thread = None
+
+    def iniciar(self):
+        self.thread = threading.Thread(target=self._executar, name='recarregador-modelo', daemon=True)
+        self.thread.start()
+
+    def encerrar(self):
+        self.parar.set()
+        if self.thread is not None:
+            self.thread.join()
+
+    def _alterado(self, caminho):
+        # Retorna a nova assinatura quando o arquivo mudou e ficou estavel por um intervalo
+        atual = assinaturaArquivo(caminho)
+        if atual is None or atual == self.aplicadas.get(caminho):
+            self.pendentes.pop(caminho, None)
+            return None
+        if self.pendentes.get(caminho) != atual:
+            self.pendentes[caminho] = atual
+            return None
+        return atual
+
+    def configuracaoTreino(self):
+        # Parametros do artefato ativo para treinarModelo
+        artefato = self.ativo
+        if artefato is None and os.path.exists(self.caminhoModelo):
+            try:
+                artefato = modelo_knn.carregarArtefato(self.caminhoModelo)
+            except (OSError, ValueError) as erro:
+                print('Artefato {} ignorado no retreino: {}'.format(self.caminhoModelo, erro))
+        if artefato is None:
+            return {'vizinhos': self.vizinhos}
+
+        parametros = artefato.get('parametros') or {}
+        configuracao = {chave: parametros[chave] for chave in ('vizinhos', 'algoritmo', 'pesos') if chave in parametros}
+        if artefato.get('colunas'):
+            configuracao['colunas'] = list(artefato['colunas'])
+        return configuracao
+
+    def verificar(self):
+        novoModelo = self._alterado(self.caminhoModelo)
+        if novoModelo is not None:
+            artefato = modelo_knn.carregarArtefato(self.caminhoModelo)
+            self.aplicadas[self.caminhoModelo] = novoModelo
+            # O artefato ja reflete o treinamento atual
+            self.aplicadas[self.caminhoTreinamento] = assinaturaArquivo(self.caminhoTreinamento)
+            self.pendentes.clear()
+            self.ativo = artefato
+            self.aplicar(artefato, 'artefato')
+            return
+
+        novoTreinamento = self._alterado(self.caminhoTreinamento)
+        if novoTreinamento is not None:
+            artefato = modelo_knn.treinarModelo(self.caminhoTreinamento, compilar=self.compilar,
+                                                ajustarGrade=self.ajustarGrade, **self.configuracaoTreino())
+            self.aplicadas[self.caminhoTreinamento] = novoTreinamento
+            self.pendentes.pop(self.caminhoTreinamento, None)
+            self.ativo = artefato
+            self.aplicar(artefato, 'treinamento')
+
+    def _executar(self):
+        while not self.parar.wait(self.intervalo):
+            try:
+                self.verificar()
+            except Exception as erro:
+                # Mantem o modelo atual e tenta de novo no proximo ciclo
+                print('Falha ao recarregar o modelo: {}'.format(erro))
@@ -8,17 +8,36 @@ and communicates with an MQTT broker to publish measurements and receive alerts.
    - The device ID is set to the Raspberry Pi's Wi-Fi MAC address, ensuring a unique identifier for each device.
 
 2. **Real-Time Data Collection:**
-   - Periodically reads temperature and humidity from a DHT11 sensor.
-   - Appends the data to a DataFrame for instantaneous values.
+   - Periodically reads temperature and humidity from a DHT11 sensor on a background `Amostrador` thread,
+     at a fixed cadence, timestamping each sample when it is acquired.
+   - The main loop consumes the samples from a queue, so slow sensor retries no longer skew the minute/hour rollover.
+   - `--sensor falso` or `--sensor replay --replay resultadoRemoto.csv` run the loop without `Adafruit_DHT`
+     or `RPi.GPIO` (the LED is then only printed).
+   - The first reading after startup is published (and logged) right away instead of waiting for the next minute
+     and a full batch, so little data is lost after a power cut.
+   - Stores the instantaneous values in a fixed-size ring buffer (`BufferCircular`) holding the last 60 samples,
+     so memory stays flat regardless of uptime.
 
 3. **Data Averaging:**
-   - Calculates hourly averages (e.g., temperature min/max, latitude, longitude) from the last 60 measurements.
+   - Calculates hourly averages (e.g., temperature min/max, latitude, longitude) from the last 60 measurements,
+     in constant time from the ring buffer's running sums and min/max deques.
    - Publishes the average values to a separate MQTT topic.
+   - With `--sem-medios` the hourly averages are not computed on the Pi; the ingestion service aggregates
+     them itself from the instantaneous readings (`agregador_horario.py`).
 
 4. **MQTT Communication:**
    - Connects to the HiveMQ public MQTT broker.
-   - Subscribes to the "alerta" topic to listen for alerts (e.g., turn on/off an LED).
+   - Subscribes to its own alert topic `main/OMIoT/team/<MAC>/alerta`, where the ingestion service publishes the
+     per-device state, and to the legacy "alerta" topic, to listen for alerts (e.g., turn on/off an LED).
    - Publishes both instantaneous and averaged data to specific MQTT topics.
+   - Instantaneous readings are sent in batches (`--lote` readings or `--intervalo-lote` seconds) with QoS 1
+     through `PublicadorEmLote`; while the broker is unreachable the batches are kept in an on-disk queue
+     (`/home/pi/OficinaMaker/fila_*.jsonl`) and drained at a controlled rate after reconnecting.
+   - `--formato binario` sends the readings in the compact binary format of `formato_binario.py`
+     (about 20 bytes per reading instead of ~65); the local CSV files keep the text format.
+   - The connection is made asynchronously and re-established by paho; the alert subscription is renewed on every connect.
+   - `--metricas-porta` / `--metricas-arquivo` enable the counters and histograms of `metricas.py` (sensor read and
+     CSV write latency, reconnects, sampler and offline queue counters) on a local HTTP endpoint and/or a JSON file.
 
 5. **LED Control:**
    - Listens for alerts via MQTT. If an "on" message is received, it lights up an LED; otherwise, it turns it off.
@@ -29,6 +48,15 @@ and communicates with an MQTT broker to publish measurements and receive alerts.
 7. **Location Randomization:**
    - Adds a small random offset to the latitude and longitude every day to simulate slight location shifts.
 
+8. **Lean Startup:**
+   - Only the standard library and the small local modules are imported at startup (no pandas); `paho` is imported
+     after the sampler thread has started, so the first sensor read overlaps with it, and `RPi.GPIO`,
+     `Adafruit_DHT` and `http.server` are imported only when used.
+   - `--sair-apos-primeira` exits once the first reading has been published (or queued offline), and
+     `benchmark/medir_inicializacao.py` measures import time, RSS and the time to that first reading.
+   - `--diretorio`, `--broker` and `--porta` point the CSV files, offline queues and broker elsewhere (e.g. tests);
+     `--transporte loopback` replaces paho with the in-process broker of `transporte.py`.
+
 This script is designed to operate continuously, with MQTT handling real-time communication and the Raspberry Pi managing local data processing and hardware control.
 """
 
@@ -37,23 +65,30 @@ This script is designed to operate continuously, with MQTT handling real-time co
 # The device ID has been set to match the Raspberry Pi's Wi-Fi MAC Address, 
 # eliminating the need for using a hash code (MD5) and automatically adapting to each device.
 
-import paho.mqtt.client as mqtt
 from datetime import datetime
+import argparse
+import functools
+import os
 import random
 import math
-from time import sleep
-import pandas as pd
-import Adafruit_DHT as dht
-import RPi.GPIO as gpio
-   
-gpio.setmode(gpio.BOARD)
-gpio.setup(32, gpio.OUT)
+import time
+
+from amostrador import Amostrador, criarSensor
+from buffer_circular import BufferCircular
+import formato_binario
+import transporte
+from metricas import METRICAS_NULAS, criarMetricas
+from publicador_lote import PublicadorEmLote
+
+# RPi.GPIO e carregado em configurarLed(); None quando indisponivel (LED apenas impresso)
+gpio = None
 
 latitude = -25.4966884
 longitude = -49.2619725
 
-dfValoresInstantaneos = pd.DataFrame([], columns = ['id', 'ano', 'mes', 'dia', 'hora', 'minuto', 'segundo', 'temperatura', 'latitude', 'longitude'])
-dfValoresMedios = pd.DataFrame([], columns = ['hora', 'minuto', 'temperaturaMinima', 'temperaturaMaxima', 'latitude', 'longitude'])
+# Ultimas 60 medicoes instantaneas (memoria fixa)
+numeroMedicoes = 60
+bufferInstantaneos = BufferCircular(numeroMedicoes)
 
 horaAtual = 0
 horaInicial = int(str(datetime.now())[11:13])
@@ -62,8 +97,68 @@ minutoInicial = 0
 
 raioMaximo = 0.05
 
-client = mqtt.Client("clientId-fdsmnMGRNr") # clientId- add 10 caracteres aleatorios
-client.connect("broker.hivemq.com", 1883)
+# Cliente MQTT (criado em main, depois de iniciar o amostrador)
+client = None
+
+# CSVs locais e filas offline
+diretorio = '/home/pi/OficinaMaker'
+
+# True ate a primeira leitura desta execucao ser publicada
+primeiraLeitura = True
+
+# Leitura do sensor em thread propria (criado em main)
+amostrador = None
+
+# Envio em lote com fila offline (criados em main)
+publicadorInstantaneos = None
+publicadorMedios = None
+# 'texto' (linhas separadas por ';') ou 'binario' (formato_binario)
+formato = 'texto'
+# False quando as medias horarias sao calculadas no servidor (--sem-medios)
+enviarMedios = True
+
+# Instrumentacao (habilitada com --metricas-porta/--metricas-arquivo)
+metricas = METRICAS_NULAS
+
+# Alertas: topico do proprio dispositivo (servico de ingestao) e topico legado
+TOPICO_ALERTA_DISPOSITIVO = 'main/OMIoT/team/{}/alerta'
+TOPICO_ALERTA_LEGADO = 'PUCPR/OMIoT/EquipeBanak/alerta'
+
+# Espera maxima pela confirmacao do broker com --sair-apos-primeira
+ESPERA_PRIMEIRO_ENVIO = 10.0
+
+
+def configurarLed():
+
+    global gpio
+
+    try:
+        import RPi.GPIO
+    except ImportError:
+        print('RPi.GPIO indisponivel - LED simulado')
+        return
+
+    gpio = RPi.GPIO
+    gpio.setmode(gpio.BOARD)
+    gpio.setup(32, gpio.OUT)
+
+
+def criarCliente(nomeTransporte='paho'):
+    # O paho e importado aqui: o amostrador ja esta lendo o sensor enquanto ele carrega
+    return transporte.criarCliente(nomeTransporte, "clientId-fdsmnMGRNr") # clientId- add 10 caracteres aleatorios
+
+
+def on_connect(client, userdata, flags, rc):
+    print('Conectado ao broker (rc={})'.format(rc))
+    metricas.contador('conexoes_total', 'conexoes ao broker').incrementar()
+    # Renova as assinaturas a cada (re)conexao
+    client.subscribe(TOPICO_ALERTA_DISPOSITIVO.format(getMAC('wlan0')))
+    client.subscribe(TOPICO_ALERTA_LEGADO)
+
+
+def on_disconnect(client, userdata, rc):
+    metricas.contador('desconexoes_total', 'desconexoes do broker').incrementar()
+
 
 def on_message(client, userdata, msg):
 
@@ -72,13 +167,15 @@ def on_message(client, userdata, msg):
     menssagem = msg.payload.decode()
     topico = msg.topic 
 
-    if topico == 'PUCPR/OMIoT/EquipeBanak/alerta':
+    if topico in (TOPICO_ALERTA_LEGADO, TOPICO_ALERTA_DISPOSITIVO.format(getMAC('wlan0'))):
         if menssagem == 'on':
             print('ALERTA - Led Ligado')
-            gpio.output(32, 1) #Ligando o pino 32
+            if gpio is not None:
+                gpio.output(32, 1) #Ligando o pino 32
         else:
             print('ALERTA - Desligar Led')
-            gpio.output(32, 0) #desligando o pino 32
+            if gpio is not None:
+                gpio.output(32, 0) #desligando o pino 32
     else:
         print("Alerta: '{}'   MSG:'{}'".format(msg.topic, msg.payload.decode()))
 
@@ -111,119 +208,92 @@ def gerarValoresInstantaneos():
 
     global minutoInicial
     global horaInicial
-    global dfValoresInstantaneos
-    global client
+    global primeiraLeitura
+
+    # Proxima amostra do sensor (lida e carimbada pela thread do amostrador)
+    amostra = amostrador.obter()
+    metricas.histograma('leitura_sensor_segundos', 'leitura do sensor, com tentativas').observar(amostra.duracaoLeitura)
+    momento = datetime.fromtimestamp(amostra.tempo)
 
     #Carregar a base com Medias quando mudar de hora
-    horaAtual = int(str(datetime.now())[11:13])
+    horaAtual = momento.hour
     if horaInicial != horaAtual:
-        gerarValoresMedios()
+        if enviarMedios:
+            gerarValoresMedios(horaAtual)
+        else:
+            horaInicial = horaAtual
 
-    ano = int(str(datetime.now())[0:4])
-    mes = int(str(datetime.now())[5:7])
-    dia = int(str(datetime.now())[8:10])
-    hora = int(str(datetime.now())[11:13])
-    minuto = int(str(datetime.now())[14:16])
-    segundo = int(str(datetime.now())[17:19])
+    hora = momento.hour
+    minuto = momento.minute
 
     id_mac = getMAC('wlan0') # Mac Address do Wifi
 
-    # Extrair temperatuda do DHT11
-    umidade, temperatura = dht.read_retry(dht.DHT11, 4)
-    temperatura = float(temperatura)
+    temperatura = amostra.temperatura
 
     #Carregar a primeira linha
-    if len(dfValoresInstantaneos) == 0:
-        dfValoresInstantaneos = dfValoresInstantaneos.append({'id':id_mac, 'ano':ano, 'mes':mes, 'dia':dia, 'hora':hora, 
-                            'minuto':minuto, 'segundo':segundo, 'temperatura':temperatura, 
-                            'latitude':latitude, 'longitude':longitude}, ignore_index=True)
+    if len(bufferInstantaneos) == 0:
+        bufferInstantaneos.adicionar(hora, minuto, temperatura, latitude, longitude)
         minutoInicial = minuto
 
-    #Carregar o Array quando mudar de minuto
+    #Carregar o Array quando mudar de minuto (a primeira leitura e publicada logo)
     minutoAtual = minuto
-    if minutoInicial != minutoAtual and len(dfValoresInstantaneos) > 0:
+    if (minutoInicial != minutoAtual or primeiraLeitura) and len(bufferInstantaneos) > 0:
 
         #Carregar linha apenas quando mudar de minuto
-        dfValoresInstantaneos = dfValoresInstantaneos.append({'id':id_mac, 'ano':ano, 'mes':mes, 'dia':dia, 'hora':hora, 
-                            'minuto':minuto, 'segundo':segundo, 'temperatura':temperatura, 
-                            'latitude':latitude, 'longitude':longitude}, ignore_index=True)
+        if not primeiraLeitura:
+            bufferInstantaneos.adicionar(hora, minuto, temperatura, latitude, longitude)
 
-        row = dfValoresInstantaneos.loc[len(dfValoresInstantaneos)-1]
+        registro = (id_mac, int(amostra.tempo), temperatura, latitude, longitude)
+        csvRow = formato_binario.textoInstantaneo(registro)
 
-        print('Carregando row Instantaneo no CSV: {}'.format(row))
-        csvRow = '{};{};{};{};{};{};{};{};{};{}'.format(row['id'], row['ano'], row['mes'], row['dia'], row['hora'], row['minuto'], 
-                                                        row['segundo'], row['temperatura'], row['latitude'], row['longitude'])
+        print('Carregando row Instantaneo no CSV: {}'.format(csvRow))
 
-        # PUBLISH - Inserir linha de instantaneos na Cloud MQTT
-        client.publish("PUCPR/OMIoT/EquipeBanak/valores_instantaneos", csvRow)
+        # PUBLISH - Inserir linha de instantaneos na Cloud MQTT (em lote, com fila offline)
+        publicadorInstantaneos.adicionar(list(registro) if formato == 'binario' else csvRow)
+        if primeiraLeitura:
+            # Sem esperar o lote completar
+            publicadorInstantaneos.fecharLote()
+            primeiraLeitura = False
 
-        csvresult = open("/home/pi/OficinaMaker/resultadoRemoto.csv","a")
+        inicio = time.perf_counter()
+        csvresult = open(os.path.join(diretorio, "resultadoRemoto.csv"),"a")
         csvresult.write(csvRow + "\n")
-        csvresult.close
+        csvresult.close()
+        metricas.histograma('gravacao_csv_segundos', 'gravacao local de uma linha',
+                            arquivo='instantaneos').observar(time.perf_counter() - inicio)
 
     minutoInicial = minuto
 
-    sleep(5)
 
 
-
-def gerarValoresMedios():
+def gerarValoresMedios(horaAtual=None):
 
     global horaInicial
-    global client
 
     #gerar media das ultimas 60 medicoes do Array (Hora Media, Minuto Medio, TemperaturaMinima, TemperaturaMaxima, Latitude media, Longitude Media)
-    numeroMedicoes = 60
-
-    if len(dfValoresInstantaneos) >= numeroMedicoes:
-        count = len(dfValoresInstantaneos) - numeroMedicoes
-    else:
-        count = 0
-
-    horaMedia = 0
-    minutoMedia = 0
-    latitudeMedia = 0
-    longitudeMedia = 0
-    temperaturaMinima = ''
-    temperaturaMaxima = ''
-
-    countMedicoes = 0
-
-    while count < len(dfValoresInstantaneos):
-        horaMedia      = horaMedia      + dfValoresInstantaneos.loc[count]['hora']
-        minutoMedia    = minutoMedia    + dfValoresInstantaneos.loc[count]['minuto']
-        latitudeMedia  = float(latitudeMedia)  + float(dfValoresInstantaneos.loc[count]['latitude'])
-        longitudeMedia = float(longitudeMedia) + float(dfValoresInstantaneos.loc[count]['longitude'])
-
-        temperatura = float(dfValoresInstantaneos.loc[count]['temperatura'])
-        
-        if temperaturaMaxima == '' or temperaturaMaxima < temperatura:
-            temperaturaMaxima = temperatura
+    medias = bufferInstantaneos.medias()
 
-        if temperaturaMinima == '' or temperaturaMinima > temperatura:
-            temperaturaMinima = temperatura
+    if horaAtual is None:
+        horaAtual = int(str(datetime.now())[11:13])
 
-        countMedicoes = countMedicoes + 1
-        count = count + 1
+    if medias is None:
+        # Nenhuma medicao ainda nesta execucao
+        horaInicial = horaAtual
+        return
 
-    horaMedia = horaMedia / countMedicoes
-    minutoMedia = minutoMedia / countMedicoes
-    latitudeMedia = latitudeMedia / countMedicoes
-    longitudeMedia = longitudeMedia / countMedicoes
-
-    csvRow = '{};{};{};{};{};{}'.format(horaMedia, minutoMedia, temperaturaMinima, 
-                                        temperaturaMaxima, latitudeMedia, longitudeMedia)
+    registro = (getMAC('wlan0'), int(datetime.now().timestamp())) + tuple(medias)
+    csvRow = formato_binario.textoMedio(registro)
 
     print('Carregando Array Medio no CSV para o Hadoop: {}'.format(csvRow))
 
-    # PUBLISH - Inserir linha de valores medios na Cloud MQTT
-    client.publish("PUCPR/OMIoT/EquipeBanak/valores_medios", csvRow)
+    # PUBLISH - Inserir linha de valores medios na Cloud MQTT (com fila offline)
+    publicadorMedios.adicionar(list(registro) if formato == 'binario' else csvRow)
 
-    csvresult = open("/home/pi/OficinaMaker/resultadoMedio.csv","a")
+    csvresult = open(os.path.join(diretorio, "resultadoMedio.csv"),"a")
     csvresult.write(csvRow + "\n")
-    csvresult.close
+    csvresult.close()
 
-    horaInicial = int(str(datetime.now())[11:13])
+    horaInicial = horaAtual
 
     if horaInicial == 0:
         deslocamentoLatitude, deslocamentoLongitude = gerarDeslocamentoMaximo(raioMaximo)
@@ -232,14 +302,116 @@ def gerarValoresMedios():
 def main():
 
     global client 
+    global amostrador
+    global publicadorInstantaneos
+    global publicadorMedios
+    global formato
+    global enviarMedios
+    global metricas
+    global diretorio
+
+    parser = argparse.ArgumentParser(description='Coleta e publica as medicoes do sensor')
+    parser.add_argument('--sensor', choices=['dht11', 'falso', 'replay'], default='dht11')
+    parser.add_argument('--replay', default='/home/pi/OficinaMaker/resultadoRemoto.csv',
+                        help='CSV lido pelo sensor replay')
+    parser.add_argument('--diretorio', default=diretorio, help='CSVs locais e filas offline')
+    parser.add_argument('--broker', default='broker.hivemq.com')
+    parser.add_argument('--porta', type=int, default=1883)
+    parser.add_argument('--transporte', choices=transporte.TRANSPORTES, default='paho')
+    parser.add_argument('--sair-apos-primeira', type=float, nargs='?', const=ESPERA_PRIMEIRO_ENVIO,
+                        metavar='SEGUNDOS',
+                        help='encerra depois de publicar a primeira leitura (ou de esperar SEGUNDOS pelo broker)')
+    parser.add_argument('--intervalo', type=float, default=5.0, help='segundos entre leituras do sensor')
+    parser.add_argument('--lote', type=int, default=5, help='leituras instantaneas por mensagem')
+    parser.add_argument('--intervalo-lote', type=float, default=300.0,
+                        help='segundos maximos ate enviar um lote incompleto')
+    parser.add_argument('--formato', choices=['texto', 'binario'], default='texto',
+                        help='formato das mensagens MQTT')
+    parser.add_argument('--sem-medios', action='store_true',
+                        help='nao calcula/envia as medias horarias (agregadas no servidor)')
+    parser.add_argument('--metricas-porta', type=int, help='porta local do endpoint /metrics')
+    parser.add_argument('--metricas-arquivo', help='arquivo JSON com snapshots periodicos das metricas')
+    parser.add_argument('--intervalo-metricas', type=float, default=60.0)
+    args = parser.parse_args()
+
+    metricas = criarMetricas(args.metricas_porta is not None or args.metricas_arquivo is not None)
+    diretorio = args.diretorio
+
+    enviarMedios = not args.sem_medios
+
+    formato = args.formato
+    if formato == 'binario':
+        codificarInstantaneos = functools.partial(formato_binario.codificar, formato_binario.TIPO_INSTANTANEO)
+        codificarMedios = functools.partial(formato_binario.codificar, formato_binario.TIPO_MEDIO)
+    else:
+        codificarInstantaneos = codificarMedios = None
 
+    if args.sensor == 'replay':
+        sensor = criarSensor('replay', args.replay)
+    else:
+        sensor = criarSensor(args.sensor)
+
+    configurarLed()
+
+    amostrador = Amostrador(sensor, args.intervalo)
+    amostrador.iniciar()
+
+    client = criarCliente(args.transporte)
+
+    publicadorInstantaneos = PublicadorEmLote(client, "PUCPR/OMIoT/EquipeBanak/valores_instantaneos",
+                                              os.path.join(diretorio, "fila_instantaneos.jsonl"),
+                                              tamanhoLote=args.lote, intervaloLote=args.intervalo_lote,
+                                              codificar=codificarInstantaneos)
+    publicadorMedios = PublicadorEmLote(client, "PUCPR/OMIoT/EquipeBanak/valores_medios",
+                                        os.path.join(diretorio, "fila_medios.jsonl"), tamanhoLote=1,
+                                        codificar=codificarMedios)
+
+    metricas.medidor('amostrador_leituras', lambda: amostrador.leituras, 'leituras do sensor')
+    metricas.medidor('amostrador_falhas', lambda: amostrador.falhas, 'leituras do sensor sem valor')
+    metricas.medidor('amostrador_atrasos', lambda: amostrador.atrasos, 'ciclos do sensor atrasados')
+    metricas.medidor('amostrador_descartadas', lambda: amostrador.descartadas, 'amostras descartadas (fila cheia)')
+    for nome, publicador in (('instantaneos', publicadorInstantaneos), ('medios', publicadorMedios)):
+        metricas.medidor('publicacao_fila_lotes', publicador.tamanhoFila, 'lotes na fila offline', topico=nome)
+        metricas.medidor('publicacao_enviados', functools.partial(getattr, publicador, 'enviados'),
+                         'lotes confirmados pelo broker', topico=nome)
+        metricas.medidor('publicacao_descartados', functools.partial(getattr, publicador, 'descartados'),
+                         'lotes descartados (fila cheia ou invalidos)', topico=nome)
+    if args.metricas_porta is not None:
+        metricas.iniciarServidor(args.metricas_porta)
+    if args.metricas_arquivo is not None:
+        metricas.iniciarSnapshot(args.metricas_arquivo, args.intervalo_metricas)
+
+    client.on_connect = on_connect
+    client.on_disconnect = on_disconnect
     client.on_message = on_message
+    # Conexao assincrona: o loop do paho reconecta sozinho se o broker cair ou nao estiver acessivel
+    client.connect_async(args.broker, args.porta)
     client.loop_start()
-    client.subscribe("PUCPR/OMIoT/EquipeBanak/alerta")
 
-    while True:
-        gerarValoresInstantaneos()
-    
-    client.disconnect()
+    publicadorInstantaneos.iniciar()
+    publicadorMedios.iniciar()
 
-main()
+    try:
+        while True:
+            gerarValoresInstantaneos()
+            if args.sair_apos_primeira is not None and not primeiraLeitura:
+                print('Primeira leitura pronta', flush=True)
+                if publicadorInstantaneos.aguardarEnvio(args.sair_apos_primeira):
+                    print('Primeira leitura publicada', flush=True)
+                break
+    finally:
+        amostrador.encerrar()
+        publicadorInstantaneos.encerrar()
+        publicadorMedios.encerrar()
+        print('Lotes enviados: {}, na fila offline: {}, descartados: {}'.format(
+            publicadorInstantaneos.enviados, publicadorInstantaneos.tamanhoFila(),
+            publicadorInstantaneos.descartados))
+        client.loop_stop()
+        client.disconnect()
+        if args.metricas_arquivo is not None:
+            metricas.gravarSnapshot(args.metricas_arquivo)
+        metricas.encerrar()
+
+
+if __name__ == '__main__':
+    main()
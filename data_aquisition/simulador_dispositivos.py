@@ -0,0 +1,278 @@
+"""
+End-to-end load test of the classifier service with thousands of simulated devices, on the loopback broker.
+
+1. **Devices:**
+   - `--dispositivos` virtual `remote_iot.py`-style devices, each with its own `ClienteLoopback`, publish one hourly
+     average every `--intervalo` seconds (random phase) on `main/OMIoT/team/<dispositivo>/valores_medios`,
+     in the text or binary (`--formato`) payload of `remote_iot.py`.
+   - With `--instantaneos`, each message is instead one simulated hour of `--leituras-hora` readings on
+     `main/OMIoT/team/<dispositivo>/valores_instantaneos` (the device clock starts at the current hour and advances
+     one hour per message), so the server-side hourly aggregation is what gets load-tested.
+   - Every device alternates between normal readings and alert readings (maximum above 35 C) every
+     `--ciclos-regime` messages, so the service keeps raising and clearing alerts.
+   - Without `--duracao`, the run lasts `2 * ciclosRegime + 1` intervals (one more with `--instantaneos`, whose hour
+     is only classified when the next one starts): every device goes through a whole alert regime
+     (at least `ciclosRegime + ciclosAlerta` messages), so it raises its first `on`.
+   - Devices do not run a network loop each; the alerts are followed by one observer client subscribed to
+     `main/OMIoT/team/+/alerta`.
+
+2. **Service:**
+   - `IngestaoDistribuida` (sharded classifier, `--workers` processes) on its own loopback client, with a KNN model
+     trained on synthetic data; the per-device hourly averages are classified directly (`agregacaoNoServidor=False`),
+     or aggregated by the workers from the instantaneous readings with `--instantaneos` (`agregacaoNoServidor=True`).
+
+3. **Report:**
+   - Offered and achieved publish rate, messages classified per second end to end (including draining the
+     workers), and the alert latency (p50/p99/max), separately for `on` and `off`: time from the device's latest
+     publish to the alert reaching the observer. With hysteresis the alert follows the message that completed the
+     transition, so `--intervalo` should stay well above the latency being measured.
+   - A warning is printed when no transition happened (duration too short for `--ciclos-regime`).
+
+**Example Usage:**
+   ```bash
+   python simulador_dispositivos.py --dispositivos 5000 --intervalo 5 --duracao 60 --workers 2
+   python simulador_dispositivos.py --dispositivos 1000 --intervalo 5 --instantaneos --leituras-hora 12
+   ```
+"""
+
+#! /usr/bin/env python
+import argparse
+import heapq
+import os
+import random
+import shutil
+import tempfile
+import time
+
+import formato_binario
+import modelo_knn
+import transporte
+from amostrador import percentil
+from ingestao_distribuida import PREFIXO, IngestaoDistribuida, gerarTreinamentoSintetico
+
+HOST_LOOPBACK = 'simulador'
+
+
+class DispositivoSimulado(object):
+
+    __slots__ = ('mac', 'cliente', 'topico', 'aleatorio', 'ciclosRegime', 'leiturasHora', 'horaInicial',
+                 'mensagens', 'enviadoEm')
+
+    def __init__(self, indice, ciclosRegime, binario, semente, leiturasHora=0, horaInicial=None):
+        self.mac = 'b8:27:eb:{:02x}:{:02x}:{:02x}'.format(indice >> 16 & 0xff, indice >> 8 & 0xff, indice & 0xff)
+        self.cliente = transporte.criarCliente('loopback', 'dispositivo-{}'.format(indice))
+        # leiturasHora > 0: publica instantaneos, uma hora simulada por mensagem
+        self.leiturasHora = leiturasHora
+        self.horaInicial = horaInicial
+        self.topico = '{}/{}/{}'.format(PREFIXO, self.mac, 'valores_instantaneos' if leiturasHora else 'valores_medios')
+        self.aleatorio = random.Random(semente + indice)
+        self.ciclosRegime = ciclosRegime
+        self.mensagens = 0
+        self.enviadoEm = None
+
+    def emAlerta(self):
+        # Alterna entre regime normal e de alerta a cada ciclosRegime mensagens
+        return (self.mensagens // self.ciclosRegime) % 2 == 1
+
+    def coordenadas(self):
+        return -25.4966884 + self.aleatorio.uniform(-0.05, 0.05), -49.2619725 + self.aleatorio.uniform(-0.05, 0.05)
+
+    def leituras(self):
+        # Uma hora simulada: as leituras ficam dentro da hora, a de alerta (acima de 35 C) numa posicao aleatoria
+        inicio = self.horaInicial + 3600 * self.mensagens
+        passo = 3600 // self.leiturasHora
+        minima = self.aleatorio.uniform(10, 20)
+        pico = self.aleatorio.randrange(self.leiturasHora) if self.emAlerta() else None
+        registros = []
+        for posicao in range(self.leiturasHora):
+            temperatura = self.aleatorio.uniform(38, 45) if posicao == pico else minima + self.aleatorio.uniform(0, 10)
+            latitude, longitude = self.coordenadas()
+            registros.append((self.mac, inicio + posicao * passo, round(temperatura, 1), latitude, longitude))
+        return registros
+
+    def registro(self):
+        alerta = self.emAlerta()
+        minima = self.aleatorio.uniform(10, 20)
+        maxima = self.aleatorio.uniform(38, 45) if alerta else minima + self.aleatorio.uniform(0, 10)
+        momento = time.localtime()
+        return (self.mac, int(time.time()), momento.tm_hour, momento.tm_min, round(minima, 1), round(maxima, 1)) \
+            + self.coordenadas()
+
+    def publicar(self, binario):
+        if self.leiturasHora:
+            registros = self.leituras()
+            if binario:
+                payload = formato_binario.codificar(formato_binario.TIPO_INSTANTANEO, registros)
+            else:
+                payload = '\n'.join(formato_binario.textoInstantaneo(registro) for registro in registros)
+        elif binario:
+            payload = formato_binario.codificar(formato_binario.TIPO_MEDIO, [self.registro()])
+        else:
+            payload = formato_binario.textoMedio(self.registro())
+        self.enviadoEm = time.perf_counter()
+        self.mensagens += 1
+        self.cliente.publish(self.topico, payload, qos=1)
+
+
+class Observador(object):
+    # Assina os alertas e mede a latencia desde a ultima publicacao do dispositivo
+
+    def __init__(self, dispositivos):
+        self.dispositivos = {dispositivo.mac: dispositivo for dispositivo in dispositivos}
+        self.cliente = transporte.criarCliente('loopback', 'observador')
+        self.cliente.on_message = self.on_message
+        self.latencias = {'on': [], 'off': []}
+        self.alertas = {'on': 0, 'off': 0}
+
+    def iniciar(self):
+        self.cliente.connect(HOST_LOOPBACK)
+        self.cliente.subscribe('{}/+/alerta'.format(PREFIXO))
+        self.cliente.loop_start()
+
+    def on_message(self, client, userdata, msg):
+        agora = time.perf_counter()
+        valor = msg.payload.decode()
+        self.alertas[valor] = self.alertas.get(valor, 0) + 1
+        dispositivo = self.dispositivos.get(msg.topic[len(PREFIXO) + 1:].split('/')[0])
+        if dispositivo is not None and dispositivo.enviadoEm is not None and not msg.retain:
+            self.latencias.setdefault(valor, []).append(agora - dispositivo.enviadoEm)
+
+    def encerrar(self):
+        self.cliente.loop_stop()
+
+
+def publicarDispositivos(dispositivos, intervalo, duracao, binario, semente):
+    # Agenda cada dispositivo em intervalo fixo com fase aleatoria; retorna as mensagens publicadas
+    aleatorio = random.Random(semente)
+    inicio = time.perf_counter()
+    fim = inicio + duracao
+    agenda = [(inicio + aleatorio.uniform(0, intervalo), indice) for indice in range(len(dispositivos))]
+    heapq.heapify(agenda)
+
+    publicadas = 0
+    while agenda:
+        proxima, indice = agenda[0]
+        if proxima >= fim:
+            break
+        espera = proxima - time.perf_counter()
+        if espera > 0:
+            time.sleep(espera)
+        dispositivos[indice].publicar(binario)
+        publicadas += 1
+        heapq.heapreplace(agenda, (proxima + intervalo, indice))
+    return publicadas
+
+
+def duracaoPadrao(intervalo, ciclosRegime, instantaneos=False):
+    # Um regime normal e um de alerta completos, mais um intervalo da fase aleatoria;
+    # com instantaneos a hora so e classificada quando a seguinte comeca
+    return intervalo * (2 * ciclosRegime + (2 if instantaneos else 1))
+
+
+def executarSimulacao(quantidade, intervalo, duracao, workers, formato='binario', ciclosRegime=6,
+                      ciclosAlerta=3, semente=42, leiturasHora=0):
+    if duracao is None:
+        duracao = duracaoPadrao(intervalo, ciclosRegime, leiturasHora > 0)
+
+    temporario = tempfile.mkdtemp(prefix='simulador_')
+    try:
+        caminhoTreinamento = os.path.join(temporario, 'treinamento.csv')
+        caminhoModelo = os.path.join(temporario, 'modelo_knn.joblib')
+        gerarTreinamentoSintetico(caminhoTreinamento, semente=semente)
+        modelo_knn.salvarArtefato(modelo_knn.treinarModelo(caminhoTreinamento), caminhoModelo)
+
+        # Servico: os workers sao criados antes de qualquer thread do simulador
+        servidor = transporte.criarCliente('loopback', 'classificador')
+        servidor.connect(HOST_LOOPBACK)
+        ingestao = IngestaoDistribuida(servidor, workers, caminhoModelo=caminhoModelo,
+                                       caminhoTreinamento=caminhoTreinamento, agregacaoNoServidor=leiturasHora > 0,
+                                       ciclosParaLigar=ciclosAlerta, ciclosParaDesligar=ciclosAlerta)
+        ingestao.iniciar()
+        servidor.loop_start()
+
+        binario = formato == 'binario'
+        # Horas simuladas a partir da hora atual: nenhuma janela termina antes da proxima mensagem do dispositivo,
+        # entao a varredura do agregador nao fecha horas incompletas
+        horaInicial = int(time.time()) // 3600 * 3600
+        dispositivos = [DispositivoSimulado(indice, ciclosRegime, binario, semente, leiturasHora, horaInicial)
+                        for indice in range(quantidade)]
+        for dispositivo in dispositivos:
+            dispositivo.cliente.connect(HOST_LOOPBACK)
+
+        observador = Observador(dispositivos)
+        observador.iniciar()
+
+        inicio = time.perf_counter()
+        publicadas = publicarDispositivos(dispositivos, intervalo, duracao, binario, semente)
+        tempoPublicacao = time.perf_counter() - inicio
+
+        # Drena: a fila do cliente do servico, os workers e a publicacao dos alertas
+        servidor.loop_stop()
+        ingestao.encerrar()
+        tempoTotal = time.perf_counter() - inicio
+        observador.encerrar()
+
+        return {
+            'dispositivos': quantidade,
+            'duracao': duracao,
+            'topico': 'valores_instantaneos' if leiturasHora else 'valores_medios',
+            'workers': ingestao.workers,
+            'publicadas': publicadas,
+            'taxa_oferecida': quantidade / float(intervalo),
+            'taxa_publicacao': publicadas / tempoPublicacao,
+            'classificadas': ingestao.classificadas,
+            'taxa_classificacao': ingestao.classificadas / tempoTotal,
+            'drenagem_segundos': tempoTotal - tempoPublicacao,
+            'alertas': dict(observador.alertas),
+            'latencias': {valor: {'p50': percentil(latencias, 50), 'p99': percentil(latencias, 99),
+                                  'maxima': max(latencias)}
+                          for valor, latencias in observador.latencias.items() if latencias},
+        }
+    finally:
+        shutil.rmtree(temporario, ignore_errors=True)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Carga de dispositivos simulados no broker em processo')
+    parser.add_argument('--dispositivos', type=int, default=1000)
+    parser.add_argument('--intervalo', type=float, default=5.0, help='segundos entre mensagens de um dispositivo')
+    parser.add_argument('--duracao', type=float,
+                        help='segundos de publicacao (padrao: (2 * ciclos-regime + 1) * intervalo)')
+    parser.add_argument('--workers', type=int, default=os.cpu_count())
+    parser.add_argument('--formato', choices=['texto', 'binario'], default='binario')
+    parser.add_argument('--ciclos-regime', type=int, default=6, help='mensagens antes de alternar normal/alerta')
+    parser.add_argument('--ciclos-alerta', type=int, default=3, help='histerese do servico (ligar/desligar)')
+    parser.add_argument('--instantaneos', action='store_true',
+                        help='publica instantaneos e agrega as medias horarias no servico')
+    parser.add_argument('--leituras-hora', type=int, default=12, help='leituras por hora simulada com --instantaneos')
+    parser.add_argument('--semente', type=int, default=42)
+    args = parser.parse_args()
+
+    if args.leituras_hora < 1:
+        parser.error('--leituras-hora deve ser positivo')
+
+    resultado = executarSimulacao(args.dispositivos, args.intervalo, args.duracao, args.workers, args.formato,
+                                  args.ciclos_regime, args.ciclos_alerta, args.semente,
+                                  args.leituras_hora if args.instantaneos else 0)
+
+    def ms(valor):
+        return '{:.1f} ms'.format(valor * 1000) if valor is not None else '-'
+
+    print('Dispositivos: {} | workers: {} | duracao {:.0f}s | {}'.format(
+        resultado['dispositivos'], resultado['workers'], resultado['duracao'], resultado['topico']))
+    print('Publicacao: {} mensagens, {:.0f} msg/s (oferecido {:.0f} msg/s)'.format(
+        resultado['publicadas'], resultado['taxa_publicacao'], resultado['taxa_oferecida']))
+    print('Classificacao: {} medicoes, {:.0f} msg/s fim a fim (drenagem {:.2f}s)'.format(
+        resultado['classificadas'], resultado['taxa_classificacao'], resultado['drenagem_segundos']))
+    for valor in ('on', 'off'):
+        latencia = resultado['latencias'].get(valor, {})
+        print('Alertas {}: {} | latencia p50 {} p99 {} max {}'.format(
+            valor, resultado['alertas'].get(valor, 0), ms(latencia.get('p50')), ms(latencia.get('p99')),
+            ms(latencia.get('maxima'))))
+    if not resultado['alertas'].get('on'):
+        print('Aviso: nenhuma transicao para on; a duracao deve cobrir pelo menos {} mensagens por dispositivo '
+              '(--ciclos-regime + --ciclos-alerta)'.format(args.ciclos_regime + args.ciclos_alerta))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,57 @@
+import unittest
+
+from agregador_horario import AgregadorHorario
+
+# Inicio de uma hora (alinhado na epoca)
+HORA = 1736942400
+
+
+class TestAgregadorHorario(unittest.TestCase):
+
+    def setUp(self):
+        self.emitidos = []
+        self.agregador = AgregadorHorario(lambda dispositivo, janela, columns:
+                                          self.emitidos.append((dispositivo, janela, columns)))
+
+    def adicionarMinutos(self, minutos, dispositivo='b8:27:eb:00:00:01'):
+        for minuto in minutos:
+            self.agregador.adicionar(dispositivo, HORA + 60 * minuto, 20.0 + minuto % 5, -25.5, -49.25)
+
+    def test_janela_emitida_pela_leitura_seguinte(self):
+        self.adicionarMinutos(range(0, 60))
+        self.adicionarMinutos([60])
+        self.assertEqual([janela for _, janela, _ in self.emitidos], [HORA])
+        self.assertEqual(self.emitidos[0][2][2:4], [20.0, 24.0])
+
+    def test_leitura_atrasada_apos_varredura_e_contada_e_nao_reemitida(self):
+        self.adicionarMinutos(range(0, 58))
+        self.assertEqual(self.agregador.varrer(HORA + 3600 + 121), 1)
+
+        self.adicionarMinutos(range(58, 63))
+
+        self.assertEqual([janela for _, janela, _ in self.emitidos], [HORA])
+        self.assertEqual(self.agregador.atrasadas, 2)
+        # A hora seguinte continua aberta e e emitida normalmente
+        self.adicionarMinutos([120])
+        self.assertEqual([janela for _, janela, _ in self.emitidos], [HORA, HORA + 3600])
+        self.assertEqual(self.emitidos[1][2][2:4], [20.0, 22.0])
+
+    def test_leitura_atrasada_apos_despejo(self):
+        self.agregador.maximoDispositivos = 1
+        self.adicionarMinutos([0, 1], 'a')
+        self.adicionarMinutos([0], 'b')
+        self.adicionarMinutos([2], 'a')
+        self.assertEqual([dispositivo for dispositivo, _, _ in self.emitidos], ['a'])
+        self.assertEqual(self.agregador.atrasadas, 1)
+
+    def test_encerrar_conta_janelas_abertas(self):
+        self.adicionarMinutos([0, 1], 'a')
+        self.adicionarMinutos([5], 'b')
+        self.agregador.encerrar()
+        self.assertEqual(self.emitidos, [])
+        self.assertEqual(self.agregador.descartadasEncerramento, 2)
+        self.assertEqual(len(self.agregador), 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
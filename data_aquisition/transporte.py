@@ -0,0 +1,278 @@
+"""
+Pluggable MQTT transport: the real paho client in production, an in-process loopback broker for tests.
+
+1. **Transports:**
+   - `criarCliente('paho', clientId)`: `paho.mqtt.client.Client` (imported only when used).
+   - `criarCliente('loopback', clientId)`: `ClienteLoopback`, with the subset of the paho API used by the
+     services (`connect`/`connect_async`, `loop_start`/`loop_stop`, `subscribe`, `publish`, `is_connected`,
+     `disconnect` and the `on_connect`/`on_message`/`on_disconnect` callbacks), so the services run unchanged.
+
+2. **Loopback Broker:**
+   - `BrokerLoopback` routes each publish to the clients whose subscriptions match, with the MQTT wildcards
+     (`+` one level, `#` the remaining levels; topics starting with `$` are not matched by a leading wildcard).
+   - Retained messages are kept per topic (an empty payload clears it) and delivered on subscribe.
+   - One broker exists per `host:porta` passed to `connect`, so clients of the same process that connect to the
+     same address talk to each other; nothing goes on the network.
+
+3. **Delivery:**
+   - Like paho, callbacks run on the client's own loop thread (`loop_start`), never on the publisher's thread,
+     so a callback may publish without re-entering the sender. Publishes are acknowledged immediately (any QoS).
+   - Messages are queued per client while its loop is not running.
+"""
+
+import queue
+import threading
+
+TRANSPORTES = ('paho', 'loopback')
+
+# Codigos de retorno do paho usados pelos servicos
+MQTT_ERR_SUCCESS = 0
+MQTT_ERR_NO_CONN = 4
+
+
+def topicoCorresponde(filtro, topico):
+    niveisFiltro = filtro.split('/')
+    niveis = topico.split('/')
+
+    # Curingas no primeiro nivel nao casam com topicos de sistema ($SYS/...)
+    if topico.startswith('$') and niveisFiltro[0] in ('+', '#'):
+        return False
+
+    for posicao, nivel in enumerate(niveisFiltro):
+        if nivel == '#':
+            return True
+        if posicao >= len(niveis):
+            return False
+        if nivel != '+' and nivel != niveis[posicao]:
+            return False
+    return len(niveisFiltro) == len(niveis)
+
+
+def converterPayload(payload):
+    if payload is None:
+        return b''
+    if isinstance(payload, (bytes, bytearray)):
+        return bytes(payload)
+    if isinstance(payload, str):
+        return payload.encode('utf-8')
+    if isinstance(payload, (int, float)):
+        return str(payload).encode('ascii')
+    raise TypeError('payload deve ser str, bytes, int, float ou None')
+
+
+class MensagemLoopback(object):
+
+    __slots__ = ('topic', 'payload', 'qos', 'retain', 'mid')
+
+    def __init__(self, topic, payload, qos=0, retain=False, mid=0):
+        self.topic = topic
+        self.payload = payload
+        self.qos = qos
+        self.retain = retain
+        self.mid = mid
+
+
+class InfoPublicacao(object):
+    # Equivalente ao MQTTMessageInfo do paho; a entrega em processo e imediata
+
+    def __init__(self, rc, mid):
+        self.rc = rc
+        self.mid = mid
+
+    def is_published(self):
+        return self.rc == MQTT_ERR_SUCCESS
+
+    def wait_for_publish(self, timeout=None):
+        return None
+
+
+class BrokerLoopback(object):
+
+    def __init__(self):
+        self.assinaturas = []
+        self.retidas = {}
+        # topico -> clientes com alguma assinatura que casa (refeito quando as assinaturas mudam)
+        self.rotas = {}
+        self.trava = threading.Lock()
+        self.mid = 0
+
+        # Contadores
+        self.publicadas = 0
+        self.entregues = 0
+
+    def assinar(self, cliente, filtro, qos=0):
+        with self.trava:
+            if (filtro, cliente) not in self.assinaturas:
+                self.assinaturas.append((filtro, cliente))
+            self.rotas.clear()
+            retidas = [(topico, payload) for topico, payload in self.retidas.items()
+                       if topicoCorresponde(filtro, topico)]
+        for topico, payload in retidas:
+            cliente.receber(MensagemLoopback(topico, payload, qos, True))
+
+    def cancelar(self, cliente, filtro=None):
+        with self.trava:
+            self.assinaturas = [(outro, dono) for outro, dono in self.assinaturas
+                                if dono is not cliente or (filtro is not None and outro != filtro)]
+            self.rotas.clear()
+
+    def _destinos(self, topico):
+        # Chamado com a trava adquirida
+        destinos = self.rotas.get(topico)
+        if destinos is None:
+            destinos = []
+            for filtro, cliente in self.assinaturas:
+                if cliente not in destinos and topicoCorresponde(filtro, topico):
+                    destinos.append(cliente)
+            self.rotas[topico] = destinos
+        return destinos
+
+    def publicar(self, topico, payload, qos=0, retain=False):
+        with self.trava:
+            self.mid += 1
+            mid = self.mid
+            self.publicadas += 1
+            if retain:
+                if payload:
+                    self.retidas[topico] = payload
+                else:
+                    self.retidas.pop(topico, None)
+            destinos = self._destinos(topico)
+            self.entregues += len(destinos)
+
+        for cliente in destinos:
+            cliente.receber(MensagemLoopback(topico, payload, qos, False, mid))
+        return mid
+
+
+BROKERS = {}
+travaBrokers = threading.Lock()
+
+
+def obterBroker(host='localhost', porta=1883):
+    with travaBrokers:
+        broker = BROKERS.get((host, porta))
+        if broker is None:
+            broker = BROKERS[(host, porta)] = BrokerLoopback()
+        return broker
+
+
+class ClienteLoopback(object):
+
+    def __init__(self, client_id='', userdata=None):
+        self.client_id = client_id
+        self.userdata = userdata
+        self.on_connect = None
+        self.on_message = None
+        self.on_disconnect = None
+
+        self.broker = None
+        self.conectado = False
+        self.fila = queue.SimpleQueue()
+        self.thread = None
+
+    def user_data_set(self, userdata):
+        self.userdata = userdata
+
+    def connect(self, host, port=1883, keepalive=60):
+        self.broker = obterBroker(host, port)
+        self.conectado = True
+        # O on_connect roda na thread do loop, como a resposta CONNACK do paho
+        self.fila.put(('conexao', 0))
+        return MQTT_ERR_SUCCESS
+
+    connect_async = connect
+
+    def disconnect(self):
+        if self.broker is not None:
+            self.broker.cancelar(self)
+        self.conectado = False
+        self.fila.put(('desconexao', 0))
+        return MQTT_ERR_SUCCESS
+
+    def is_connected(self):
+        return self.conectado
+
+    def subscribe(self, topic, qos=0):
+        if not self.conectado:
+            return MQTT_ERR_NO_CONN, None
+        filtros = topic if isinstance(topic, list) else [(topic, qos)]
+        for filtro, qosFiltro in filtros:
+            self.broker.assinar(self, filtro, qosFiltro)
+        return MQTT_ERR_SUCCESS, None
+
+    def unsubscribe(self, topic):
+        if self.broker is not None:
+            for filtro in (topic if isinstance(topic, list) else [topic]):
+                self.broker.cancelar(self, filtro)
+        return MQTT_ERR_SUCCESS, None
+
+    def publish(self, topic, payload=None, qos=0, retain=False):
+        if not self.conectado:
+            return InfoPublicacao(MQTT_ERR_NO_CONN, 0)
+        mid = self.broker.publicar(topic, converterPayload(payload), qos, retain)
+        return InfoPublicacao(MQTT_ERR_SUCCESS, mid)
+
+    def receber(self, mensagem):
+        # Chamado pelo broker, na thread de quem publicou
+        self.fila.put(('mensagem', mensagem))
+
+    # ----------------------------------------------------------------- loop
+
+    def _processar(self, evento, dado):
+        try:
+            if evento == 'mensagem':
+                if self.on_message is not None:
+                    self.on_message(self, self.userdata, dado)
+            elif evento == 'conexao':
+                if self.on_connect is not None:
+                    self.on_connect(self, self.userdata, {}, dado)
+            elif self.on_disconnect is not None:
+                self.on_disconnect(self, self.userdata, dado)
+        except Exception as erro:
+            print('Erro no callback MQTT ({}): {}'.format(evento, erro))
+
+    def loop(self, timeout=1.0):
+        # Processa os eventos pendentes (ao menos um, esperando ate timeout)
+        try:
+            evento, dado = self.fila.get(timeout=timeout)
+        except queue.Empty:
+            return MQTT_ERR_SUCCESS
+        while evento is not None:
+            self._processar(evento, dado)
+            try:
+                evento, dado = self.fila.get_nowait()
+            except queue.Empty:
+                break
+        return MQTT_ERR_SUCCESS
+
+    def loop_start(self):
+        if self.thread is not None:
+            return
+        self.thread = threading.Thread(target=self._executar, name='loopback-{}'.format(self.client_id),
+                                       daemon=True)
+        self.thread.start()
+
+    def loop_stop(self, force=False):
+        if self.thread is None:
+            return
+        self.fila.put((None, None))
+        self.thread.join()
+        self.thread = None
+
+    def _executar(self):
+        while True:
+            evento, dado = self.fila.get()
+            if evento is None:
+                break
+            self._processar(evento, dado)
+
+
+def criarCliente(transporte='paho', clientId=''):
+    if transporte == 'paho':
+        import paho.mqtt.client as mqtt
+
+        return mqtt.Client(clientId)
+    if transporte == 'loopback':
+        return ClienteLoopback(clientId)
+    raise ValueError('transporte desconhecido: {} (use {})'.format(transporte, ', '.join(TRANSPORTES)))
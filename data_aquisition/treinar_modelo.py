@@ -0,0 +1,256 @@
+"""
+Training entry point for the KNN classifier (train once, serve many).
+
+1. **What it does:**
+   - Trains the KNN classifier on the full `treinamento.csv` and writes a versioned model artifact
+     (see `modelo_knn.py`) that `ML_Model_on_hadoop.py` loads at startup instead of retraining.
+
+2. **Usage:**
+   ```bash
+   python treinar_modelo.py
+   python treinar_modelo.py --treinamento /root/om/PreProcessamento/treinamento.csv \\
+                            --saida /root/om/PreProcessamento/modelo_knn.joblib --vizinhos 4 --algoritmo kd_tree
+   python treinar_modelo.py --varredura --grade-vizinhos 1,3,4,5,7,9,15 --grade-pesos uniform,distance \\
+                            --grade-conjuntos todas,temperaturas --dobras 5 --workers 8
+   ```
+
+3. **Scheduling:**
+   - Run it right after the daily `generate_database.py` job, so the service picks up the new artifact.
+
+4. **Sweep (`--varredura`):**
+   - A stratified holdout (`--holdout`, default 20%) is set aside; the rest is split in `--dobras` stratified
+     folds, and every configuration of the grid (neighbors x weighting x feature set of
+     `modelo_knn.CONJUNTOS_FEATURES`, including the min/max-only set) is cross-validated on them.
+   - Each (configuration, fold) pair is an independent task on a process pool (`--workers`, default all cores);
+     the data and the folds are sent once to each worker, and each KNN runs single-threaded.
+   - For each configuration it reports the mean and standard deviation of the accuracy, the prediction time per
+     row in a batch and the median latency of a single-row `predict` (the per-message path of the service,
+     measured on the first fold).
+   - The best configuration (highest mean accuracy; ties go to the lowest single-row latency) is scored on the
+     holdout, retrained on the whole base and saved with its evaluation in the artifact. The evaluation of the
+     previous artifact, when there is one, is printed next to it, so a retrain that made the model worse shows up.
+   - `--relatorio` writes the table of all configurations as CSV.
+
+5. **Compiled Model (`--compilar`):**
+   - The saved model is compiled into a lookup table over the quantized feature domain (`modelo_tabela.py`):
+     integer temperatures and 0.05 degree cells cost one array index per prediction, other inputs use the KNN.
+   - The devices publish raw coordinates, which are off the grid; `--ajustar-grade` snaps them to their cell before
+     the lookup (the quantization of the training base), which is needed for the service to hit the table but
+     changes predictions near cell edges compared with the KNN on raw coordinates.
+"""
+
+#! /usr/bin/env python
+import argparse
+import csv
+import os
+import statistics
+import time
+from multiprocessing import Pool
+
+import numpy as np
+import pandas as pd
+from sklearn.model_selection import KFold, StratifiedKFold, train_test_split
+
+import modelo_knn
+
+# Chamadas de predict com uma linha medidas na primeira dobra de cada configuracao (latencia unitaria)
+AMOSTRAS_LATENCIA = 50
+
+# Dados compartilhados pelas tarefas de cada worker (enviados uma vez, no inicializador do Pool)
+dadosWorker = {}
+
+
+def inicializarWorker(x, y, dobras):
+    dadosWorker['x'] = x
+    dadosWorker['y'] = y
+    dadosWorker['dobras'] = dobras
+
+
+def avaliarDobra(tarefa):
+    # Treina uma configuracao em uma dobra; -> (configuracao, dobra, acuracia, segundos por linha, latencia unitaria)
+    configuracao, dobra = tarefa
+    vizinhos, pesos, conjunto, algoritmo = configuracao
+    x = dadosWorker['x']
+    y = dadosWorker['y']
+    treino, teste = dadosWorker['dobras'][dobra]
+
+    colunas = modelo_knn.CONJUNTOS_FEATURES[conjunto]
+    indices = [modelo_knn.COLUNAS_MODELO.index(coluna) for coluna in colunas]
+    modelo = modelo_knn.criarModelo(x[treino][:, indices], y[treino], vizinhos, algoritmo, pesos, colunas)
+
+    # A matriz de teste tem as quatro colunas, como a montada pelos servicos
+    xTeste = x[teste]
+    inicio = time.perf_counter()
+    previsto = modelo.predict(xTeste)
+    segundosLote = time.perf_counter() - inicio
+
+    latencia = None
+    if dobra == 0:
+        unitarias = []
+        for posicao in range(min(AMOSTRAS_LATENCIA, len(teste))):
+            linha = xTeste[posicao:posicao + 1]
+            inicio = time.perf_counter()
+            modelo.predict(linha)
+            unitarias.append(time.perf_counter() - inicio)
+        latencia = statistics.median(unitarias)
+
+    acuracia = float((previsto == y[teste]).mean())
+    return configuracao, dobra, acuracia, segundosLote / len(teste), latencia
+
+
+def separarDobras(y, dobras, holdout, semente=42):
+    # -> (indices do holdout, [(treino, teste)] das dobras sobre o restante), estratificados quando possivel
+    indices = np.arange(len(y))
+    _, contagens = np.unique(y, return_counts=True)
+    estratificar = contagens.min() >= max(dobras, 2)
+
+    restante, separados = indices, indices[:0]
+    if holdout > 0:
+        restante, separados = train_test_split(indices, test_size=holdout, random_state=semente,
+                                               stratify=y if estratificar else None)
+
+    if estratificar and np.unique(y[restante], return_counts=True)[1].min() >= dobras:
+        divisor = StratifiedKFold(n_splits=dobras, shuffle=True, random_state=semente)
+    else:
+        divisor = KFold(n_splits=dobras, shuffle=True, random_state=semente)
+    return separados, [(restante[treino], restante[teste]) for treino, teste in divisor.split(restante, y[restante])]
+
+
+def executarVarredura(caminhoTreinamento, grade, dobras=5, holdout=0.2, workers=None, semente=42):
+    data = pd.read_csv(caminhoTreinamento)
+    x = data[modelo_knn.COLUNAS_MODELO].values
+    y = data['Classe'].values
+    separados, particoes = separarDobras(y, dobras, holdout, semente)
+
+    tarefas = [(configuracao, dobra) for configuracao in grade for dobra in range(len(particoes))]
+    with Pool(workers or os.cpu_count(), initializer=inicializarWorker, initargs=(x, y, particoes)) as pool:
+        resultados = pool.map(avaliarDobra, tarefas, chunksize=1)
+
+    porConfiguracao = {}
+    for configuracao, dobra, acuracia, segundosLinha, latencia in resultados:
+        porConfiguracao.setdefault(configuracao, []).append((acuracia, segundosLinha, latencia))
+
+    tabela = []
+    for configuracao in grade:
+        medidas = porConfiguracao[configuracao]
+        acuracias = [medida[0] for medida in medidas]
+        vizinhos, pesos, conjunto, algoritmo = configuracao
+        tabela.append({
+            'vizinhos': vizinhos, 'pesos': pesos, 'conjunto': conjunto, 'algoritmo': algoritmo,
+            'acuracia': statistics.mean(acuracias),
+            'desvio': statistics.pstdev(acuracias),
+            'us_por_linha': statistics.mean(medida[1] for medida in medidas) * 1e6,
+            'latencia_unitaria_us': min(medida[2] for medida in medidas if medida[2] is not None) * 1e6,
+        })
+    melhor = max(tabela, key=lambda linha: (linha['acuracia'], -linha['latencia_unitaria_us']))
+
+    # Acuracia do melhor no holdout (nao visto na escolha)
+    acuraciaHoldout = None
+    if len(separados):
+        colunas = modelo_knn.CONJUNTOS_FEATURES[melhor['conjunto']]
+        indices = [modelo_knn.COLUNAS_MODELO.index(coluna) for coluna in colunas]
+        treino = np.setdiff1d(np.arange(len(y)), separados)
+        modelo = modelo_knn.criarModelo(x[treino][:, indices], y[treino], melhor['vizinhos'], melhor['algoritmo'],
+                                        melhor['pesos'], colunas)
+        acuraciaHoldout = float((modelo.predict(x[separados]) == y[separados]).mean())
+
+    return tabela, melhor, acuraciaHoldout
+
+
+def montarGrade(vizinhos, pesos, conjuntos, algoritmo):
+    for conjunto in conjuntos:
+        if conjunto not in modelo_knn.CONJUNTOS_FEATURES:
+            raise ValueError('conjunto desconhecido: {} (use {})'.format(
+                conjunto, ', '.join(modelo_knn.CONJUNTOS_FEATURES)))
+    return [(k, peso, conjunto, algoritmo) for conjunto in conjuntos for peso in pesos for k in vizinhos]
+
+
+def listaTexto(texto, tipo=str):
+    return [tipo(item) for item in texto.split(',') if item.strip()]
+
+
+def avaliacaoAnterior(caminho):
+    try:
+        return modelo_knn.carregarArtefato(caminho).get('avaliacao')
+    except (OSError, ValueError):
+        return None
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Treina o KNN e grava o artefato do modelo')
+    parser.add_argument('--treinamento', default=modelo_knn.CAMINHO_TREINAMENTO)
+    parser.add_argument('--saida', default=modelo_knn.CAMINHO_MODELO)
+    parser.add_argument('--vizinhos', type=int, default=4)
+    parser.add_argument('--algoritmo', choices=['kd_tree', 'ball_tree'], default='kd_tree')
+    parser.add_argument('--varredura', action='store_true', help='valida a grade de configuracoes e grava a melhor')
+    parser.add_argument('--grade-vizinhos', default='1,3,4,5,7,9,15')
+    parser.add_argument('--grade-pesos', default='uniform,distance')
+    parser.add_argument('--grade-conjuntos', default=','.join(modelo_knn.CONJUNTOS_FEATURES))
+    parser.add_argument('--dobras', type=int, default=5)
+    parser.add_argument('--holdout', type=float, default=0.2, help='fracao separada para avaliar a melhor')
+    parser.add_argument('--workers', type=int, default=os.cpu_count())
+    parser.add_argument('--relatorio', help='CSV com a avaliacao de todas as configuracoes')
+    parser.add_argument('--compilar', action='store_true', help='compila o modelo em tabela de consulta')
+    parser.add_argument('--ajustar-grade', action='store_true',
+                        help='com --compilar, leva as coordenadas a celula de 0.05 antes da consulta')
+    args = parser.parse_args()
+
+    avaliacao = None
+    parametros = {'vizinhos': args.vizinhos, 'algoritmo': args.algoritmo}
+
+    if args.varredura:
+        try:
+            grade = montarGrade(listaTexto(args.grade_vizinhos, int), listaTexto(args.grade_pesos),
+                                listaTexto(args.grade_conjuntos), args.algoritmo)
+        except ValueError as erro:
+            parser.error(str(erro))
+
+        inicio = time.perf_counter()
+        tabela, melhor, acuraciaHoldout = executarVarredura(args.treinamento, grade, args.dobras, args.holdout,
+                                                            args.workers)
+        tempoVarredura = time.perf_counter() - inicio
+
+        print('{:>8} {:<9} {:<13} {:>9} {:>7} {:>10} {:>12}'.format(
+            'vizinhos', 'pesos', 'conjunto', 'acuracia', 'desvio', 'us/linha', 'unitaria us'))
+        for linha in sorted(tabela, key=lambda linha: -linha['acuracia']):
+            print('{vizinhos:>8} {pesos:<9} {conjunto:<13} {acuracia:>9.4f} {desvio:>7.4f} {us_por_linha:>10.2f} '
+                  '{latencia_unitaria_us:>12.1f}'.format(**linha))
+        print('{} configuracoes x {} dobras em {:.1f}s ({} workers)'.format(len(grade), args.dobras, tempoVarredura,
+                                                                           args.workers))
+
+        if args.relatorio:
+            with open(args.relatorio, 'w', newline='') as arquivo:
+                escritor = csv.DictWriter(arquivo, fieldnames=list(tabela[0]))
+                escritor.writeheader()
+                escritor.writerows(tabela)
+
+        avaliacao = dict(melhor, holdout=acuraciaHoldout, dobras=args.dobras)
+        parametros = {'vizinhos': melhor['vizinhos'], 'algoritmo': melhor['algoritmo'], 'pesos': melhor['pesos'],
+                      'colunas': modelo_knn.CONJUNTOS_FEATURES[melhor['conjunto']]}
+
+        anterior = avaliacaoAnterior(args.saida)
+        print('Melhor: {} vizinhos, {}, {} - acuracia {:.4f} (holdout {})'.format(
+            melhor['vizinhos'], melhor['pesos'], melhor['conjunto'], melhor['acuracia'],
+            '{:.4f}'.format(acuraciaHoldout) if acuraciaHoldout is not None else '-'))
+        if anterior:
+            print('Anterior: {} vizinhos, {}, {} - acuracia {:.4f} (holdout {})'.format(
+                anterior['vizinhos'], anterior['pesos'], anterior['conjunto'], anterior['acuracia'],
+                '{:.4f}'.format(anterior['holdout']) if anterior.get('holdout') is not None else '-'))
+
+    inicio = time.perf_counter()
+    artefato = modelo_knn.treinarModelo(args.treinamento, avaliacao=avaliacao, compilar=args.compilar,
+                                        ajustarGrade=args.ajustar_grade, **parametros)
+    tempoTreino = time.perf_counter() - inicio
+
+    modelo_knn.salvarArtefato(artefato, args.saida)
+
+    inicio = time.perf_counter()
+    modelo_knn.carregarArtefato(args.saida)
+    tempoCarga = time.perf_counter() - inicio
+
+    print('Modelo {} treinado com {} amostras em {:.3f}s'.format(artefato['versao'], artefato['amostras'], tempoTreino))
+    print('Artefato: {} ({} bytes) - carga em {:.1f}ms'.format(args.saida, os.path.getsize(args.saida), tempoCarga * 1000))
+
+
+if __name__ == '__main__':
+    main()
@@ -1,9 +1,44 @@
 # for Humidity and temperature
+# Usa o amostrador de data_aquisition (leitura em thread propria, com backend de sensor selecionavel):
+#   python dht11.py            -> DHT11 real (Adafruit_DHT)
+#   python dht11.py falso 5    -> sensor simulado, 5 leituras
+#   python dht11.py replay resultadoRemoto.csv 5 -> temperaturas de um CSV, 5 leituras
 
 #! /usr/bin/env python
-import Adafruit_DHT as dht
+import os
+import sys
 
-umidade, temperatura = dht.read_retry(dht.DHT11, 4)
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'data_aquisition'))
 
-print('Humidity: {}'.format(umidade))
-print('Temperature : {}'.format(temperatura))
+from amostrador import SENSORES, Amostrador, criarSensor
+
+USO = 'uso: python dht11.py [dht11 | falso [leituras] | replay <arquivo.csv> [leituras]]'
+
+argumentos = sys.argv[1:]
+sensor = argumentos.pop(0) if argumentos else 'dht11'
+if sensor not in SENSORES:
+    sys.exit(USO)
+
+# O replay le as temperaturas de um CSV
+opcoes = []
+if sensor == 'replay':
+    if not argumentos:
+        sys.exit(USO)
+    opcoes.append(argumentos.pop(0))
+
+try:
+    leituras = int(argumentos[0]) if argumentos else 1
+except ValueError:
+    sys.exit(USO)
+
+amostrador = Amostrador(criarSensor(sensor, *opcoes), intervalo=2)
+amostrador.iniciar()
+
+for i in range(leituras):
+    amostra = amostrador.obter()
+
+    print('Humidity: {}'.format(amostra.umidade))
+    print('Temperature : {}'.format(amostra.temperatura))
+    print('Read time : {:.2f}s'.format(amostra.duracaoLeitura))
+
+amostrador.encerrar()
@@ -0,0 +1,150 @@
+"""
+Memory-bounded hash aggregation for the reducers (`generate_database.py`, `hadoop/reduce.py`), with spill to disk.
+
+1. **Budget:**
+   - The reducer keeps its usual dict of partial aggregates; `Derramamento(combinar, limiteBytes, bytesPorChave)` turns the
+     memory budget into a maximum number of keys (`maximoChaves`), using the reducer's estimate of bytes per key.
+
+2. **Spill:**
+   - When the dict goes over the budget, `derramar` hash-partitions its entries (`crc32(chave) % particoes`) into
+     temporary files (one pickled chunk per spill and partition) and clears the dict.
+   - Each entry carries the position at which its key was first seen, so the output keeps the first-seen order
+     of the in-memory path.
+
+3. **Merge:**
+   - `itens` (at the end of the input) reads one partition at a time, combines the partial aggregates of each key
+     in spill order with the reducer's `combinar(anterior, posterior)`, writes the partition sorted by first-seen
+     position, and `heapq.merge`s the partitions back into a single stream.
+   - Without any spill, `itens` is just the dict, so the in-memory path is unchanged.
+   - The result equals the in-memory path as long as `combinar` is associative: sums must be exact
+     (`valorExato`/`mediaExata`: integers in units of 2^-80, divided once at the end with correct rounding),
+     and ties in min/max keep the earlier value.
+
+4. **Report:**
+   - Counters `derramamentos`, `chavesDerramadas` and `bytesDerramados`; `picoRss()` returns the peak RSS in KB.
+"""
+
+import heapq
+import os
+import pickle
+import resource
+import shutil
+import tempfile
+import zlib
+from operator import itemgetter
+
+# Somas exatas: valores em unidades de 2^-ESCALA_EXATA (exato para |x| >= 2^-28)
+ESCALA_EXATA = 80
+FATOR_EXATO = float(1 << ESCALA_EXATA)
+
+# Itens por bloco ao regravar uma particao ordenada
+TAMANHO_BLOCO = 10000
+
+
+def valorExato(valor):
+    return int(valor * FATOR_EXATO)
+
+
+def mediaExata(soma, quantidade):
+    # Divisao inteira verdadeira: arredondamento correto do valor exato
+    return soma / (quantidade << ESCALA_EXATA)
+
+
+def particaoChave(chave, particoes):
+    if isinstance(chave, str):
+        chave = chave.encode('utf-8')
+    return zlib.crc32(chave) % particoes
+
+
+def picoRss():
+    # KB no Linux
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+
+def lerBlocos(caminho):
+    with open(caminho, 'rb') as arquivo:
+        while True:
+            try:
+                yield pickle.load(arquivo)
+            except EOFError:
+                return
+
+
+class Derramamento(object):
+
+    def __init__(self, combinar, limiteBytes, bytesPorChave=1024, particoes=16, diretorio=None):
+        # combinar(anterior, posterior) -> parcial combinado (anterior veio antes na entrada)
+        self.combinar = combinar
+        self.maximoChaves = max(1, int(limiteBytes // bytesPorChave))
+        self.particoes = particoes
+        self.diretorio = tempfile.mkdtemp(prefix='derramamento_', dir=diretorio)
+
+        # Posicao da proxima chave nova (ordem de primeira aparicao)
+        self.ordem = 0
+
+        # Contadores
+        self.derramamentos = 0
+        self.chavesDerramadas = 0
+        self.bytesDerramados = 0
+
+    def caminhoParticao(self, particao, prefixo='particao'):
+        return os.path.join(self.diretorio, '{}_{:05d}.pkl'.format(prefixo, particao))
+
+    def derramar(self, tabela):
+        blocos = [[] for _ in range(self.particoes)]
+        for posicao, (chave, parcial) in enumerate(tabela.items(), self.ordem):
+            blocos[particaoChave(chave, self.particoes)].append((posicao, chave, parcial))
+        self.ordem += len(tabela)
+
+        for particao, bloco in enumerate(blocos):
+            if not bloco:
+                continue
+            with open(self.caminhoParticao(particao), 'ab') as arquivo:
+                inicio = arquivo.tell()
+                pickle.dump(bloco, arquivo, pickle.HIGHEST_PROTOCOL)
+                self.bytesDerramados += arquivo.tell() - inicio
+
+        self.derramamentos += 1
+        self.chavesDerramadas += len(tabela)
+        tabela.clear()
+
+    def _reduzirParticao(self, particao):
+        # Combina os parciais de cada chave e regrava a particao na ordem de primeira aparicao
+        caminho = self.caminhoParticao(particao)
+        if not os.path.exists(caminho):
+            return None
+
+        combinados = {}
+        for bloco in lerBlocos(caminho):
+            for posicao, chave, parcial in bloco:
+                existente = combinados.get(chave)
+                if existente is None:
+                    combinados[chave] = [posicao, parcial]
+                else:
+                    existente[1] = self.combinar(existente[1], parcial)
+        os.remove(caminho)
+
+        itens = sorted((posicao, chave, parcial) for chave, (posicao, parcial) in combinados.items())
+        del combinados
+        destino = self.caminhoParticao(particao, 'ordenada')
+        with open(destino, 'wb') as arquivo:
+            for inicio in range(0, len(itens), TAMANHO_BLOCO):
+                pickle.dump(itens[inicio:inicio + TAMANHO_BLOCO], arquivo, pickle.HIGHEST_PROTOCOL)
+        return destino
+
+    def itens(self, tabela):
+        # (chave, parcial) de todas as chaves, na ordem de primeira aparicao
+        if not self.derramamentos:
+            yield from tabela.items()
+            return
+
+        if tabela:
+            self.derramar(tabela)
+
+        ordenadas = [self._reduzirParticao(particao) for particao in range(self.particoes)]
+        fluxos = [(item for bloco in lerBlocos(caminho) for item in bloco) for caminho in ordenadas if caminho]
+        for _, chave, parcial in heapq.merge(*fluxos, key=itemgetter(0)):
+            yield chave, parcial
+
+    def fechar(self):
+        shutil.rmtree(self.diretorio, ignore_errors=True)
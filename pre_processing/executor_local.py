@@ -0,0 +1,183 @@
+"""
+Local multi-process MapReduce runner for the pre-processing pipeline
+(`map_database.py | sort | generate_database.py`) on a single machine.
+
+1. **Map Phase:**
+   - Splits the input file into byte ranges aligned to line boundaries (`--fragmentos` per worker).
+   - Each range is mapped on a process pool with `map_database.mapearLinha`.
+   - Every output line is hash-partitioned by device key (`crc32(dispositivo) % particoes`) into temporary files.
+
+2. **Reduce Phase:**
+   - Each partition is sorted like `LC_ALL=C sort` and reduced in parallel with the `generate_database.py` logic
+     (`lerRegistros`, `acumular`, `linhaSaida`).
+
+3. **Merge:**
+   - Device rows are merged in device order, which is the order the serial pipeline produces after `sort`,
+     and written with `generate_database.gravarBases` into `teste.csv` and `treinamento.csv`.
+   - The results are identical to the serial pipeline; `--verificar` runs the serial pipeline and compares the files.
+
+4. **Speedup Report:**
+   - `--workers 1,2,4,8` runs the pipeline once per worker count and prints the time and the speedup
+     relative to the first count.
+
+**Example Usage:**
+   ```bash
+   python executor_local.py /root/om/historico.csv --saida /root/om/PreProcessamento --workers 1,4,8 --verificar
+   ```
+"""
+
+#! /usr/bin/env python
+import argparse
+import filecmp
+import os
+import shlex
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+import zlib
+from multiprocessing import Pool
+
+import generate_database
+import map_database
+
+DIRETORIO = os.path.dirname(os.path.abspath(__file__))
+
+
+def dividirArquivo(caminho, quantidade):
+    # Intervalos [inicio, fim) em bytes, alinhados ao inicio de uma linha
+    tamanho = os.path.getsize(caminho)
+    limites = [0]
+    with open(caminho, 'rb') as arquivo:
+        for i in range(1, quantidade):
+            arquivo.seek(max(tamanho * i // quantidade, limites[-1]))
+            if arquivo.tell() > 0:
+                arquivo.readline()
+            limites.append(min(arquivo.tell(), tamanho))
+    limites.append(tamanho)
+    return [(inicio, fim) for inicio, fim in zip(limites, limites[1:]) if fim > inicio]
+
+
+def particaoDispositivo(dispositivo, particoes):
+    return zlib.crc32(dispositivo.encode('utf-8')) % particoes
+
+
+def executarMapa(tarefa):
+    caminho, indice, inicio, fim, particoes, temporario = tarefa
+
+    saidas = [[] for _ in range(particoes)]
+    with open(caminho, 'rb') as arquivo:
+        arquivo.seek(inicio)
+        posicao = inicio
+        while posicao < fim:
+            linha = arquivo.readline()
+            if not linha:
+                break
+            posicao += len(linha)
+
+            saida = map_database.mapearLinha(linha.decode('utf-8'))
+            if saida is not None:
+                dispositivo = saida[:saida.index('\t')]
+                saidas[particaoDispositivo(dispositivo, particoes)].append(saida)
+
+    arquivos = []
+    for particao, linhas in enumerate(saidas):
+        nome = os.path.join(temporario, 'mapa_{:05d}_{:05d}.tsv'.format(indice, particao))
+        with open(nome, 'w', encoding='utf-8') as destino:
+            destino.write(''.join(linha + '\n' for linha in linhas))
+        arquivos.append(nome)
+    return arquivos
+
+
+def executarReducao(tarefa):
+    arquivos, = tarefa
+
+    linhas = []
+    for nome in arquivos:
+        with open(nome, 'rb') as origem:
+            linhas.extend(linha.rstrip(b'\n') for linha in origem)
+
+    # Mesma ordem do 'LC_ALL=C sort' do pipeline serial
+    linhas.sort()
+
+    estatisticas = {'linhas': 0, 'invalidas': 0, 'bytes': 0}
+    acumuladores = generate_database.acumular(generate_database.lerRegistros(linhas, estatisticas))
+
+    return [(dispositivo, generate_database.linhaSaida(acumulador))
+            for dispositivo, acumulador in acumuladores.items()]
+
+
+def executarPipeline(entrada, saida, workers, particoes=None, fragmentos=4):
+    particoes = particoes or workers
+    temporario = tempfile.mkdtemp(prefix='executor_local_')
+    try:
+        intervalos = dividirArquivo(entrada, workers * fragmentos)
+        tarefasMapa = [(entrada, indice, inicio, fim, particoes, temporario)
+                       for indice, (inicio, fim) in enumerate(intervalos)]
+
+        with Pool(workers) as pool:
+            arquivosMapa = pool.map(executarMapa, tarefasMapa)
+
+            tarefasReducao = [([arquivos[particao] for arquivos in arquivosMapa],) for particao in range(particoes)]
+            resultados = pool.map(executarReducao, tarefasReducao)
+    finally:
+        shutil.rmtree(temporario, ignore_errors=True)
+
+    # Ordem dos dispositivos igual a do pipeline serial (entrada ordenada por dispositivo)
+    linhas = sorted((registro for resultado in resultados for registro in resultado), key=lambda registro: registro[0])
+
+    teste = [linha for dispositivo, linha in linhas if dispositivo[:1].isdigit()]
+    treinamento = [linha for dispositivo, linha in linhas if not dispositivo[:1].isdigit()]
+
+    generate_database.gravarBases(teste, treinamento, saida)
+    return len(linhas)
+
+
+def executarSerial(entrada, saida):
+    # map_database.py | LC_ALL=C sort | generate_database.py
+    ambiente = dict(os.environ, LC_ALL='C')
+    comando = '{0} map_database.py < {1} | sort | {0} generate_database.py --saida {2}'.format(
+        shlex.quote(sys.executable), shlex.quote(entrada), shlex.quote(saida))
+    subprocess.run(comando, shell=True, check=True, cwd=DIRETORIO, env=ambiente, stderr=subprocess.DEVNULL)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Executa map_database/generate_database em paralelo localmente')
+    parser.add_argument('entrada', help='arquivo no formato de entrada do map_database.py')
+    parser.add_argument('--saida', default=generate_database.DIRETORIO_SAIDA)
+    parser.add_argument('--workers', default=str(os.cpu_count()), help='lista de quantidades, ex.: 1,2,4,8')
+    parser.add_argument('--particoes', type=int, default=None, help='particoes de reducao (padrao: workers)')
+    parser.add_argument('--fragmentos', type=int, default=4, help='fragmentos de entrada por worker')
+    parser.add_argument('--verificar', action='store_true', help='compara com o pipeline serial')
+    args = parser.parse_args()
+
+    entrada = os.path.abspath(args.entrada)
+    saida = os.path.abspath(args.saida)
+    quantidades = [int(valor) for valor in args.workers.split(',')]
+
+    tempos = []
+    for workers in quantidades:
+        inicio = time.perf_counter()
+        dispositivos = executarPipeline(entrada, saida, workers, args.particoes, args.fragmentos)
+        tempos.append(time.perf_counter() - inicio)
+        print('workers={}\t{:.2f}s\tspeedup={:.2f}x\t{} dispositivos'.format(
+            workers, tempos[-1], tempos[0] / tempos[-1], dispositivos))
+
+    if args.verificar:
+        serial = tempfile.mkdtemp(prefix='executor_serial_')
+        try:
+            inicio = time.perf_counter()
+            executarSerial(entrada, serial)
+            print('serial\t{:.2f}s'.format(time.perf_counter() - inicio))
+            iguais = all(filecmp.cmp(os.path.join(saida, nome), os.path.join(serial, nome), shallow=False)
+                         for nome in ('teste.csv', 'treinamento.csv'))
+        finally:
+            shutil.rmtree(serial, ignore_errors=True)
+        print('Resultado identico ao pipeline serial' if iguais else 'DIFERENTE do pipeline serial')
+        if not iguais:
+            sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -14,7 +14,15 @@ This script processes environmental data collected from IoT devices, categorizin
    - Aggregates data for each device, calculating:
      - Average temperature, latitude, longitude, hour, and minute.
      - Minimum and maximum temperatures for each device.
-   - Stores this aggregated information in dictionaries.
+   - Keeps a single compact `AcumuladorDispositivo` record (`__slots__`) per device, with sequential float sums
+     of the temperature and coordinates in input order.
+   - `--soma-exata` uses `AcumuladorExato` instead: exact integer sums (`derramamento.valorExato`), divided once at
+     the end with correct rounding, so the result does not depend on the order in which partial sums are combined.
+     An average then differs from the float one in the last bit at most, but when it sits on a grid-cell boundary
+     (the `round(x / 0.05)` tie) or on a class threshold (e.g. exactly 20.0) the device can move to the
+     neighbouring 0.05 degree cell or class (about 30 of 6000 devices on synthetic grid-aligned data).
+   - Input is parsed at byte level from `sys.stdin.buffer`; malformed lines are counted and reported
+     on stderr instead of being silently ignored.
 
 3. **Classification:**
    - Categorizes the average temperature into classes:
@@ -29,126 +37,454 @@ This script processes environmental data collected from IoT devices, categorizin
      - Otherwise, it goes into the training dataset (`dfTreinamento`).
 
 5. **CSV File Management:**
-   - Deletes old CSV files (`teste.csv` and `treinamento.csv`) to avoid appending duplicate data.
-   - Saves the test and training datasets to new CSV files:
+   - Saves the test and training datasets to CSV files, replacing the previous ones:
      - `teste.csv`: Contains test data.
      - `treinamento.csv`: Contains training data.
+   - Each file is written to a temporary file and renamed over the old one (atomic swap), so readers never see
+     a missing or half-written base.
 
 6. **Output Structure:**
    - Each dataset includes:
      - Hour, minute, minimum and maximum temperatures, latitude, longitude, and temperature class.
+   - Both DataFrames are built in one shot from column lists (no per-row `DataFrame.append`).
+
+7. **Throughput Report:**
+   - At the end, prints lines, devices, elapsed time, lines/s and peak RSS to stderr, plus the same
+     numbers as Hadoop streaming counters (`reporter:counter:generate_database,...`).
+   - `--saida` changes the output directory (default `/root/om/PreProcessamento`).
+
+8. **Memory Budget:**
+   - `--memoria MB` bounds the device table: above the budget, partial aggregates are hash-partitioned into
+     temporary spill files (`derramamento.py`, `--particoes`, `--temporario`) and merged one partition at a time
+     at the end; the spilled bytes are added to the report.
+   - Merging spilled partials adds partial sums out of input order, so `--memoria` requires `--soma-exata`; the CSVs
+     are then identical to `--soma-exata` without `--memoria`.
+
+9. **Incremental Mode:**
+   - `--checkpoint estado.pkl` keeps the per-device accumulators (counts, sums, min, max) in a checkpoint,
+     so each run only reads the new input and merges it in (`AcumuladorDispositivo.combinar`) instead of
+     rebuilding from the full history; the bases are then written from the merged state.
+   - Input files given as arguments are tracked by position: files already consumed are skipped, appended files
+     are read from the last complete line consumed, and a file that was replaced (shorter, or with a different
+     beginning) is read again from the start. `--checkpoint` requires input files: stdin has no position to track.
+   - The checkpoint is written after the bases, also through a temporary file and a rename; if a run fails, the
+     temporary file is removed, the previous checkpoint is kept and the same input is consumed again by the next run.
+   - The result equals a full rebuild over the concatenated input: the new readings continue the float sums of
+     the checkpoint in input order (or the exact sums with `--soma-exata`). The checkpoint records which sums it
+     holds and is rejected by a run in the other mode. `--reconstruir` ignores the existing checkpoint and starts
+     a new one.
 
 This script is useful for preprocessing IoT data, enabling further analysis and machine learning model training.
+
+**Note:** For hourly, 15-minute or daily features per device and cell (instead of one aggregate per device),
+`janelas.py` computes tumbling and sliding windows of several sizes in one pass over the raw input.
 """
 
 
 #! /usr/bin/env python
+import argparse
+import io
 import os
+import pickle
 import sys
+import time
+import zlib
+
 import pandas as pd
 
-dfTeste = pd.DataFrame([], columns = ['dispositivo','hora', 'minuto', 'temp_minima', 'temp_maxima', 'latitude', 'longitude', 'Classe'])
-dfTreinamento = dfTeste
+from derramamento import ESCALA_EXATA, Derramamento, mediaExata, picoRss, valorExato
 
-ocorrencia = {}
-ocorrenciaHora = {}
-ocorrenciaMinuto = {}
-ocorrenciaTemperatura = {}
-ocorrenciaTemperaturaMinima = {}
-ocorrenciaTemperaturaMaxima = {}
-ocorrenciaLatitude= {}
-ocorrenciaLongitude= {}
+DIRETORIO_SAIDA = '/root/om/PreProcessamento'
 
+COLUNAS_SAIDA = ['hora', 'minuto', 'temp_minima', 'temp_maxima', 'latitude', 'longitude', 'Classe']
 
-for linha in sys.stdin:
+VERSAO_CHECKPOINT = 1
 
-    dispositivo, hora, minuto, temperatura, latitude, longitude, numeroOcorrencias = linha.split('\t')
+# Dispositivos por bloco no arquivo de checkpoint
+TAMANHO_BLOCO_CHECKPOINT = 10000
 
-    hora = int(hora)
-    minuto = int(minuto)
-    temperatura = float(temperatura)
-    latitude = round(float(latitude),2)
-    longitude = round(float(longitude),2)
-    numeroOcorrencias = int(numeroOcorrencias)
+# Bytes do inicio de cada arquivo de entrada usados para detectar que ele foi substituido
+TAMANHO_ASSINATURA = 4096
 
-    try:
-        ocorrencia[dispositivo] = ocorrencia[dispositivo] + numeroOcorrencias
-        ocorrenciaHora[dispositivo] = ocorrenciaHora[dispositivo] + hora
-        ocorrenciaMinuto[dispositivo] = ocorrenciaMinuto[dispositivo] + minuto
-        ocorrenciaTemperatura[dispositivo] = ocorrenciaTemperatura[dispositivo] + temperatura
+# Estimativa de memoria por dispositivo (chave, registro, somas exatas e entrada do dict), para --memoria
+BYTES_POR_DISPOSITIVO = 600
+
+
+class AcumuladorDispositivo(object):
+
+    __slots__ = ('ocorrencia', 'hora', 'minuto', 'temperatura', 'temperaturaMinima', 'temperaturaMaxima',
+                 'latitude', 'longitude')
+
+    # Escala gravada no checkpoint (None: somas em float)
+    ESCALA = None
+
+    def __init__(self, hora, minuto, temperatura, latitude, longitude, numeroOcorrencias):
+        self.ocorrencia = numeroOcorrencias
+        self.hora = hora
+        self.minuto = minuto
+        self.temperatura = temperatura
+        self.temperaturaMinima = temperatura
+        self.temperaturaMaxima = temperatura
+        self.latitude = latitude
+        self.longitude = longitude
+
+    def adicionar(self, hora, minuto, temperatura, latitude, longitude, numeroOcorrencias):
+        self.ocorrencia += numeroOcorrencias
+        self.hora += hora
+        self.minuto += minuto
+        self.temperatura += temperatura
+
+        if self.temperaturaMinima > temperatura:
+            self.temperaturaMinima = temperatura
+
+        if self.temperaturaMaxima < temperatura:
+            self.temperaturaMaxima = temperatura
+
+        self.latitude += latitude
+        self.longitude += longitude
+
+    def media(self, soma):
+        return soma / self.ocorrencia
+
+    def combinar(self, posterior):
+        # Junta o parcial de leituras posteriores (empates no minimo/maximo mantem o anterior)
+        self.ocorrencia += posterior.ocorrencia
+        self.hora += posterior.hora
+        self.minuto += posterior.minuto
+        self.temperatura += posterior.temperatura
+
+        if self.temperaturaMinima > posterior.temperaturaMinima:
+            self.temperaturaMinima = posterior.temperaturaMinima
+
+        if self.temperaturaMaxima < posterior.temperaturaMaxima:
+            self.temperaturaMaxima = posterior.temperaturaMaxima
 
-        if ocorrenciaTemperaturaMinima[dispositivo] > temperatura:
-            ocorrenciaTemperaturaMinima[dispositivo] = temperatura
+        self.latitude += posterior.latitude
+        self.longitude += posterior.longitude
+        return self
 
-        if ocorrenciaTemperaturaMaxima[dispositivo] < temperatura:
-            ocorrenciaTemperaturaMaxima[dispositivo] = temperatura
 
-        ocorrenciaLatitude[dispositivo] = ocorrenciaLatitude[dispositivo] + latitude
-        ocorrenciaLongitude[dispositivo] = ocorrenciaLongitude[dispositivo] + longitude
+class AcumuladorExato(AcumuladorDispositivo):
+    # Somas de temperatura e coordenadas em inteiros exatos (--soma-exata): independem da ordem de combinacao
 
-    except:
-        ocorrencia[dispositivo] = numeroOcorrencias
-        ocorrenciaHora[dispositivo] = hora
-        ocorrenciaMinuto[dispositivo] = minuto
-        ocorrenciaTemperatura[dispositivo] = temperatura
-        ocorrenciaTemperaturaMaxima[dispositivo] = temperatura
-        ocorrenciaTemperaturaMinima[dispositivo] = temperatura
-        ocorrenciaLatitude[dispositivo] = latitude
-        ocorrenciaLongitude[dispositivo] = longitude
+    __slots__ = ()
 
+    ESCALA = ESCALA_EXATA
 
+    def __init__(self, hora, minuto, temperatura, latitude, longitude, numeroOcorrencias):
+        AcumuladorDispositivo.__init__(self, hora, minuto, temperatura, latitude, longitude, numeroOcorrencias)
+        self.temperatura = valorExato(temperatura)
+        self.latitude = valorExato(latitude)
+        self.longitude = valorExato(longitude)
 
-for dispositivo in ocorrencia.keys():
+    def adicionar(self, hora, minuto, temperatura, latitude, longitude, numeroOcorrencias):
+        self.ocorrencia += numeroOcorrencias
+        self.hora += hora
+        self.minuto += minuto
+        self.temperatura += valorExato(temperatura)
 
-    temperaturaMedia = ocorrenciaTemperatura[dispositivo] / ocorrencia[dispositivo]
-    hora = ocorrenciaHora[dispositivo] / ocorrencia[dispositivo]
-    minuto = ocorrenciaMinuto[dispositivo] / ocorrencia[dispositivo]
-    temp_minima = ocorrenciaTemperaturaMinima[dispositivo]
-    temp_maxima = ocorrenciaTemperaturaMaxima[dispositivo]
-    latitude = ocorrenciaLatitude[dispositivo] / ocorrencia[dispositivo]
-    longitude = ocorrenciaLongitude[dispositivo] / ocorrencia[dispositivo]
+        if self.temperaturaMinima > temperatura:
+            self.temperaturaMinima = temperatura
 
+        if self.temperaturaMaxima < temperatura:
+            self.temperaturaMaxima = temperatura
+
+        self.latitude += valorExato(latitude)
+        self.longitude += valorExato(longitude)
+
+    def media(self, soma):
+        return mediaExata(soma, self.ocorrencia)
+
+
+def classificarTemperatura(temperaturaMedia):
     if temperaturaMedia < 10:
-        classe = 'Frio'
+        return 'Frio'
     elif temperaturaMedia < 20:
-        classe = 'Moderado'
+        return 'Moderado'
     elif temperaturaMedia < 25:
-        classe = 'Quente'
-    else:
-        classe = 'Alerta'
+        return 'Quente'
+    return 'Alerta'
+
+
+def lerRegistros(entrada, estatisticas, exata=False):
+    # Le bytes (sem decodificar cada linha); o dispositivo continua em bytes como chave
+    for linha in entrada:
+        estatisticas['bytes'] += len(linha)
+        try:
+            dispositivo, hora, minuto, temperatura, latitude, longitude, numeroOcorrencias = linha.split(b'\t')
+            registro = (dispositivo, int(hora), int(minuto), float(temperatura),
+                        round(float(latitude), 2), round(float(longitude), 2), int(numeroOcorrencias))
+            if exata:
+                # nan/inf nao tem soma exata
+                valorExato(registro[3] + registro[4] + registro[5])
+        except (ValueError, OverflowError):
+            estatisticas['invalidas'] += 1
+            if estatisticas['invalidas'] <= 10:
+                sys.stderr.write('Linha invalida ignorada: {!r}\n'.format(linha))
+            continue
+        estatisticas['linhas'] += 1
+        yield registro
+
+
+def incorporar(itens, acumuladores, derramamento=None):
+    # Junta pares (dispositivo, acumulador) ja agregados, como os de um checkpoint
+    maximoChaves = derramamento.maximoChaves if derramamento is not None else None
+
+    for dispositivo, parcial in itens:
+        acumulador = acumuladores.get(dispositivo)
+        if acumulador is None:
+            acumuladores[dispositivo] = parcial
+            if maximoChaves is not None and len(acumuladores) > maximoChaves:
+                derramamento.derramar(acumuladores)
+        else:
+            acumulador.combinar(parcial)
+
+    return acumuladores
+
+
+def acumular(registros, acumuladores=None, derramamento=None, fabrica=AcumuladorDispositivo):
+    # fabrica: AcumuladorDispositivo (somas em float) ou AcumuladorExato
+    if acumuladores is None:
+        acumuladores = {}
+
+    maximoChaves = derramamento.maximoChaves if derramamento is not None else None
+
+    for dispositivo, hora, minuto, temperatura, latitude, longitude, numeroOcorrencias in registros:
+        acumulador = acumuladores.get(dispositivo)
+        if acumulador is None:
+            acumuladores[dispositivo] = fabrica(hora, minuto, temperatura, latitude, longitude, numeroOcorrencias)
+            # Acima do orcamento de memoria, derrama os parciais em disco
+            if maximoChaves is not None and len(acumuladores) > maximoChaves:
+                derramamento.derramar(acumuladores)
+        else:
+            acumulador.adicionar(hora, minuto, temperatura, latitude, longitude, numeroOcorrencias)
+
+    return acumuladores
+
+
+def linhaSaida(acumulador):
+
+    temperaturaMedia = acumulador.media(acumulador.temperatura)
+    hora = acumulador.hora / acumulador.ocorrencia
+    minuto = acumulador.minuto / acumulador.ocorrencia
+    latitude = acumulador.media(acumulador.latitude)
+    longitude = acumulador.media(acumulador.longitude)
 
     base = 0.05
     latitude = round(base * round(float(latitude) / base), 2)
     longitude = round(base * round(float(longitude) / base), 2)
 
-    #  Se for numerico entra na base de testes, se nao, na base treinamento
+    return (hora, minuto, acumulador.temperaturaMinima, acumulador.temperaturaMaxima,
+            latitude, longitude, classificarTemperatura(temperaturaMedia))
+
+
+def separarBases(acumuladores):
+    # Se for numerico entra na base de testes, se nao, na base treinamento
+    # (dict ou pares (dispositivo, acumulador), como os de Derramamento.itens)
+    itens = acumuladores.items() if isinstance(acumuladores, dict) else acumuladores
+    teste = []
+    treinamento = []
+    for dispositivo, acumulador in itens:
+        if dispositivo[:1].isdigit():
+            teste.append(linhaSaida(acumulador))
+        else:
+            treinamento.append(linhaSaida(acumulador))
+    return teste, treinamento
+
+
+def gravarBases(teste, treinamento, diretorio=DIRETORIO_SAIDA):
 
+    # Monta cada DataFrame de uma vez a partir das linhas
+    dfTeste = pd.DataFrame.from_records(teste, columns=COLUNAS_SAIDA)
+    dfTreinamento = pd.DataFrame.from_records(treinamento, columns=COLUNAS_SAIDA)
+
+    # Grava em arquivo temporario e renomeia sobre o anterior (troca atomica)
+    for nome, df in (('teste.csv', dfTeste), ('treinamento.csv', dfTreinamento)):
+        caminho = os.path.join(diretorio, nome)
+        temporario = '{}.tmp.{}'.format(caminho, os.getpid())
+        df.to_csv(temporario, index = False)
+        os.replace(temporario, caminho)
+
+
+def assinaturaArquivo(caminho, posicao):
+    with open(caminho, 'rb') as arquivo:
+        return zlib.crc32(arquivo.read(min(posicao, TAMANHO_ASSINATURA)))
+
+
+def lerCheckpoint(caminho, escala=None):
+    # -> (cabecalho, iterador de (dispositivo, acumulador)); sem checkpoint, estado vazio.
+    # escala: a do acumulador em uso (None: somas em float), que deve ser a do checkpoint
+    if not os.path.exists(caminho):
+        return {'entradas': {}}, iter(())
+
+    arquivo = open(caminho, 'rb')
+    try:
+        cabecalho = pickle.load(arquivo)
+    except (pickle.UnpicklingError, EOFError):
+        cabecalho = None
+    if not isinstance(cabecalho, dict) or cabecalho.get('versao_formato') != VERSAO_CHECKPOINT or \
+            cabecalho.get('escala') != escala:
+        arquivo.close()
+        raise ValueError('checkpoint incompativel: {} (use --reconstruir)'.format(caminho))
+
+    def itens():
+        with arquivo:
+            while True:
+                try:
+                    bloco = pickle.load(arquivo)
+                except EOFError:
+                    return
+                yield from bloco
+
+    return cabecalho, itens()
+
+
+def gravarCheckpoint(caminho, entradas, itens, escala=None):
+    # Grava os pares (dispositivo, acumulador) em blocos enquanto eles seguem para as bases;
+    # o arquivo so substitui o checkpoint anterior em concluirCheckpoint
+    temporario = '{}.tmp.{}'.format(caminho, os.getpid())
+    with open(temporario, 'wb') as arquivo:
+        cabecalho = {'versao_formato': VERSAO_CHECKPOINT, 'escala': escala, 'entradas': entradas,
+                     'criado_em': time.time()}
+        pickle.dump(cabecalho, arquivo, pickle.HIGHEST_PROTOCOL)
+        bloco = []
+        for item in itens:
+            bloco.append(item)
+            if len(bloco) == TAMANHO_BLOCO_CHECKPOINT:
+                pickle.dump(bloco, arquivo, pickle.HIGHEST_PROTOCOL)
+                bloco = []
+            yield item
+        if bloco:
+            pickle.dump(bloco, arquivo, pickle.HIGHEST_PROTOCOL)
+
+
+def concluirCheckpoint(caminho):
+    os.replace('{}.tmp.{}'.format(caminho, os.getpid()), caminho)
+
+
+def descartarCheckpoint(caminho):
+    # Execucao falhou: remove o checkpoint parcial, o anterior continua valendo
+    try:
+        os.remove('{}.tmp.{}'.format(caminho, os.getpid()))
+    except FileNotFoundError:
+        pass
+
+
+def lerNovasLinhas(caminhos, entradas):
+    # Linhas completas ainda nao consumidas de cada arquivo; atualiza entradas (caminho -> (posicao, assinatura))
+    for caminho in caminhos:
+        chave = os.path.abspath(caminho)
+        posicao, assinatura = entradas.get(chave, (0, None))
+        if posicao and (os.path.getsize(caminho) < posicao or assinaturaArquivo(caminho, posicao) != assinatura):
+            sys.stderr.write('{} foi substituido; lido desde o inicio\n'.format(caminho))
+            posicao = 0
+
+        with open(caminho, 'rb', buffering=1 << 20) as arquivo:
+            arquivo.seek(posicao)
+            for linha in arquivo:
+                if not linha.endswith(b'\n'):
+                    # Ultima linha ainda sendo escrita: fica para a proxima execucao
+                    break
+                posicao += len(linha)
+                yield linha
+
+        entradas[chave] = (posicao, assinaturaArquivo(caminho, posicao))
+
+
+def reportarEstatisticas(estatisticas, dispositivos, segundos, derramamento=None):
+    rss = picoRss()
+    sys.stderr.write('{} linhas ({} invalidas, {} bytes), {} dispositivos em {:.2f}s - {:.0f} linhas/s, '
+                     'RSS pico {:.1f} MB\n'.format(estatisticas['linhas'], estatisticas['invalidas'],
+                                                    estatisticas['bytes'], dispositivos, segundos,
+                                                    estatisticas['linhas'] / max(segundos, 1e-9), rss / 1024.0))
+    contadores = [('linhas', estatisticas['linhas']), ('invalidas', estatisticas['invalidas']),
+                  ('dispositivos', dispositivos), ('rss_pico_kb', rss)]
+    if 'anteriores' in estatisticas:
+        sys.stderr.write('Checkpoint: {} dispositivos anteriores\n'.format(estatisticas['anteriores']))
+        contadores.append(('dispositivos_checkpoint', estatisticas['anteriores']))
+    if derramamento is not None:
+        sys.stderr.write('Derramamento: {} vezes, {} parciais, {} bytes em disco (limite {} dispositivos)\n'.format(
+            derramamento.derramamentos, derramamento.chavesDerramadas, derramamento.bytesDerramados,
+            derramamento.maximoChaves))
+        contadores += [('derramamentos', derramamento.derramamentos),
+                       ('bytes_derramados', derramamento.bytesDerramados)]
+    for nome, valor in contadores:
+        sys.stderr.write('reporter:counter:generate_database,{},{}\n'.format(nome, valor))
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Gera as bases de teste e treinamento')
+    parser.add_argument('entradas', nargs='*', help='arquivos de entrada (padrao: stdin)')
+    parser.add_argument('--saida', default=DIRETORIO_SAIDA, help='diretorio de teste.csv/treinamento.csv')
+    parser.add_argument('--memoria', type=float, help='orcamento (MB) da tabela de dispositivos; acima dele derrama')
+    parser.add_argument('--particoes', type=int, default=16, help='particoes dos arquivos de derramamento')
+    parser.add_argument('--temporario', help='diretorio dos arquivos de derramamento')
+    parser.add_argument('--checkpoint', help='estado dos dispositivos; cada execucao le so a entrada nova')
+    parser.add_argument('--reconstruir', action='store_true', help='ignora o checkpoint existente')
+    parser.add_argument('--soma-exata', action='store_true',
+                        help='somas exatas, independentes da ordem (muda celula/classe em empates de arredondamento)')
+    args = parser.parse_args()
+
+    # Os parciais derramados sao somados fora da ordem da entrada: so e identico com somas exatas
+    if args.memoria is not None and not args.soma_exata:
+        parser.error('--memoria requer --soma-exata')
+    # Sem arquivos nao ha posicao para registrar: a proxima execucao somaria a entrada de novo
+    if args.checkpoint and not args.entradas:
+        parser.error('--checkpoint requer arquivos de entrada (nao le stdin)')
+    fabrica = AcumuladorExato if args.soma_exata else AcumuladorDispositivo
+
+    inicio = time.perf_counter()
+    estatisticas = {'linhas': 0, 'invalidas': 0, 'bytes': 0}
+
+    derramamento = None
+    if args.memoria is not None:
+        derramamento = Derramamento(AcumuladorExato.combinar, args.memoria * 1024 * 1024,
+                                    BYTES_POR_DISPOSITIVO, args.particoes, args.temporario)
+
+    entradas = {}
+    acumuladores = {}
+    gravacao = None
+    concluido = False
     try:
-        testeNumerico = int(dispositivo[0])
-        dfTeste = dfTeste.append({'dispositivo':dispositivo,'hora':hora, 'minuto':minuto, 
-            'temp_minima': temp_minima, 'temp_maxima': temp_maxima, 
-            'latitude':latitude, 'longitude':longitude, 'Classe':classe}, ignore_index=True)
-
-    except:
-        dfTreinamento = dfTreinamento.append({'dispositivo':dispositivo,'hora':hora, 'minuto':minuto, 
-            'temp_minima': temp_minima, 'temp_maxima': temp_maxima, 
-            'latitude':latitude, 'longitude':longitude, 'Classe':classe}, ignore_index=True)
-
-# Apagar Arquivos Csv anteriores
-try:
-    os.remove("/root/om/PreProcessamento/teste.csv")
-except:
-    pass
-try:
-    os.remove("/root/om/PreProcessamento/treinamento.csv")
-except:
-    pass
-
-dfTeste = dfTeste[['hora', 'minuto', 'temp_minima', 'temp_maxima', 'latitude', 'longitude', 'Classe']]
-dfTreinamento = dfTreinamento[['hora', 'minuto', 'temp_minima', 'temp_maxima', 'latitude', 'longitude', 'Classe']]
-
-dfTeste.to_csv(r"/root/om/PreProcessamento/teste.csv", index = False)
-dfTreinamento.to_csv(r"/root/om/PreProcessamento/treinamento.csv", index = False)
+        if args.checkpoint and not args.reconstruir:
+            try:
+                cabecalho, anteriores = lerCheckpoint(args.checkpoint, fabrica.ESCALA)
+            except ValueError as erro:
+                parser.error(str(erro))
+            entradas = cabecalho['entradas']
+            incorporar(anteriores, acumuladores, derramamento)
+            # Nada foi derramado duas vezes ainda: os parciais derramados sao dispositivos distintos
+            estatisticas['anteriores'] = len(acumuladores) + (derramamento.chavesDerramadas if derramamento else 0)
+
+        if args.entradas:
+            linhas = lerNovasLinhas(args.entradas, entradas)
+        else:
+            linhas = io.open(sys.stdin.fileno(), 'rb', buffering=1 << 20, closefd=False)
+        acumular(lerRegistros(linhas, estatisticas, args.soma_exata), acumuladores, derramamento, fabrica)
+
+        itens = derramamento.itens(acumuladores) if derramamento is not None else acumuladores.items()
+        if args.checkpoint:
+            itens = gravacao = gravarCheckpoint(args.checkpoint, entradas, itens, fabrica.ESCALA)
+        teste, treinamento = separarBases(itens)
+        gravarBases(teste, treinamento, args.saida)
+
+        # Depois das bases: se algo falhar antes, o checkpoint anterior continua valendo
+        if args.checkpoint:
+            concluirCheckpoint(args.checkpoint)
+            concluido = True
+    finally:
+        if gravacao is not None and not concluido:
+            # Fecha o arquivo temporario antes de remove-lo
+            gravacao.close()
+            descartarCheckpoint(args.checkpoint)
+        if derramamento is not None:
+            derramamento.fechar()
+
+    reportarEstatisticas(estatisticas, len(teste) + len(treinamento), time.perf_counter() - inicio, derramamento)
+
+
+if __name__ == '__main__':
+    main()
 
 ## Criar base de testes
 #count = 0
@@ -0,0 +1,38 @@
+"""
+Combiner for the max-temperature job (`map.py` -> `combine.py` -> `reduce.py`).
+
+1. **Input:**
+   - Mapper output lines (`dispositivo\ttemperatura\tlatitude, longitude`), usually one sorted spill of a mapper.
+
+2. **Processing:**
+   - Keeps only the highest temperature (and its location) per device, with the same semantics as `reduce.py`
+     (see `maximos.TabelaMaximos`), flushing the table when it reaches `--limite` devices.
+
+3. **Output:**
+   - Lines in the same format as the input, so it can run zero, one or many times between the mapper and the reducer:
+     ```bash
+     hadoop jar hadoop-streaming.jar ... -mapper map.py -combiner combine.py -reducer reduce.py
+     cat entrada.csv | python map.py --sem-combinar | sort | python combine.py | python reduce.py
+     ```
+"""
+
+#! /usr/bin/env python
+import argparse
+import sys
+
+from maximos import TabelaMaximos
+
+parser = argparse.ArgumentParser(description='Combiner da temperatura maxima por dispositivo')
+parser.add_argument('--limite', type=int, default=100000, help='dispositivos na tabela antes de descarregar')
+args = parser.parse_args()
+
+tabela = TabelaMaximos(sys.stdout, args.limite)
+
+for linha in sys.stdin:
+
+    chave, temperatura, localizacao = linha.rstrip('\n').split('\t')
+
+    tabela.adicionar(chave, temperatura, localizacao)
+
+tabela.descarregar()
+tabela.reportar('combine')
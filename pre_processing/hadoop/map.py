@@ -29,16 +29,38 @@ This script processes input data from standard input (stdin), typically used in
      - `latitude` (normalized)
      - `longitude` (normalized)
 
-5. **Use Case:**
+5. **In-Mapper Combining:**
+   - Instead of one line per reading, keeps a bounded per-device table with the highest temperature
+     and its location (`maximos.TabelaMaximos`) and emits it when it fills up and at the end of the input.
+   - `reduce.py` only keeps the maximum per device, so its result is unchanged while the shuffle volume
+     drops to about one line per device per mapper.
+   - `--sem-combinar` emits every reading, as before; `--limite` sets the table size.
+   - `verificar_combinacao.py` checks that the combined job gives the same output as `--sem-combinar`.
+
+6. **Use Case:**
    - This script is useful for pre-processing IoT or geospatial data, ensuring that locations are standardized and incomplete data is excluded.
 
-**Note:** The output format uses Python 2 style (`print '%s\t%s\t%s, %s'`), which should be updated to Python 3 if needed.
+**Example (Hadoop streaming with combiner):**
+   ```bash
+   hadoop jar hadoop-streaming.jar -file map.py -file combine.py -file reduce.py -file maximos.py \
+       -file ../derramamento.py -mapper map.py -combiner combine.py -reducer reduce.py -input entrada -output saida
+   ```
 """
 
 
 #! /usr/bin/env python
+import argparse
 import sys
 
+from maximos import TabelaMaximos
+
+parser = argparse.ArgumentParser(description='Mapper da temperatura maxima por dispositivo')
+parser.add_argument('--sem-combinar', action='store_true', help='emite uma linha por leitura')
+parser.add_argument('--limite', type=int, default=100000, help='dispositivos na tabela antes de descarregar')
+args = parser.parse_args()
+
+tabela = TabelaMaximos(sys.stdout, args.limite)
+
 for linha in sys.stdin:
     linha = linha.strip()
 
@@ -55,13 +77,21 @@ for linha in sys.stdin:
     longitude = columns[8]
 
     #Nao inclui linhas com informacoes vazias
-    if dispositivo != '' or hora != '' or minuto != '' or ano != '' or mes != '' or \
-        dia != '' or temperatura != '' or latitude != '' or longitude != '':
+    if dispositivo != '' and hora != '' and minuto != '' and ano != '' and mes != '' and \
+        dia != '' and temperatura != '' and latitude != '' and longitude != '':
 
         base = 0.05
-        base * round(float(latitude) / base)
 
         latitude = round(base * round(float(latitude) / base), 2)
         longitude = round(base * round(float(longitude) / base), 2)
 
-        print '%s\t%s\t%s, %s' % (dispositivo, temperatura, latitude, longitude)
+        localizacao = '%s, %s' % (latitude, longitude)
+
+        if args.sem_combinar:
+            sys.stdout.write('%s\t%s\t%s\n' % (dispositivo, temperatura, localizacao))
+        else:
+            tabela.adicionar(dispositivo, temperatura, localizacao)
+
+if not args.sem_combinar:
+    tabela.descarregar()
+    tabela.reportar('map')
@@ -0,0 +1,55 @@
+"""
+Bounded per-device maximum table shared by `map.py` (in-mapper combining) and `combine.py` (combiner).
+
+1. **What it keeps:**
+   - For each device, the highest temperature seen and its location, exactly what `reduce.py` keeps.
+   - Lines are kept in the mapper output format (`dispositivo\\ttemperatura\\tlatitude, longitude`),
+     with the original temperature text, so the reducer sees the same line it would have seen without combining.
+
+2. **Ties:**
+   - Among readings with the same temperature, the line that sorts first (`temperatura\\tlocalizacao`) is kept,
+     which is the one `reduce.py` would keep after the shuffle sort.
+
+3. **Bounded memory:**
+   - When the table reaches `limite` devices it is flushed to the output and cleared.
+     Partial maxima are still correct because `reduce.py` takes the maximum again.
+"""
+
+import sys
+
+
+class TabelaMaximos(object):
+
+    def __init__(self, saida=sys.stdout, limite=100000):
+        self.saida = saida
+        self.limite = limite
+        # dispositivo -> (temperatura, 'temperatura\tlocalizacao')
+        self.maximos = {}
+        self.entradas = 0
+        self.emitidas = 0
+
+    def adicionar(self, dispositivo, temperatura, localizacao):
+        self.entradas += 1
+        try:
+            valor = float(temperatura)
+        except ValueError:
+            # reduce.py tambem ignora temperaturas invalidas
+            return
+
+        linha = '{}\t{}'.format(temperatura, localizacao)
+        atual = self.maximos.get(dispositivo)
+        if atual is None or valor > atual[0] or (valor == atual[0] and linha < atual[1]):
+            self.maximos[dispositivo] = (valor, linha)
+            if atual is None and len(self.maximos) >= self.limite:
+                self.descarregar()
+
+    def descarregar(self):
+        self.saida.write(''.join('{}\t{}\n'.format(dispositivo, linha)
+                                 for dispositivo, (valor, linha) in self.maximos.items()))
+        self.emitidas += len(self.maximos)
+        self.maximos.clear()
+
+    def reportar(self, grupo):
+        # Contadores do Hadoop streaming
+        sys.stderr.write('reporter:counter:{},entradas,{}\n'.format(grupo, self.entradas))
+        sys.stderr.write('reporter:counter:{},emitidas,{}\n'.format(grupo, self.emitidas))
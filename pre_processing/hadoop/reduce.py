@@ -2,9 +2,8 @@
 This script processes key-value pairs from standard input (stdin), determining the highest temperature recorded for each unique device (key) and the associated location. Here’s what the script does:
 
 1. **Initialization:**
-   - Creates dictionaries:
-     - `ocorrencia`: Stores the highest temperature for each device.
-     - `ocorrenciaLocalizacao`: Stores the location corresponding to the highest temperature for each device.
+   - Creates the dictionary `ocorrencia`, which stores, for each device, the highest temperature
+     and the location corresponding to it (`[temperatura, localizacao]`).
    - Initializes a counter `total` to track the number of processed lines.
 
 2. **Input Processing:**
@@ -28,35 +27,87 @@ This script processes key-value pairs from standard input (stdin), determining t
    - Iterates through the keys in `ocorrencia`.
    - Prints the device ID (`chave`), highest temperature, and corresponding location in tab-separated format.
 
-6. **Use Case:**
+6. **Memory Budget:**
+   - `--memoria MB` bounds the per-device table: above the budget the partial maxima are hash-partitioned into
+     temporary spill files (`--particoes`, `--temporario`) and merged one partition at a time at the end, with the
+     same output (values and order) as the in-memory path.
+   - `derramamento.py` is only imported with `--memoria`: ship it with `-file ../derramamento.py`
+     (locally, `PYTHONPATH=..`).
+   - The peak RSS and the spilled bytes are reported on stderr and as Hadoop streaming counters.
+
+7. **Use Case:**
    - This script is useful for processing IoT data streams where you need to identify the maximum recorded temperature for each device and its location.
 
 """
 
 #! /usr/bin/env python
+import argparse
 import sys
 
-ocorrencia = {}
-ocorrenciaLocalizacao = {}
-total = 0
+# Estimativa de memoria por dispositivo (chave, lista, float e texto da localizacao, entrada do dict)
+BYTES_POR_DISPOSITIVO = 400
 
-for linha in sys.stdin:
 
-    chave, temperatura, localizacao = linha.split('\t')
-    total = total + 1
-    
-    try:
-        temperatura = float(temperatura)
-    except ValueError:
-        continue
-    
+def combinar(anterior, posterior):
+    # Mantem o primeiro maximo, como a comparacao estrita do laco principal
+    if anterior[0] < posterior[0]:
+        return posterior
+    return anterior
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Reducer da temperatura maxima por dispositivo')
+    parser.add_argument('--memoria', type=float, help='orcamento (MB) da tabela de dispositivos; acima dele derrama')
+    parser.add_argument('--particoes', type=int, default=16, help='particoes dos arquivos de derramamento')
+    parser.add_argument('--temporario', help='diretorio dos arquivos de derramamento')
+    args = parser.parse_args()
+
+    derramamento = None
+    if args.memoria is not None:
+        # Enviado com -file ../derramamento.py so quando ha orcamento de memoria
+        from derramamento import Derramamento, picoRss
+
+        derramamento = Derramamento(combinar, args.memoria * 1024 * 1024, BYTES_POR_DISPOSITIVO, args.particoes,
+                                    args.temporario)
+        maximoChaves = derramamento.maximoChaves
+
+    ocorrencia = {}
+    total = 0
+
     try:
-        if ocorrencia[chave] < temperatura:
-            ocorrencia[chave] = temperatura
-            ocorrenciaLocalizacao[chave] = localizacao
-    except:
-        ocorrencia[chave] = temperatura #  declara a chave
-        ocorrenciaLocalizacao[chave] = localizacao
-
-for dispositivo in ocorrencia.keys():
-    print('{}\t{}\t{}'.format(dispositivo, ocorrencia[dispositivo], ocorrenciaLocalizacao[dispositivo]))
+        for linha in sys.stdin:
+
+            chave, temperatura, localizacao = linha.split('\t')
+            total = total + 1
+
+            try:
+                temperatura = float(temperatura)
+            except ValueError:
+                continue
+
+            maximo = ocorrencia.get(chave)
+            if maximo is None:
+                ocorrencia[chave] = [temperatura, localizacao]  # declara a chave
+                if derramamento is not None and len(ocorrencia) > maximoChaves:
+                    derramamento.derramar(ocorrencia)
+            elif maximo[0] < temperatura:
+                maximo[0] = temperatura
+                maximo[1] = localizacao
+
+        itens = derramamento.itens(ocorrencia) if derramamento is not None else ocorrencia.items()
+        for dispositivo, (temperatura, localizacao) in itens:
+            print('{}\t{}\t{}'.format(dispositivo, temperatura, localizacao))
+    finally:
+        if derramamento is not None:
+            derramamento.fechar()
+
+    if derramamento is not None:
+        sys.stderr.write('{} linhas, RSS pico {:.1f} MB, {} derramamentos, {} bytes em disco\n'.format(
+            total, picoRss() / 1024.0, derramamento.derramamentos, derramamento.bytesDerramados))
+        for nome, valor in (('rss_pico_kb', picoRss()), ('derramamentos', derramamento.derramamentos),
+                            ('bytes_derramados', derramamento.bytesDerramados)):
+            sys.stderr.write('reporter:counter:reduce,{},{}\n'.format(nome, valor))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,104 @@
+"""
+Equivalence check of the combined max-temperature job against the uncombined one.
+
+1. **Pipelines:**
+   - Reference: `map.py --sem-combinar | sort | reduce.py`.
+   - Combined: `map.py | combine.py | sort | reduce.py`, with the input split across several mappers (each one
+     with its own in-mapper table) and a tiny `--limite` in `map.py` and `combine.py`, so both tables are flushed
+     many times and the reducer sees several partial maxima per device.
+   - `sort` is a byte-wise sort of the whole lines, like `LC_ALL=C sort` and the Hadoop shuffle of text keys.
+
+2. **Input:**
+   - Synthetic readings for a few devices with many ties on the maximum: the same highest temperature at several
+     locations, and the same value written differently (`30` and `30.0`), plus lines with empty fields.
+
+3. **Result:**
+   - Prints the number of devices compared and exits with status 1 (and the first differing lines) when the
+     outputs differ.
+
+**Example Usage:**
+   ```bash
+   python verificar_combinacao.py --linhas 20000 --mapeadores 4 --limite 2
+   ```
+"""
+
+#! /usr/bin/env python
+import argparse
+import os
+import random
+import subprocess
+import sys
+
+DIRETORIO = os.path.dirname(os.path.abspath(__file__))
+
+
+def gerarEntrada(linhas, dispositivos, semente):
+    aleatorio = random.Random(semente)
+    resultado = []
+    for _ in range(linhas):
+        dispositivo = 'b8:27:eb:00:00:{:02x}'.format(aleatorio.randrange(dispositivos))
+        # Poucos valores distintos: muitos empates no maximo, inclusive com texto diferente
+        temperatura = aleatorio.choice(['10', '25', '29.5', '30', '30.0', '30'])
+        latitude = -25.5 + 0.05 * aleatorio.randint(-3, 3) + aleatorio.uniform(-0.02, 0.02)
+        longitude = -49.25 + 0.05 * aleatorio.randint(-3, 3) + aleatorio.uniform(-0.02, 0.02)
+        campos = [dispositivo, str(aleatorio.randint(0, 23)), str(aleatorio.randint(0, 59)), '2024', '1', '15',
+                  temperatura, repr(latitude), repr(longitude)]
+        if aleatorio.random() < 0.02:
+            campos[aleatorio.randrange(len(campos))] = ''
+        resultado.append(';'.join(campos) + '\n')
+    return resultado
+
+
+def executar(script, argumentos, entrada):
+    processo = subprocess.run([sys.executable, os.path.join(DIRETORIO, script)] + argumentos,
+                              input=entrada.encode(), stdout=subprocess.PIPE, stderr=subprocess.DEVNULL, check=True)
+    return processo.stdout.decode()
+
+
+def ordenar(texto):
+    linhas = texto.splitlines(keepends=True)
+    return ''.join(sorted(linhas, key=lambda linha: linha.encode()))
+
+
+def pipelineSemCombinar(entrada):
+    return executar('reduce.py', [], ordenar(executar('map.py', ['--sem-combinar'], ''.join(entrada))))
+
+
+def pipelineCombinado(entrada, mapeadores, limite):
+    tamanho = -(-len(entrada) // mapeadores)
+    saidas = []
+    for inicio in range(0, len(entrada), tamanho):
+        mapeado = executar('map.py', ['--limite', str(limite)], ''.join(entrada[inicio:inicio + tamanho]))
+        # O combiner roda sobre o spill ordenado de cada mapper
+        saidas.append(executar('combine.py', ['--limite', str(limite + 1)], ordenar(mapeado)))
+    return executar('reduce.py', [], ordenar(''.join(saidas)))
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Compara o job com e sem combinacao')
+    parser.add_argument('--linhas', type=int, default=20000)
+    parser.add_argument('--dispositivos', type=int, default=50)
+    parser.add_argument('--mapeadores', type=int, default=4)
+    parser.add_argument('--limite', type=int, default=2, help='--limite do map.py (o combine.py usa limite + 1)')
+    parser.add_argument('--semente', type=int, default=42)
+    args = parser.parse_args()
+
+    entrada = gerarEntrada(args.linhas, args.dispositivos, args.semente)
+    referencia = pipelineSemCombinar(entrada)
+    combinado = pipelineCombinado(entrada, args.mapeadores, args.limite)
+
+    # O reducer emite na ordem de primeira aparicao, que e a ordem ordenada em ambos
+    if referencia != combinado:
+        for esperado, obtido in zip(referencia.splitlines(), combinado.splitlines()):
+            if esperado != obtido:
+                print('Diferente:\n  sem combinar: {!r}\n  combinado:    {!r}'.format(esperado, obtido))
+                break
+        else:
+            print('Saidas com tamanhos diferentes')
+        sys.exit(1)
+
+    print('Saidas identicas: {} dispositivos'.format(len([linha for linha in referencia.splitlines() if linha])))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,298 @@
+"""
+Streaming tumbling/sliding window aggregation of the raw IoT readings, for several window sizes in one pass.
+
+1. **Input:**
+   - The same semicolon-separated input as `map_database.py`
+     (`dispositivo;hora;minuto;ano;mes;dia;temperatura;latitude;longitude`), from stdin or files.
+   - Lines with an empty field are skipped (as in the mapper); malformed lines are counted and reported on stderr.
+   - The reading time is the wall-clock date/hour/minute of the line, so windows align to the local hour and day
+     instead of averaging hour-of-day across days.
+
+2. **Windows:**
+   - `--janelas 15m,1h,1d,1h/15m`: each entry is a size, optionally with a slide (`tamanho/passo`);
+     without a slide the window is tumbling. All entries are computed from the same pass over the input.
+   - Aggregation key: `(dispositivo, celula, janela)`, where the cell is the 0.05 degree grid cell of the reading
+     as integer ids (`rint(x / 0.05)`), the same snapping as `map_database.py`.
+     `--por-celula` drops the device and aggregates all devices of a cell.
+   - Each window keeps one `AcumuladorJanela` (`__slots__`: count, sum, min and max of the temperature).
+
+3. **Bounded Memory:**
+   - Event-time watermark: the largest reading time seen minus `--atraso` seconds. A window is emitted and freed
+     as soon as its end is at or before the watermark; a reading is dropped from the windows already emitted and
+     counted in `atrasadas` when at least one window rejected it (a short window can be closed while a longer
+     one still takes the reading). The dropped contributions are also counted per entry (`atrasadas_<entrada>`).
+   - At most `--maximo-abertas` windows are kept; beyond that the window that ends first is emitted early
+     (`antecipadas`), so memory stays bounded even for input that is not in time order. A reading that later falls
+     into such a window opens it again, and it is emitted a second time with the remaining readings.
+   - For time-ordered input (the daily dumps), memory is proportional to the active devices and cells.
+   - The input must be roughly in time order across devices (out of order by less than `--atraso`): a file written
+     device by device moves the watermark to the end of the first device's readings and the other devices are
+     dropped as late. `armazenamento_colunar.py exportar` writes in time order; other dumps can be sorted first.
+     When more than `FRACAO_AVISO_ATRASADAS` of the lines are late, a warning is printed on stderr.
+
+4. **Output:**
+   - One CSV per window entry in `--saida` (`janelas_<entrada>.csv`, e.g. `janelas_1h_15m.csv`), written as the
+     windows close, with the columns of `COLUNAS_JANELA`: the start of the window as `hora`/`minuto`, the
+     `temp_minima`/`temp_maxima`/`latitude`/`longitude` features of `generate_database.py` and the
+     `Frio`/`Moderado`/`Quente`/`Alerta` class of the average temperature (`classificarTemperatura`).
+   - Counters (lines, invalid, late, early, windows per entry) are printed on stderr and as Hadoop streaming counters.
+
+**Example Usage:**
+   ```bash
+   python janelas.py /root/om/historico.csv --janelas 15m,1h,1d,1h/15m --saida /root/om/Janelas
+   ```
+"""
+
+#! /usr/bin/env python
+import argparse
+import calendar
+import csv
+import heapq
+import os
+import sys
+import time
+
+from generate_database import classificarTemperatura
+
+BASE_GRADE = 0.05
+
+# Aviso de entrada fora de ordem: fracao das linhas descartadas como atrasadas
+FRACAO_AVISO_ATRASADAS = 0.01
+
+UNIDADES = {'s': 1, 'm': 60, 'h': 3600, 'd': 86400}
+
+COLUNAS_JANELA = ['dispositivo', 'inicio', 'hora', 'minuto', 'temp_minima', 'temp_maxima', 'latitude', 'longitude',
+                  'temp_media', 'quantidade', 'Classe']
+
+
+def converterDuracao(texto):
+    # '15m' -> 900, '1h' -> 3600, '1d' -> 86400, '90' -> 90 (segundos)
+    texto = texto.strip()
+    if texto[-1:] in UNIDADES:
+        return int(texto[:-1]) * UNIDADES[texto[-1]]
+    return int(texto)
+
+
+class EspecificacaoJanela(object):
+
+    def __init__(self, texto):
+        self.nome = texto.replace('/', '_')
+        tamanho, _, passo = texto.partition('/')
+        self.duracao = converterDuracao(tamanho)
+        self.passo = converterDuracao(passo) if passo else self.duracao
+        if self.duracao <= 0 or self.passo <= 0 or self.duracao % self.passo:
+            raise ValueError('janela invalida {!r}: o tamanho deve ser multiplo positivo do passo'.format(texto))
+
+    def inicios(self, tempo):
+        # Inicios das janelas (alinhadas na epoca) que contem o instante
+        ultimo = tempo - tempo % self.passo
+        return range(ultimo, ultimo - self.duracao, -self.passo)
+
+
+def lerEspecificacoes(texto):
+    especificacoes = [EspecificacaoJanela(item) for item in texto.split(',') if item.strip()]
+    if not especificacoes:
+        raise ValueError('nenhuma janela informada')
+    return especificacoes
+
+
+class AcumuladorJanela(object):
+
+    __slots__ = ('quantidade', 'soma', 'minima', 'maxima')
+
+    def __init__(self):
+        self.quantidade = 0
+        self.soma = 0.0
+        self.minima = None
+        self.maxima = None
+
+    def adicionar(self, temperatura):
+        self.quantidade += 1
+        self.soma += temperatura
+        if self.minima is None or temperatura < self.minima:
+            self.minima = temperatura
+        if self.maxima is None or temperatura > self.maxima:
+            self.maxima = temperatura
+
+
+class MotorJanelas(object):
+
+    def __init__(self, especificacoes, emitir, atraso=300, maximoAbertas=1000000, porCelula=False):
+        # emitir(indiceEspecificacao, chave, inicio, acumulador) -> None; chave = (dispositivo, celulaLat, celulaLon)
+        self.especificacoes = especificacoes
+        self.emitir = emitir
+        self.atraso = atraso
+        self.maximoAbertas = maximoAbertas
+        self.porCelula = porCelula
+
+        # (indice, chave, inicio) -> AcumuladorJanela, e heap (fim, indice, chave, inicio) na ordem de fechamento
+        self.abertas = {}
+        self.fechamentos = []
+        self.marcaDAgua = None
+
+        # Contadores
+        self.leituras = 0
+        self.atrasadas = 0
+        self.antecipadas = 0
+        self.emitidas = [0] * len(especificacoes)
+        self.atrasadasPorJanela = [0] * len(especificacoes)
+
+    def adicionar(self, dispositivo, tempo, temperatura, celulaLatitude, celulaLongitude):
+        self.leituras += 1
+        chave = ('' if self.porCelula else dispositivo, celulaLatitude, celulaLongitude)
+        marcaDAgua = self.marcaDAgua
+        rejeitada = False
+
+        for indice, especificacao in enumerate(self.especificacoes):
+            for inicio in especificacao.inicios(tempo):
+                fim = inicio + especificacao.duracao
+                if marcaDAgua is not None and fim <= marcaDAgua:
+                    # Janela ja emitida
+                    rejeitada = True
+                    self.atrasadasPorJanela[indice] += 1
+                    continue
+                identificador = (indice, chave, inicio)
+                acumulador = self.abertas.get(identificador)
+                if acumulador is None:
+                    acumulador = self.abertas[identificador] = AcumuladorJanela()
+                    heapq.heappush(self.fechamentos, (fim, indice, chave, inicio))
+                acumulador.adicionar(temperatura)
+
+        if rejeitada:
+            self.atrasadas += 1
+
+        limite = tempo - self.atraso
+        if marcaDAgua is None or limite > marcaDAgua:
+            self.marcaDAgua = limite
+            self._fechar(limite)
+
+        while len(self.abertas) > self.maximoAbertas:
+            self.antecipadas += 1
+            self._emitirProxima()
+
+    def _emitirProxima(self):
+        fim, indice, chave, inicio = heapq.heappop(self.fechamentos)
+        acumulador = self.abertas.pop((indice, chave, inicio))
+        self.emitidas[indice] += 1
+        self.emitir(indice, chave, inicio, acumulador)
+
+    def _fechar(self, limite):
+        while self.fechamentos and self.fechamentos[0][0] <= limite:
+            self._emitirProxima()
+
+    def encerrar(self):
+        # Fim da entrada: emite todas as janelas abertas
+        while self.fechamentos:
+            self._emitirProxima()
+
+    def __len__(self):
+        return len(self.abertas)
+
+
+def lerLeituras(linhas, estatisticas):
+    # -> (dispositivo, tempo, temperatura, celulaLatitude, celulaLongitude); tempo em segundos do relogio local
+    dias = {}
+    for linha in linhas:
+        columns = linha.strip().split(';')
+        try:
+            dispositivo, hora, minuto, ano, mes, dia, temperatura, latitude, longitude = columns[:9]
+        except ValueError:
+            estatisticas['invalidas'] += 1
+            continue
+
+        # remove empty rows
+        if '' in (dispositivo, hora, minuto, ano, mes, dia, temperatura, latitude, longitude):
+            estatisticas['vazias'] += 1
+            continue
+
+        try:
+            data = (ano, mes, dia)
+            baseDia = dias.get(data)
+            if baseDia is None:
+                baseDia = dias[data] = calendar.timegm((int(ano), int(mes), int(dia), 0, 0, 0))
+            tempo = baseDia + int(hora) * 3600 + int(minuto) * 60
+            leitura = (dispositivo, tempo, float(temperatura),
+                       round(float(latitude) / BASE_GRADE), round(float(longitude) / BASE_GRADE))
+        except (ValueError, OverflowError):
+            estatisticas['invalidas'] += 1
+            if estatisticas['invalidas'] <= 10:
+                sys.stderr.write('Linha invalida ignorada: {!r}\n'.format(linha))
+            continue
+
+        estatisticas['linhas'] += 1
+        yield leitura
+
+
+def linhaJanela(chave, inicio, acumulador):
+    dispositivo, celulaLatitude, celulaLongitude = chave
+    momento = time.gmtime(inicio)
+    media = acumulador.soma / acumulador.quantidade
+    return [dispositivo, time.strftime('%Y-%m-%dT%H:%M:%S', momento), momento.tm_hour, momento.tm_min, acumulador.minima, acumulador.maxima,
+            round(BASE_GRADE * celulaLatitude, 2), round(BASE_GRADE * celulaLongitude, 2), round(media, 2),
+            acumulador.quantidade, classificarTemperatura(media)]
+
+
+def abrirEntradas(caminhos):
+    if not caminhos:
+        yield from sys.stdin
+        return
+    for caminho in caminhos:
+        with open(caminho) as arquivo:
+            yield from arquivo
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Janelas deslizantes/fixas por dispositivo e celula em uma passada')
+    parser.add_argument('entradas', nargs='*', help='arquivos de entrada (padrao: stdin)')
+    parser.add_argument('--janelas', default='15m,1h,1d', help='tamanhos, com passo opcional: 15m,1h,1d,1h/15m')
+    parser.add_argument('--saida', default='.', help='diretorio dos CSVs janelas_<entrada>.csv')
+    parser.add_argument('--atraso', type=converterDuracao, default=300, help='atraso tolerado (ex.: 300, 5m)')
+    parser.add_argument('--maximo-abertas', type=int, default=1000000, help='janelas abertas em memoria')
+    parser.add_argument('--por-celula', action='store_true', help='agrega todos os dispositivos de cada celula')
+    args = parser.parse_args()
+
+    try:
+        especificacoes = lerEspecificacoes(args.janelas)
+    except ValueError as erro:
+        parser.error(str(erro))
+
+    inicio = time.perf_counter()
+    os.makedirs(args.saida, exist_ok=True)
+    arquivos = [open(os.path.join(args.saida, 'janelas_{}.csv'.format(especificacao.nome)), 'w', newline='')
+                for especificacao in especificacoes]
+    escritores = [csv.writer(arquivo) for arquivo in arquivos]
+    for escritor in escritores:
+        escritor.writerow(COLUNAS_JANELA)
+
+    def emitir(indice, chave, inicioJanela, acumulador):
+        escritores[indice].writerow(linhaJanela(chave, inicioJanela, acumulador))
+
+    estatisticas = {'linhas': 0, 'vazias': 0, 'invalidas': 0}
+    motor = MotorJanelas(especificacoes, emitir, args.atraso, args.maximo_abertas, args.por_celula)
+    try:
+        for leitura in lerLeituras(abrirEntradas(args.entradas), estatisticas):
+            motor.adicionar(*leitura)
+        motor.encerrar()
+    finally:
+        for arquivo in arquivos:
+            arquivo.close()
+
+    segundos = time.perf_counter() - inicio
+    sys.stderr.write('{} linhas ({} vazias, {} invalidas, {} atrasadas), {} janelas antecipadas em {:.2f}s\n'.format(
+        estatisticas['linhas'], estatisticas['vazias'], estatisticas['invalidas'], motor.atrasadas,
+        motor.antecipadas, segundos))
+    if motor.atrasadas > FRACAO_AVISO_ATRASADAS * estatisticas['linhas']:
+        sys.stderr.write('Aviso: {:.1%} das linhas chegaram atrasadas; a entrada deve estar em ordem de tempo '
+                         '(ou aumente --atraso)\n'.format(motor.atrasadas / estatisticas['linhas']))
+    contadores = [('linhas', estatisticas['linhas']), ('invalidas', estatisticas['invalidas']),
+                  ('atrasadas', motor.atrasadas), ('antecipadas', motor.antecipadas)]
+    contadores += [('janelas_' + especificacao.nome, emitidas)
+                   for especificacao, emitidas in zip(especificacoes, motor.emitidas)]
+    contadores += [('atrasadas_' + especificacao.nome, atrasadas)
+                   for especificacao, atrasadas in zip(especificacoes, motor.atrasadasPorJanela)]
+    for nome, valor in contadores:
+        sys.stderr.write('reporter:counter:janelas,{},{}\n'.format(nome, valor))
+
+
+if __name__ == '__main__':
+    main()
@@ -47,14 +47,34 @@ device1\t12\t30\t23.5\t-25.5\t-49.25\t1
 device2\t13\t45\t24.0\t-25.5\t-49.25\t1
 ```
 
-**Note:** The output format uses Python 2-style string interpolation (`print '%s\t%s\t...'`), which should be updated to Python 3 (`print('{}\t{}\t...'.format(...))`) if necessary.
+8. **Vectorized Mode (`--vetorizado`, requires NumPy):**
+   - Reads stdin in blocks of `--tamanho-bloco` bytes cut at the last newline and splits each block with
+     `bytes.split`, so every column is a C-level slice of one list.
+   - Empty-field filtering, float parsing and the 0.05 degree quantization run as NumPy array operations; each
+     coordinate becomes an integer cell id (`rint(x / 0.05)`) and the output text is formatted once per distinct cell.
+   - The output is written in bulk and is byte-identical to the per-line mode. Blocks that do not fit the fast path
+     (lines without exactly 9 fields, whitespace or carriage returns to strip, non-ASCII text, non-finite coordinates) are
+     mapped line by line with `mapearLinha`.
+
+**Note:** The per-line logic lives in `mapearLinha`, which is also used by `executor_local.py`.
 """
 
 
 #! /usr/bin/env python
+import argparse
+import io
 import sys
 
-for linha in sys.stdin:
+BASE_GRADE = 0.05
+NUMERO_CAMPOS = 9
+TAMANHO_BLOCO = 1 << 22
+
+# Espacos removidos por str.strip() (exceto '\n'): forcam o mapeamento linha a linha
+ESPACOS = [bytes([codigo]) for codigo in b' \t\r\x0b\x0c\x1c\x1d\x1e\x1f']
+
+
+def mapearLinha(linha):
+    # Retorna a linha de saida (sem '\n') ou None quando a linha deve ser descartada
     linha = linha.strip()
 
     columns = linha.split(';')
@@ -78,4 +98,122 @@ for linha in sys.stdin:
         latitude = round(base * round(float(latitude) / base), 2)
         longitude = round(base * round(float(longitude) / base), 2)
 
-        print '%s\t%s\t%s\t%s\t%s\t%s\t%s' % (dispositivo, hora, minuto, temperatura, latitude, longitude, 1)
+        return '%s\t%s\t%s\t%s\t%s\t%s\t%s' % (dispositivo, hora, minuto, temperatura, latitude, longitude, 1)
+
+    return None
+
+
+def mapearTexto(texto):
+    # Caminho linha a linha de um bloco (mesma semantica de main sem --vetorizado)
+    saidas = []
+    for linha in io.StringIO(texto, newline=None):
+        saida = mapearLinha(linha)
+        if saida is not None:
+            saidas.append(saida + '\n')
+    return ''.join(saidas)
+
+
+def formatarCelulas(celulas, numpy):
+    # Texto de cada celula calculado uma vez, com a mesma expressao de mapearLinha
+    unicas, indices = numpy.unique(celulas, return_inverse=True)
+    textos = [str(round(BASE_GRADE * celula, 2)).encode() for celula in unicas.tolist()]
+    return [textos[indice] for indice in indices.tolist()]
+
+
+def mapearBloco(bloco, numpy):
+    # Retorna os bytes de saida do bloco (linhas completas) ou None se o bloco exige o caminho linha a linha
+    if not bloco.isascii() or any(espaco in bloco for espaco in ESPACOS):
+        return None
+
+    if bloco.endswith(b'\n'):
+        bloco = bloco[:-1]
+    quantidade = bloco.count(b'\n') + 1
+    campos = bloco.replace(b'\n', b';').split(b';')
+    if len(campos) != NUMERO_CAMPOS * quantidade:
+        return None
+
+    colunas = [campos[indice::NUMERO_CAMPOS] for indice in range(NUMERO_CAMPOS)]
+
+    # remove empty rows
+    if b';;' in bloco or b'\n;' in bloco or b';\n' in bloco or bloco.startswith(b';') or bloco.endswith(b';'):
+        validas = numpy.ones(quantidade, dtype=bool)
+        for coluna in colunas:
+            validas &= numpy.fromiter(map(len, coluna), dtype=numpy.int64, count=quantidade) > 0
+        indices = numpy.flatnonzero(validas).tolist()
+        colunas = [[coluna[indice] for indice in indices] for coluna in colunas]
+        quantidade = len(indices)
+        if not quantidade:
+            return b''
+
+    try:
+        coordenadas = numpy.array(colunas[7] + colunas[8]).astype(numpy.float64)
+    except ValueError:
+        return None
+    if not numpy.isfinite(coordenadas).all():
+        return None
+
+    celulas = numpy.rint(coordenadas / BASE_GRADE).astype(numpy.int64)
+    textos = formatarCelulas(celulas, numpy)
+
+    partes = [b'\t'] * (12 * quantidade)
+    partes[0::12] = colunas[0]
+    partes[2::12] = colunas[1]
+    partes[4::12] = colunas[2]
+    partes[6::12] = colunas[6]
+    partes[8::12] = textos[:quantidade]
+    partes[10::12] = textos[quantidade:]
+    partes[11::12] = [b'\t1\n'] * quantidade
+    return b''.join(partes)
+
+
+def lerBlocos(entrada, tamanhoBloco):
+    # Blocos terminados em '\n' (o ultimo pode nao ter)
+    resto = b''
+    while True:
+        dados = entrada.read(tamanhoBloco)
+        if not dados:
+            break
+        dados = resto + dados
+        fim = dados.rfind(b'\n') + 1
+        if not fim:
+            resto = dados
+            continue
+        resto = dados[fim:]
+        yield dados[:fim]
+    if resto:
+        yield resto
+
+
+def mapearVetorizado(entrada, saida, tamanhoBloco=TAMANHO_BLOCO):
+    import numpy
+
+    codificacaoEntrada = sys.stdin.encoding or 'utf-8'
+    codificacaoSaida = sys.stdout.encoding or 'utf-8'
+
+    for bloco in lerBlocos(entrada, tamanhoBloco):
+        resultado = mapearBloco(bloco, numpy)
+        if resultado is None:
+            resultado = mapearTexto(bloco.decode(codificacaoEntrada)).encode(codificacaoSaida)
+        saida.write(resultado)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Mapper do pre-processamento (Hadoop streaming)')
+    parser.add_argument('--vetorizado', action='store_true', help='processa blocos com NumPy')
+    parser.add_argument('--tamanho-bloco', type=int, default=TAMANHO_BLOCO, help='bytes lidos por bloco')
+    args = parser.parse_args()
+
+    if args.vetorizado:
+        sys.stdout.flush()
+        mapearVetorizado(sys.stdin.buffer, sys.stdout.buffer, args.tamanho_bloco)
+        sys.stdout.buffer.flush()
+        return
+
+    for linha in sys.stdin:
+        saida = mapearLinha(linha)
+        if saida is not None:
+            sys.stdout.write(saida + '\n')
+
+
+if __name__ == '__main__':
+    main()